@@ -185,8 +185,8 @@ class PrsProfile:
         if beta == None:
             beta = self.beta
         t0 = time.time()
-        P = numpy.zeros(self.R.shape)
-        P = self.pCentre + self.dP*numpy.exp(-(self.rMax/self.R)**beta)
+        P = numpy.zeros(self.R.shape, dtype=self.R.dtype)
+        P[:] = self.pCentre + self.dP*numpy.exp(-(self.rMax/self.R)**beta)
         self.logger.debug("Timing for holland wind profile calculation: %.3f"
                            % (time.time()-t0))
         return P
@@ -242,7 +242,8 @@ class PrsProfile:
         nu = (self.rMax2/self.R)**self.beta2
         emu = numpy.exp(-mu)
         enu = numpy.exp(-nu)
-        P = self.pCentre + dp1*emu +dp2*enu
+        P = numpy.zeros(self.R.shape, dtype=self.R.dtype)
+        P[:] = self.pCentre + dp1*emu +dp2*enu
 #        gradientV1 = (self.beta1*dp1/self.rho)*mu*emu
 #        gradientV2 = (self.beta2*dp2/self.rho)*nu*enu
 #
@@ -34,6 +34,7 @@ filename = os.environ.get('PYTHONSTARTUP')
 if filename and os.path.isfile(filename):
     execfile(filename)
 import threading
+import Queue
 __version__ = '$Id: AsyncRun.py 642 2012-02-21 07:54:04Z nsummons $'
 class AsyncRun(threading.Thread):
     """
@@ -58,3 +59,89 @@ class AsyncRun(threading.Thread):
     def run(self):
         self.function(**self.args)
 
+
+
+class AsyncWriter(threading.Thread):
+    """
+    A bounded queue of writes, served in order by a separate thread, so
+    that the caller can carry on computing while earlier results are
+    written out.
+    Input: size - the number of writes that can be waiting. Once full,
+                  put() blocks until the writer catches up. If zero,
+                  writes are made synchronously by put().
+    Output: A Thread object, started on creation.
+    Example:  writer = AsyncWriter(2)
+              writer.put(flSaveFile, filename, data)
+              # Main program thread continues here
+              writer.close()
+
+    An exception raised by a write is raised again by the next call to
+    put() or close(), and any writes still waiting are dropped.
+
+    Writes are made holding the lock of the writer. Libraries that are
+    not thread-safe (such as netCDF/HDF5) must only be used by the
+    caller through serialised() or iterate() while the writer is open.
+    """
+    def __init__(self, size=2):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.size = size
+        self.error = None
+        self.lock = threading.RLock()
+        self.queue = Queue.Queue(max(1, size))
+        if size > 0:
+            self.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                function, args, kwargs = item
+                try:
+                    with self.lock:
+                        function(*args, **kwargs)
+                except Exception:
+                    self.error = sys.exc_info()
+
+    def put(self, function, *args, **kwargs):
+        """Queue a call of function(*args, **kwargs)."""
+        self.raiseError()
+        if self.size > 0:
+            self.queue.put((function, args, kwargs))
+        else:
+            function(*args, **kwargs)
+
+    def serialised(self, function):
+        """Wrap function so it never runs at the same time as a write."""
+        if function is None:
+            return None
+
+        def call(*args, **kwargs):
+            with self.lock:
+                return function(*args, **kwargs)
+        return call
+
+    def iterate(self, iterable):
+        """Iterate, never fetching an item at the same time as a write."""
+        iterator = iter(iterable)
+        while True:
+            with self.lock:
+                try:
+                    item = iterator.next()
+                except StopIteration:
+                    return
+            yield item
+
+    def close(self):
+        """Wait for the queued writes to finish."""
+        if self.size > 0 and self.is_alive():
+            self.queue.put(None)
+            self.join()
+        self.raiseError()
+
+    def raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error[0], error[1], error[2]
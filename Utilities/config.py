@@ -34,10 +34,13 @@ PARSERS = {
     'DataProcess_startseason': int,
     'DataProcess_filterseasons': parseBool,
     'Hazard_calculateci': parseBool,
+    'Hazard_guststore': parseBool,
     'Hazard_minimumrecords': int,
     'Hazard_plotspeedunits': str,
     'Hazard_years': parseList,
     'Hazard_samplesize': int,
+    'Hazard_seed': int,
+    'Hazard_tilememory': int,
     'Hazard_percentilerange': int,
     'Input_landmask': str,
     'Input_mslpgrid': parseList,
@@ -56,6 +59,8 @@ PARSERS = {
     'Region_gridinc': eval,
     'Region_localityid': int,
     'Region_localityname': str,
+    'Sites_enabled': parseBool,
+    'Sites_stationfile': str,
     'StatInterface_gridinc': eval,
     'StatInterface_gridspace': eval,
     'StatInterface_kde2dtype': str,
@@ -67,6 +72,9 @@ PARSERS = {
     'TCRM_numberofheadinglines': int,
     'TCRM_pressureunits': str,
     'TCRM_speedunits': str,
+    'Timeseries_chunksize': int,
+    'Timeseries_format': str,
+    'Timeseries_pointmode': parseBool,
     'TrackGenerator_numsimulations': int,
     'TrackGenerator_seasonseed': int,
     'TrackGenerator_trackseed': int,
@@ -76,14 +84,31 @@ PARSERS = {
     'WindfieldInterface_beta': float,
     'WindfieldInterface_beta1': float,
     'WindfieldInterface_beta2': float,
+    'WindfieldInterface_batchsize': int,
+    'WindfieldInterface_precision': str,
+    'WindfieldInterface_processes': int,
+    'WindfieldInterface_profiletable': parseBool,
+    'WindfieldInterface_profiletablestep': float,
+    'WindfieldInterface_windfloor': float,
     'WindfieldInterface_margin': float,
+    'WindfieldInterface_maxreuse': int,
+    'WindfieldInterface_outputvariables': parseList,
+    'WindfieldInterface_packoutput': parseBool,
     'WindfieldInterface_profiletype': str,
     'WindfieldInterface_resolution': float,
+    'WindfieldInterface_reusetolerance': eval,
     'WindfieldInterface_source': str,
+    'WindfieldInterface_stencilcache': parseBool,
+    'WindfieldInterface_stencillatstep': float,
+    'WindfieldInterface_stencilmaxangle': float,
+    'WindfieldInterface_stencilmaxerror': float,
     'WindfieldInterface_thetamax': float,
+    'WindfieldInterface_threads': int,
+    'WindfieldInterface_tilesize': int,
     'WindfieldInterface_trackfile': str,
     'WindfieldInterface_trackpath': str,
-    'WindfieldInterface_windfieldtype': str}
+    'WindfieldInterface_windfieldtype': str,
+    'WindfieldInterface_writequeue': int}
 
 DEFAULTS = """
 [Actions]
@@ -132,6 +157,22 @@ thetaMax=70.0
 Margin=2
 Resolution=0.05
 PlotOutput=False
+StencilCache=False
+StencilLatStep=0.1
+StencilMaxError=0.5
+StencilMaxAngle=2.0
+BatchSize=1
+Precision=double
+ProfileTable=False
+ProfileTableStep=0.5
+WindFloor=0.
+TileSize=0
+Threads=1
+Processes=1
+WriteQueue=0
+PackOutput=False
+OutputVariables=vmax,ua,va,slp
+MaxReuse=0
 
 [Hazard]
 Years=2,5,10,20,25,50,100,200,250,500,1000
@@ -140,10 +181,21 @@ CalculateCI=True
 PercentileRange=90
 SampleSize=50
 PlotSpeedUnits=mps
+GustStore=False
+Seed=1
+TileMemory=1024
 
 [RMW]
 GetRMWDistFromInputData=False
 
+[Sites]
+Enabled=False
+
+[Timeseries]
+ChunkSize=1024
+Format=csv
+PointMode=False
+
 [Input]
 LandMask=input/landmask.nc
 MSLPFile=MSLP/slp.day.ltm.nc
@@ -107,6 +107,12 @@ def pelgev(XMOM):
     D1 = -0.64363929
     D2 = 0.08985247
 
+    #
+    # XMOM MAY ALSO HOLD ARRAYS OF L-MOMENTS, FOR WHICH ARRAYS OF THE
+    # PARAMETERS ARE RETURNED (SEE pelgevArray).
+    if numpy.ndim(XMOM) > 1:
+        return pelgevArray(XMOM)
+
     T3 = XMOM[2]
     if XMOM[1] <= 0.0:
         print ' *** ERROR *** ROUTINE PELGEV : L-MOMENTS INVALID'
@@ -162,8 +168,90 @@ def pelgev(XMOM):
     PARA[0] = XMOM[0]-PARA[1]*(1.0-GAM)/G
     return PARA
 
+def pelgevArray(XMOM):
+    """
+    Parameters of generalised extreme value distributions from arrays of
+    the L-moments lambda-1, lambda-2 and tau-3, by the method of
+    :func:`pelgev`: rational-function approximations for k, refined by
+    Newton-Raphson iteration where tau-3 is less than -0.8.
+
+    :param XMOM: sequence of the three arrays of L-moments.
+
+    :return: array of the location, scale and shape parameters stacked
+             along the first axis, NaN where the L-moments are invalid.
+    :rtype: :class:`numpy.ndarray`
+    """
+    SMALL = 1E-5
+    EPS = 1E-6
+    MAXIT = 20
+    EU = 0.57721566
+    DL2 = 0.69314718
+    DL3 = 1.0986123
+
+    L1, L2, T3 = [numpy.asarray(M, dtype=float) for M in XMOM]
+    valid = (L2 > 0.0) & (numpy.abs(T3) < 1.0)
+    T3 = numpy.where(valid, T3, 0.5)
+
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        Z = 1.0 - T3
+        G = numpy.where(T3 > 0.0,
+                        (-1.0 + Z*(1.59921491 + Z*(-0.48832213 +
+                                                   Z*0.01573152))) /
+                        (1.0 + Z*(-0.64363929 + Z*0.08985247)),
+                        (0.28377530 + T3*(-1.21096399 + T3*(-2.50728214 +
+                         T3*(-1.13455566 + T3*-0.07138022)))) /
+                        (1.0 + T3*(2.06189696 + T3*(1.31912239 +
+                                                    T3*0.25077104))))
+
+        LOW = T3 < -0.8
+        if LOW.any():
+            T = T3[LOW]
+            GL = numpy.where(T <= -0.97, 1.0 - numpy.log(1.0 + T)/DL2, G[LOW])
+            T0 = (T + 3.0)*0.5
+            converged = numpy.zeros(GL.shape, dtype=bool)
+            for IT in xrange(MAXIT):
+                X2 = 2.0**(-GL)
+                X3 = 3.0**(-GL)
+                XX2 = 1.0 - X2
+                XX3 = 1.0 - X3
+                DERIV = (XX2*X3*DL3 - XX3*X2*DL2)/(XX2*XX2)
+                GOLD = GL
+                GL = numpy.where(converged, GL, GL - (XX3/XX2 - T0)/DERIV)
+                converged |= numpy.abs(GL - GOLD) <= EPS*GL
+                if converged.all():
+                    break
+            else:
+                print ' ** WARNING ** ROUTINE PELGEV : ITERATION HAS NOT CONVERGED. RESULTS MAY BE UNRELIABLE.'
+            G[LOW] = GL
+
+        GAM = special.gamma(1.0 + G)
+        PARA = numpy.array([L1 - L2*G/(GAM*(1.0 - 2.0**(-G)))*(1.0 - GAM)/G,
+                            L2*G/(GAM*(1.0 - 2.0**(-G))),
+                            G])
+
+    # ESTIMATED K EFFECTIVELY ZERO
+    ZERO = (T3 > 0.0) & (numpy.abs(G) < SMALL)
+    PARA[2][ZERO] = 0.0
+    PARA[1][ZERO] = L2[ZERO]/DL2
+    PARA[0][ZERO] = L1[ZERO] - EU*PARA[1][ZERO]
+
+    PARA[:, ~valid] = numpy.nan
+    return PARA
+
 def pelgpa(XMOM):
-    
+
+    # XMOM MAY ALSO HOLD ARRAYS OF L-MOMENTS, FOR WHICH ARRAYS OF THE
+    # PARAMETERS ARE RETURNED, NaN WHERE THE L-MOMENTS ARE INVALID.
+    if numpy.ndim(XMOM) > 1:
+        L1, L2, T3 = [numpy.asarray(M, dtype=float) for M in XMOM]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            G = (1.0 - 3.0 * T3) / (1.0 + T3)
+            PARA = numpy.array([L1 - (1.0 + G) * (2.0 + G) * L2 / (1.0 + G),
+                                (1.0 + G) * (2.0 + G) * L2,
+                                G])
+        PARA[:, (L2 <= 0.0) | (numpy.abs(T3) >= 1.0)] = numpy.nan
+        return PARA
+
     PARA = numpy.zeros(3)
     T3 = XMOM[2]
     if XMOM[1] <= 0.0:
@@ -180,7 +268,7 @@ def pelgpa(XMOM):
 
     return PARA
 
-def samlmu(X, NMOM):
+def samlmu(X, NMOM, axis=None, count=None):
     #***********************************************************************
     #*                                                                     *
     #*  FORTRAN CODE WRITTEN FOR INCLUSION IN IBM RESEARCH REPORT RC20525, *
@@ -207,89 +295,89 @@ def samlmu(X, NMOM):
     #  NMOM   * INPUT* NUMBER OF L-MOMENTS TO BE FOUND. AT MOST 100.
     #
 
-    # If NMOM == 3, use optimised code
-    if NMOM == 3:
-        return samlmu3(X)
+    #  X MAY ALSO BE AN N-D ARRAY SORTED ALONG AXIS `axis`, IN WHICH CASE
+    #  THE L-MOMENTS OF EACH SET OF VALUES ALONG THAT AXIS ARE STACKED
+    #  ALONG THE FIRST AXIS OF XMOM (NaN RATIOS WHERE ALL VALUES ARE
+    #  EQUAL). `count` OPTIONALLY GIVES THE NUMBER OF VALUES OF EACH SET,
+    #  TAKEN FROM THE END OF THE AXIS (SEE pwm).
 
     MAXMOM = 100
-    X = numpy.array(X)
-    N = numpy.size(X)
     NMOM = int(NMOM)
-    XMOM = numpy.zeros(NMOM)
-    COEF = numpy.zeros([2,NMOM])
-
     if NMOM > MAXMOM:
         print ' ** WARNING ** ROUTINE SAMLMU : PARAMETER NMOM INVALID'
         return
-    DN = N
-    XMOM[:] = 0.0
-    if NMOM <= 2.0:
-        # AT MOST TWO L-MOMENTS
-        SUM1 = 0.0
-        SUM2 = 0.0
-        TEMP = -DN + 1.0
-        for I in xrange(1,N+1):
-            SUM1 = SUM1 + X[I-1]
-            SUM2 = SUM2 + X[I-1]*TEMP
-            TEMP = TEMP + 2.0
-        XMOM[1-1] = SUM1/DN
-        if NMOM == 1:
-            return XMOM
-        XMOM[1] = SUM2/(DN*(DN-1.0))
-        return XMOM
-
-    # UNBIASED ESTIMATES OF L-MOMENTS -- THE 'DO 30' LOOP
-    # RECURSIVELY CALCULATES DISCRETE LEGENDRE POLYNOMIALS, VIA
-    # EQ.(9) OF NEUMAN AND SCHONBACH (1974, INT.J.NUM.METH.ENG.)
-    for J in xrange(3, NMOM + 1):
-        TEMP = 1.0/((J - 1)*(N - J + 1))
-        COEF[0,J-1] = (J + J - 3)*TEMP
-        COEF[1,J-1] = ((J - 2)*(N + J - 2))*TEMP
-
-    TEMP = -DN - 1.0
-    CONST = 1.0/(DN - 1.0)
-    NHALF = N/2
-    for I in xrange(1,NHALF + 1):
-        TEMP = TEMP + 2.0
-        XI = X[I-1]
-        XII = X[N - I]
-        TERMP = XI + XII
-        TERMN = XI - XII
-        XMOM[0] = XMOM[0] + TERMP
-        S1 = 1.0
-        S = TEMP*CONST
-        XMOM[1] = XMOM[1] + S*TERMN
-        for J in xrange(3,NMOM + 1,2):
-            S2 = S1
-            S1 = S
-            S = COEF[0,J - 1]*TEMP*S1 - COEF[1,J - 1]*S2
-            XMOM[J - 1] = XMOM[J - 1] + S*TERMP
-            if J == NMOM:
-                break
-            JJ = J + 1
-            S2 = S1
-            S1 = S
-            S = COEF[0,JJ - 1]*TEMP*S1 - COEF[1,JJ - 1]*S2
-            XMOM[JJ - 1] = XMOM[JJ - 1] + S*TERMN
-
-    if not (N == NHALF+NHALF):
-        TERM = X[NHALF]
-        S = 1.0
-        XMOM[0] = XMOM[0] + TERM
-        for J in xrange(3,NMOM+1,2):
-            S = -COEF[1, J - 1]*S
-            XMOM[J - 1] = XMOM[J - 1] + S*TERM
-
-    # L-MOMENT RATIOS
-    XMOM[0] = XMOM[0]/DN
-    if XMOM[1] == 0.0:
+
+    if axis is not None:
+        return lmoments(pwm(X, NMOM, axis, count))
+
+    XMOM = lmoments(pwm(numpy.ravel(X), NMOM))
+    if NMOM > 2 and XMOM[1] == 0.0:
         print ' *** ERROR *** ROUTINE SAMLMU : ALL DATA VALUES EQUAL'
-        XMOM[:] = 0.0
         return
-    for J in xrange(3, NMOM + 1):
-        XMOM[J - 1] = XMOM[J - 1]/XMOM[1]
-    XMOM[1] = XMOM[1]/DN
-    return numpy.array(XMOM)
+    return XMOM
+
+
+def pwm(X, NMOM, axis=0, count=None):
+    """
+    Unbiased sample probability weighted moments beta-0 to
+    beta-(NMOM - 1) of each set of data values along an axis, sorted in
+    ascending order (Hosking, 1990).
+
+    :param X: array of data values, sorted along `axis`.
+    :type X: :class:`numpy.ndarray`
+    :param int NMOM: number of moments.
+    :param int axis: axis of the sets of values.
+    :param count: optional array of the number of values of each set,
+                  taken from the end of the axis, so that leading
+                  values (such as zeros) are left out.
+
+    :return: array of the moments stacked along the first axis.
+    :rtype: :class:`numpy.ndarray`
+    """
+    X = numpy.moveaxis(numpy.asarray(X, dtype=float), axis, 0)
+    N = X.shape[0]
+    if count is None:
+        count = N
+    n = numpy.asarray(count, dtype=float)
+
+    # The rank, from 0, of each value among the last `count` values of
+    # its set, from which the weights (rank choose r) / (n - 1 choose r)
+    # of the moments follow recursively
+
+    rank = numpy.arange(N, dtype=float).reshape((N,) + (1,) * (X.ndim - 1))
+    rank = rank - (N - n)
+    weight = (rank >= 0.).astype(float)
+
+    B = numpy.empty((NMOM,) + X.shape[1:])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for r in xrange(NMOM):
+            if r > 0:
+                weight *= (rank - r + 1.) / (n - r)
+            B[r] = (weight * X).sum(axis=0) / n
+    return B
+
+
+def lmoments(B):
+    """
+    Sample L-moments from the probability weighted moments `B` (see
+    :func:`pwm`): lambda-1, lambda-2 and the L-moment ratios tau-3
+    onwards, stacked along the first axis.
+
+    :param B: array of probability weighted moments.
+    :type B: :class:`numpy.ndarray`
+
+    :return: array of L-moments.
+    :rtype: :class:`numpy.ndarray`
+    """
+    XMOM = numpy.zeros(B.shape)
+    for r in xrange(B.shape[0]):
+        for k in xrange(r + 1):
+            XMOM[r] += ((-1) ** (r - k) * special.comb(r, k, exact=True) *
+                        special.comb(r + k, k, exact=True) * B[k])
+    if B.shape[0] > 2:
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            XMOM[2:] /= XMOM[1]
+    return XMOM
 
 
 def samlmu3(X):
@@ -49,6 +49,9 @@ Members:
     Convert from compass bearing to cartesian angle (uses radians)
 - theta2bearing(angle) :
     Convert from cartesian angle to compass bearing (uses radians)
+- StencilCache(latStep, maxError) :
+    Cache of the polar grids returned by makeGrid, reused for all
+    storm centres falling in the same latitude band
 
 Still to be added: - error checking on function inputs
                    - xy2ll: inverse of ll2xy
@@ -526,6 +529,166 @@ def makeGrid(cLon, cLat, margin=2, resolution=0.01, minLon=None, maxLon=None,
 
     return R, theta
 
+def makePoints(cLon, cLat, lon, lat):
+    """
+    Calculate the distance and angle of a set of points from a storm
+    centre, as :func:`makeGrid` does for a grid of points. The storm
+    centre can also be an array of positions (e.g. the times of a
+    track), giving a row of distances and angles for each position.
+
+    :param cLon: longitude of the storm centre (or centres).
+    :param cLat: latitude of the storm centre (or centres).
+    :param lon: :class:`numpy.ndarray` of longitudes of the points.
+    :param lat: :class:`numpy.ndarray` of latitudes of the points.
+
+    :returns: distance (km) and cartesian angle (radians) of the points.
+    """
+    radius = 6367.0
+
+    cLon = np.radians(np.asarray(cLon, dtype=float))[..., np.newaxis]
+    cLat = np.radians(np.asarray(cLat, dtype=float))[..., np.newaxis]
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+
+    dLon = lon - cLon
+    dLat = lat - cLat
+
+    a = np.square(np.sin(dLat / 2.0)) + \
+        np.cos(cLat) * np.cos(lat) * np.square(np.sin(dLon / 2.0))
+    R = radius * 2.0 * np.arctan2(np.sqrt(np.absolute(a)), np.sqrt(1 - a))
+    np.putmask(R, R==0, 1e-30)
+
+    alpha = np.sin(dLon) * np.cos(lat)
+    beta = np.cos(cLat) * np.sin(lat) - \
+           np.sin(cLat) * np.cos(lat) * np.cos(dLon)
+    theta = np.pi / 2. - np.arctan2(alpha, beta)
+
+    return R, theta
+
+class StencilCache(object):
+    """
+    Cache of the polar grids (distance and angle from the storm centre)
+    generated by :func:`makeGrid`.
+
+    The grid returned by :func:`makeGrid` only depends on the latitude
+    of the storm centre (and the margin and resolution of the grid), so
+    a template calculated at the centre of a latitude band can be reused
+    for every storm centre in that band. Templates are keyed by
+    (latitude band, margin, resolution) and are built on first use.
+
+    When a template is built, the distances and angles are compared
+    against the exact grids at the edges of the band (including the
+    sub-millidegree offset of the grid points that :func:`makeGrid`
+    retains). If the distance error exceeds `maxError` (km) or the angle
+    error exceeds `maxAngle` (degrees), the band falls back to calling
+    :func:`makeGrid` directly. The angle at the storm centre itself is
+    undefined and is not compared.
+
+    :param float latStep: width of the latitude bands (degrees).
+    :param float maxError: maximum permitted error in the distance
+                           grid (km).
+    :param float maxAngle: maximum permitted error in the angle
+                           grid (degrees).
+
+    Example:
+    cache = StencilCache(0.1, 0.5, 2.0)
+    R, theta = cache.makeGrid(cLon, cLat, margin=2., resolution=0.05)
+    """
+
+    def __init__(self, latStep=0.1, maxError=0.5, maxAngle=2.0):
+        self.latStep = latStep
+        self.maxError = maxError
+        self.maxAngle = maxAngle
+        self.stencils = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.stencils)
+
+    def makeGrid(self, cLon, cLat, margin=2, resolution=0.01):
+        """
+        Return the distance and angle grids around the storm centre.
+        The returned arrays are shared between calls and are marked
+        read-only.
+
+        :param float cLon: longitude of the storm centre.
+        :param float cLat: latitude of the storm centre.
+        :param float margin: half-width of the grid (degrees).
+        :param float resolution: grid spacing (degrees).
+
+        :returns: distance (km) and cartesian angle (radians) grids.
+        """
+        band = int(np.round(cLat / self.latStep))
+        key = (band, margin, resolution)
+        try:
+            stencil = self.stencils[key]
+        except KeyError:
+            stencil = self.stencils[key] = self._build(band, margin,
+                                                       resolution)
+
+        if stencil is None:
+            self.misses += 1
+            return makeGrid(cLon, cLat, margin, resolution)
+
+        self.hits += 1
+        return stencil
+
+    def _build(self, band, margin, resolution):
+        """
+        Build the template for a latitude band and check its error
+        against the exact grids at the edges of the band.
+        """
+        gridSize = int(resolution * 1000)
+        gridMargin = int(1000 * margin)
+        offsets = np.arange(-gridMargin, gridMargin + 1, gridSize) / 1000.
+        cLat = band * self.latStep
+
+        R, theta = self._grid(cLat, offsets, 0.0)
+        centre = R <= 1e-30
+
+        error = 0.0
+        angle = 0.0
+        halfStep = 0.5 * self.latStep
+        for dLat in (-halfStep, halfStep):
+            Rexact, thetaExact = self._grid(cLat + dLat, offsets, 0.000999)
+            error = max(error, np.abs(Rexact - R).max())
+            dtheta = np.abs((thetaExact - theta + np.pi) % (2. * np.pi) -
+                            np.pi)
+            angle = max(angle, np.degrees(dtheta[~centre]).max())
+
+        if error > self.maxError:
+            logger.warning(("Stencil error of %.3f km exceeds %.3f km for "
+                            "latitude %.2f - using exact grids for this "
+                            "band" % (error, self.maxError, cLat)))
+            return None
+
+        if angle > self.maxAngle:
+            logger.warning(("Stencil angle error of %.3f degrees exceeds "
+                            "%.3f degrees for latitude %.2f - using exact "
+                            "grids for this band" %
+                            (angle, self.maxAngle, cLat)))
+            return None
+
+        logger.debug(("Built stencil for latitude %.2f (error %.3f km, "
+                      "%.3f degrees)" % (cLat, error, angle)))
+        R.flags.writeable = False
+        theta.flags.writeable = False
+        return R, theta
+
+    def _grid(self, cLat, offsets, frac):
+        """
+        Exact grid for a storm centre at (`frac`, `cLat + frac`), with
+        grid points at `offsets` from the millidegree-truncated centre.
+        """
+        lonArray = offsets
+        latArray = cLat + offsets
+        R = gridLatLonDist(frac, cLat + frac, lonArray, latArray)
+        np.putmask(R, R == 0, 1e-30)
+        theta = np.pi / 2. - gridLatLonBear(frac, cLat + frac,
+                                            lonArray, latArray)
+        return R, theta
+
 def makeGridDomain(cLon, cLat, minLon, maxLon, minLat, maxLat, 
                    margin=2, resolution=0.01):
     """
@@ -132,8 +132,13 @@ def ncGetData(ncobj, var):
     
     # Get the data:
     d = varobj[:]
-    
-    data = np.array(d, copy=True, dtype=varobj.dtype)
+
+    # Packed data keeps the type it is unpacked to
+    dtype = varobj.dtype
+    if hasattr(varobj, 'scale_factor') or hasattr(varobj, 'add_offset'):
+        dtype = d.dtype
+
+    data = np.array(d, copy=True, dtype=dtype)
 
     return data
 
@@ -314,6 +319,11 @@ def ncSaveGrid(filename, dimensions, variables, nodata=-9999,
 
     :param integer lsd: Variable data will be truncated to this number of significant digits.
 
+    Variables may also give their own 'least_significant_digit',
+    'nodata' and 'chunksizes'. Variables with 'scale_factor' and/or 'add_offset'
+    attributes are given unpacked values, and packed into their
+    'dtype' as they are written (and unpacked again by :func:`ncGetData`).
+
     :return: `netCDF4.Dataset` object (if keepfileopen=True)
     :rtype: :class:`netCDF4.Dataset`
 
@@ -360,18 +370,33 @@ def ncSaveGrid(filename, dimensions, variables, nodata=-9999,
         else:
             varlsd = lsd
 
+        if v.has_key('nodata'):
+            varnodata = v['nodata']
+        else:
+            varnodata = nodata
+
+        if v.has_key('chunksizes'):
+            varchunks = v['chunksizes']
+        else:
+            varchunks = None
+
         var = ncobj.createVariable(v['name'], v['dtype'],
                                    v['dims'], 
                                    zlib=zlib,
                                    complevel=complevel,
                                    least_significant_digit=varlsd,
-                                   fill_value=nodata)
+                                   fill_value=varnodata,
+                                   chunksizes=varchunks)
 
-        if (writedata and v['values'] is not None):
-            var[:] = np.array(v['values'], dtype=v['dtype'])
-    
         var.setncatts(v['atts'])
 
+        if (writedata and v['values'] is not None):
+            if ('scale_factor' in v['atts'] or 'add_offset' in v['atts']):
+                # Packed by netCDF4 as the values are written
+                var[:] = v['values']
+            else:
+                var[:] = np.array(v['values'], dtype=v['dtype'])
+
     # Additional global attributes:
     gatts['created_on'] = time.strftime(ISO_FORMAT, time.localtime())
     gatts['created_by'] = getpass.getuser()
@@ -13,15 +13,15 @@ to apply said multipliers to the output.
 import logging
 import pdb
 
+import os
 import datetime
 import numpy as np
 
 from os.path import join as pjoin
+from netCDF4 import Dataset, date2num
 
 from Utilities.config import ConfigParser
 from Utilities.files import flLoadFile
-from Utilities.maputils import find_index
-from matplotlib.dates import num2date
 from shptools import shpGetVertices
 
 #from config import NoOptionError
@@ -37,30 +37,88 @@ OUTPUT_FMT = ['%s', '%7.3f', '%7.3f',
               '%6.2f', '%6.2f', '%6.2f', '%6.2f', 
               '%7.2f']
 
+# Number of time steps the station buffers initially hold
+BUFFER_SIZE = 256
+
+# Name, units, standard name and long name of the variables of the
+# NetCDF output (in the order of the columns of the station buffers)
+NC_VARIABLES = [('speed', 'm/s', 'wind_speed', 'Wind speed'),
+                ('uu', 'm/s', 'eastward_wind', 'Eastward wind'),
+                ('vv', 'm/s', 'northward_wind', 'Northward wind'),
+                ('bearing', 'degrees', 'wind_from_direction',
+                 'Wind direction'),
+                ('pressure', 'Pa', 'air_pressure_at_sea_level',
+                 'Sea level pressure')]
+NC_TIME_UNITS = 'hours since 1900-01-01 00:00'
+NC_CALENDAR = 'standard'
+
 CONFIG_DEFAULTS = """
 [Timeseries]
 StationID=None
 """
 
+def nearestIndex(array, values):
+    """
+    Find the indices of the values of a sorted `array` closest to
+    each of `values`, as :func:`Utilities.maputils.find_index` does for
+    a single value (the first index on a tie, and the first or last
+    index for values beyond the array).
+
+    :param array: :class:`numpy.ndarray` of data values, in ascending order.
+    :param values: :class:`numpy.ndarray` of values to search `array` for.
+
+    :returns: :class:`numpy.ndarray` of indices of `array`.
+    """
+    if len(array) == 1:
+        return np.zeros(np.shape(values), dtype=int)
+    idx = np.clip(np.searchsorted(array, values), 1, len(array) - 1)
+    below = abs(array[idx - 1] - values) <= abs(array[idx] - values)
+    return np.where(below, idx - 1, idx)
+
+def loadStations(stnFile, keyName=None):
+    """
+    Load the stations of a station file, which is either a shape file
+    of points or a CSV file of station id, longitude and latitude
+    (followed by any columns of metadata).
+
+    :param str stnFile: path to the station file.
+    :param str keyName: the field of the shape file holding the
+                        station ids.
+
+    :returns: a list of :class:`Station` objects, and the metadata
+              columns of a CSV file (None if there are none).
+    """
+    log.debug("Loading stations from %s" % stnFile)
+    stations = []
+    metadata = None
+    if stnFile.endswith("shp"):
+        vertices = shpGetVertices(stnFile, key_name=keyName)
+
+        for stn in vertices.keys():
+            stations.append(Station(stn, vertices[stn][0][0],
+                                         vertices[stn][0][1]))
+
+    else:
+        stndata = flLoadFile(stnFile, delimiter=',')
+        # If there are more than 3 columns, save the additional
+        # columns as 'metadata'
+        if stndata.shape[1] > 3:
+            metadata = stndata[:, 3:]
+        stnid = stndata[:, 0]
+        stnlon = stndata[:, 1].astype(float)
+        stnlat = stndata[:, 2].astype(float)
+        for id, lon, lat in zip(stnid, stnlon, stnlat):
+            stations.append(Station(id, lon, lat))
+
+    return stations, metadata
+
 class Station(object):
     def __init__(self, station_id, longitude, latitude):
         
         self.id = station_id
         self.lon = longitude
         self.lat = latitude
-        self.data = []
 
-    def __getattr__(self, key):
-        """
-        Get the `key` from the `data` object.
-
-        :type  key: str
-        :param key: the key to lookup in the `data` object.
-        """
-        if key.startswith('__') and key.endswith('__'):
-            return super(Track, self).__getattr__(key)
-        return self.data[key]
-        
     def insideGrid(self, gridx, gridy):
         if (float(self.lon) >= gridx.min() and float(self.lon) <= gridx.max() and \
             float(self.lat) >= gridy.min() and float(self.lat) <= gridy.max()):
@@ -79,52 +137,66 @@ class Timeseries(object):
     Internal methods:
     """
 
-    def __init__(self, configFile):
+    def __init__(self, configFile, rank=None):
         """
         Read configuration settings, load station data and set up
         output recarrays.
         
         :param str configFile: path to a configuration file.
+        :param int rank: if given, the rank of the parallel process,
+                         which is appended to the names of the output
+                         files so that the processes never write (or
+                         remove) the same files. The files of all the
+                         processes are then merged (see :meth:`merge`).
         """
 
         config = ConfigParser()
         config.read(configFile)
 
-        self.meta = False
+        self.chunkSize = config.getint('Timeseries', 'ChunkSize')
+        self.format = config.get('Timeseries', 'Format').lower()
+        if self.format not in ('csv', 'netcdf'):
+            raise ValueError("Unknown timeseries format: %s" % self.format)
 
         stnFile = config.get('Timeseries', 'StationFile')
         self.outputPath = pjoin(config.get('Output', 'Path'), 
                                     'process', 'timeseries')
 
-        log.debug("Loading stations from %s"%stnFile)
+        self.rank = rank
+
         log.debug("Timeseries data will be written into %s"%self.outputPath)
-        self.stations = []
+        key_name = None
         if stnFile.endswith("shp"):
             try:
                 key_name = config.get('Timeseries', 'StationID')
             except NoOptionError:
                 key_name = None
-                
-            vertices = shpGetVertices(stnFile, key_name=key_name)
 
-            for stn in vertices.keys():
-                self.stations.append(Station(stn, vertices[stn][0][0], 
-                                                  vertices[stn][0][1]))
+        self.stations, self.metadata = loadStations(stnFile, key_name)
+        self.meta = self.metadata is not None
+
+        # The station coordinates, and the Speed, UU, VV, Bearing and
+        # Pressure of all the stations at each time step extracted (and
+        # whether each station was inside the grid), since the buffers
+        # were last written to file
+
+        self.stnlon = np.array([float(stn.lon) for stn in self.stations])
+        self.stnlat = np.array([float(stn.lat) for stn in self.stations])
+        self.times = []
+        self.values = np.zeros((BUFFER_SIZE, len(self.stations), 5))
+        self.inside = np.zeros((BUFFER_SIZE, len(self.stations)), dtype=bool)
+
+        # The stations that have seen any wind, and the stations whose
+        # output has been started
+
+        self.active = np.zeros(len(self.stations), dtype=bool)
+        self.written = np.zeros(len(self.stations), dtype=bool)
+
+        # The nearest nodes of the stations on the lattice of the grids
+        # last extracted from (see :meth:`gridIndices`)
+
+        self.lattice = None
 
-        
-        else:
-            stndata = flLoadFile(stnFile, delimiter=',')
-            # If there are more than 3 columns, save the additional 
-            # columns as 'metadata'
-            if stndata.shape[1] > 3:
-                self.metadata = stndata[:, 3:]
-                self.meta = True
-            stnid = stndata[:, 0]
-            stnlon = stndata[:, 1].astype(float)
-            stnlat = stndata[:, 2].astype(float)
-            for id, lon, lat in zip(stnid, stnlon, stnlat):
-                self.stations.append(Station(id, lon, lat))
-        
     def sample(self, lon, lat, spd, uu, vv, prs, gridx, gridy):
         """
         Extract values from 2-dimensional grids at the given lat/lon.
@@ -142,24 +214,70 @@ class Timeseries(object):
                  values at the given location
         :rtype: tuple
         """
-        x = find_index(gridx, float(lon))
-        y = find_index(gridy, float(lat))
+        x = nearestIndex(gridx, np.asarray(lon, dtype=float))
+        y = nearestIndex(gridy, np.asarray(lat, dtype=float))
         s = spd[y, x]
         u = uu[y, x]
         v = vv[y, x]
-        b = np.mod((180. / np.pi) * np.arctan2(-u, -v), 360.)
+        b = np.mod((180. / np.pi) * np.arctan2(-u, -v).astype(float), 360.)
         p = prs[y, x]
         
         return (s, u, v, b, p)
         
 
+    def gridIndices(self, gridx, gridy):
+        """
+        The indices of the grid nodes nearest to every station, as
+        :func:`nearestIndex` gives for stations inside the grid.
+
+        The grids around a storm step across the same regular lattice
+        (the regional grid) from one time step to the next, so the
+        nearest lattice nodes of the stations are only found again when
+        the grid is not on the lattice of the previous call. Each call
+        then only offsets them by the position of the grid.
+
+        :param gridx: :class:`numpy.ndarray` of grid longitudes.
+        :param gridy: :class:`numpy.ndarray` of grid latitudes.
+
+        :returns: the column and row indices of every station (outside
+                  the range of the grid for stations outside it).
+        """
+        if len(gridx) < 2 or len(gridy) < 2:
+            return (nearestIndex(gridx, self.stnlon),
+                    nearestIndex(gridy, self.stnlat))
+
+        dx = gridx[1] - gridx[0]
+        dy = gridy[1] - gridy[0]
+        if self.lattice is not None:
+            x0, y0, ldx, ldy, ix, iy = self.lattice
+            ox = (gridx[0] - x0) / dx
+            oy = (gridy[0] - y0) / dy
+            if (np.allclose([dx, dy], [ldx, ldy], rtol=1e-6, atol=0.) and
+                    abs(ox - round(ox)) < 1e-3 and abs(oy - round(oy)) < 1e-3):
+                return (ix - int(round(ox)), iy - int(round(oy)))
+
+        # The nearest node, taking the first on a tie. Stations without
+        # coordinates are never inside a grid, so their index is moot
+
+        with np.errstate(invalid='ignore'):
+            ix = np.ceil((self.stnlon - gridx[0]) / dx - 0.5)
+            iy = np.ceil((self.stnlat - gridy[0]) / dy - 0.5)
+        ix = np.where(np.isfinite(ix), ix, -1).astype(int)
+        iy = np.where(np.isfinite(iy), iy, -1).astype(int)
+        self.lattice = (gridx[0], gridy[0], dx, dy, ix, iy)
+        return (ix, iy)
+
     def extract(self, dt, spd, uu, vv, prs, gridx, gridy):
         """
         Extract data from the grid at the given locations.
-        Data is stored in a dictionary, with keys as the station id's.
+        All the stations inside the grid are sampled at once, and the
+        data appended to the buffers of all stations (with calm winds
+        outside the grid). The buffers are written to file every
+        `ChunkSize` time steps. The grid nodes of the stations are
+        found once for all the grids on the same lattice (see
+        :meth:`gridIndices`).
         
-        :param float tstep: time step being evaluated, as a float (output
-                            from matplotlib.num2date)
+        :param dt: time step being evaluated, as a :class:`datetime`.
         :param spd: :class:`numpy.ndarray` of speed values.
         :param uu: :class:`numpy.ndarray` of eastward wind speed values.
         :param vv: :class:`numpy.ndarray` of northward wind speed values.    
@@ -169,38 +287,356 @@ class Timeseries(object):
         
         """
 
-        for stn in self.stations:
-            if stn.insideGrid(gridx, gridy):
-                result = self.sample(stn.lon, stn.lat, spd, uu, vv, prs,
-                                      gridx, gridy)
-                s, u, v, b, p = result
-                stn.data.append([dt, stn.lon, stn.lat, s, u, v, b, p])
+        n = self._nextRow()
+
+        with np.errstate(invalid='ignore'):  # Stations without coordinates
+            mask = ((self.stnlon >= gridx.min()) &
+                    (self.stnlon <= gridx.max()) &
+                    (self.stnlat >= gridy.min()) &
+                    (self.stnlat <= gridy.max()))
+        inside, = np.nonzero(mask)
+        self.inside[n] = mask
+
+        row = self.values[n]
+        row[:, :4] = 0.0
+        row[:, 4] = prs[0, 0]
+        if len(inside) > 0:
+            ix, iy = self.gridIndices(gridx, gridy)
+            x = np.clip(ix[inside], 0, len(gridx) - 1)
+            y = np.clip(iy[inside], 0, len(gridy) - 1)
+            u = uu[y, x]
+            v = vv[y, x]
+            row[inside, 0] = spd[y, x]
+            row[inside, 1] = u
+            row[inside, 2] = v
+            row[inside, 3] = np.mod((180. / np.pi) *
+                                    np.arctan2(-u, -v).astype(float), 360.)
+            row[inside, 4] = prs[y, x]
+
+        self._appendRow(dt)
+
+    def extractPoints(self, dt, spd, uu, vv, prs, inside):
+        """
+        Append data evaluated at the stations themselves (see
+        :meth:`wind.WindfieldAroundTrack.pointTimeseries`) to the
+        buffers of all stations.
+
+        :param dt: time step being evaluated.
+        :param spd: :class:`numpy.ndarray` of speed values at the stations.
+        :param uu: :class:`numpy.ndarray` of eastward wind speed values.
+        :param vv: :class:`numpy.ndarray` of northward wind speed values.
+        :param prs: :class:`numpy.ndarray` of pressure values.
+        :param inside: :class:`numpy.ndarray` of whether each station is
+                       near enough to the storm to be sampled.
+        """
+        n = self._nextRow()
 
+        row = self.values[n]
+        row[:, 0] = spd
+        row[:, 1] = uu
+        row[:, 2] = vv
+        row[:, 3] = np.mod((180. / np.pi) * np.arctan2(-uu, -vv), 360.)
+        row[:, 4] = prs
+        row[~inside, :4] = 0.0
+        self.inside[n] = inside
+
+        self._appendRow(dt)
+
+    def _nextRow(self):
+        """
+        The index of the next row of the buffers, which are grown when
+        full.
+        """
+        n = len(self.times)
+        if n == len(self.values):
+            self.values = np.concatenate([self.values,
+                                          np.zeros_like(self.values)])
+            self.inside = np.concatenate([self.inside,
+                                          np.zeros_like(self.inside)])
+        return n
+
+    def _appendRow(self, dt):
+        """
+        Complete the next row of the buffers with the time `dt`, and
+        write the buffers to file once they hold `ChunkSize` time steps.
+        """
+        self.times.append(dt)
+        if self.chunkSize > 0 and len(self.times) >= self.chunkSize:
+            self.flush()
+
+
+    def popData(self):
+        """
+        Return the data extracted so far at every station, and clear it.
+        This collects the data extracted by a copy of the
+        :class:`Timeseries` in a worker process.
+
+        :returns: the times, the values at every station and whether
+                  each station was inside the grid.
+        """
+        n = len(self.times)
+        data = (self.times, self.values[:n].copy(), self.inside[:n].copy())
+        self.times = []
+        self.values = np.zeros((BUFFER_SIZE, len(self.stations), 5))
+        self.inside = np.zeros((BUFFER_SIZE, len(self.stations)), dtype=bool)
+        return data
+
+    def extendData(self, data):
+        """
+        Append data extracted elsewhere (see :meth:`popData`) to the
+        data of every station.
+
+        :param tuple data: the times, the values at every station and
+                           whether each station was inside the grid.
+        """
+        times, values, inside = data
+        n = len(self.times)
+        if n + len(times) > len(self.values):
+            self.values = np.concatenate([self.values[:n], values])
+            self.inside = np.concatenate([self.inside[:n], inside])
+        else:
+            self.values[n:n + len(times)] = values
+            self.inside[n:n + len(times)] = inside
+        self.times.extend(times)
+        if self.chunkSize > 0 and len(self.times) >= self.chunkSize:
+            self.flush()
+
+    def flush(self, final=False):
+        """
+        Write the data buffered since the last call to file, and clear
+        the buffers.
+
+        In CSV format, the data of each station is appended to a
+        separate file, one row per time step (with calm winds while the
+        station is outside the grid). Only stations that see some wind
+        are kept, so until the last call every station is written, and
+        the files of calm stations are removed by :meth:`shutdown`.
+
+        In NetCDF format, only the samples of the stations inside the
+        grid are appended to a single file, as a CF discrete sampling
+        geometry (an indexed ragged array of time series).
+
+        :param bool final: if True, this is the last call.
+        """
+        times, values, inside = self.popData()
+        self.active |= np.any(values[:, :, 0] > 0.0, axis=0)
+        if self.format == 'netcdf':
+            self._writeNetcdf(times, values, inside)
+        else:
+            self._writeCsv(times, values, final)
+
+    def _filename(self, stn=None, rank=None):
+        """
+        The output file of station `stn` (CSV format), or of all the
+        stations (NetCDF format), written by the parallel process
+        `rank` (or by a single process if None).
+        """
+        suffix = '' if rank is None else '.%03d' % rank
+        if stn is None:
+            return pjoin(self.outputPath, 'timeseries%s.nc' % suffix)
+        return pjoin(self.outputPath, 'ts.%s%s.csv' % (str(stn.id), suffix))
+
+    def _writeCsv(self, times, values, final):
+        """
+        Append data to the CSV file of every station.
+        """
+        header = ','.join(OUTPUT_NAMES)
+        times = [dt.strftime(ISO_FORMAT) for dt in times]
+
+        for j, stn in enumerate(self.stations):
+            if final and not (self.active[j] or self.written[j]):
+                continue
+
+            tmpdata = np.empty((len(times), 8), dtype=object)
+            tmpdata[:, 0] = times
+            tmpdata[:, 1] = stn.lon
+            tmpdata[:, 2] = stn.lat
+            tmpdata[:, 3:] = values[:, j, :]
+            fname = self._filename(stn, self.rank)
+
+            if self.written[j]:
+                with open(fname, 'a') as fh:
+                    np.savetxt(fh, tmpdata, fmt=OUTPUT_FMT, delimiter=',')
             else:
-                stn.data.append([dt, stn.lon, stn.lat, 0.0, 0.0,  
-                                          0.0, 0.0, prs[0, 0]])
-                    
+                with open(fname, 'w') as fh:
+                    np.savetxt(fh, tmpdata, fmt=OUTPUT_FMT, delimiter=',',
+                               header=header)
+                self.written[j] = True
+
+    def _writeNetcdf(self, times, values, inside):
+        """
+        Append the samples of the stations inside the grid to the
+        NetCDF file, creating it with the first samples.
+        """
+        step, stn = np.nonzero(inside)
+        if len(step) == 0:
+            return
+
+        fname = self._filename(rank=self.rank)
+        if self.written.all():
+            ncobj = Dataset(fname, 'a')
+        else:
+            ncobj = self._createNetcdf(fname)
+            self.written[:] = True
+
+        try:
+            start = len(ncobj.dimensions['obs'])
+            end = start + len(step)
+            hours = date2num(times, NC_TIME_UNITS, NC_CALENDAR)
+            ncobj.variables['time'][start:end] = np.asarray(hours)[step]
+            ncobj.variables['station_index'][start:end] = stn
+            for k, var in enumerate(NC_VARIABLES):
+                ncobj.variables[var[0]][start:end] = values[step, stn, k]
+        finally:
+            ncobj.close()
+
+    def _createNetcdf(self, fname):
+        """
+        Create the NetCDF file, holding the stations and no samples.
+
+        :returns: the open :class:`netCDF4.Dataset`.
+        """
+        ncobj = Dataset(fname, 'w', format='NETCDF4')
+        ncobj.createDimension('station', len(self.stations))
+        ncobj.createDimension('obs', None)
+
+        stnid = ncobj.createVariable('station_id', str, ('station',))
+        stnid.long_name = 'Station identifier'
+        stnid.cf_role = 'timeseries_id'
+        stnid[:] = np.array([str(stn.id) for stn in self.stations],
+                            dtype=object)
+
+        for name, units, values in [('longitude', 'degrees_east',
+                                     self.stnlon),
+                                    ('latitude', 'degrees_north',
+                                     self.stnlat)]:
+            var = ncobj.createVariable(name, 'f8', ('station',))
+            var.units = units
+            var.standard_name = name
+            var[:] = values
+
+        var = ncobj.createVariable('time', 'f8', ('obs',))
+        var.units = NC_TIME_UNITS
+        var.calendar = NC_CALENDAR
+        var.standard_name = 'time'
+
+        var = ncobj.createVariable('station_index', 'i4', ('obs',))
+        var.long_name = 'Index of the station of each sample'
+        var.instance_dimension = 'station'
+
+        for name, units, standard_name, long_name in NC_VARIABLES:
+            var = ncobj.createVariable(name, 'f8', ('obs',), zlib=True)
+            var.units = units
+            var.standard_name = standard_name
+            var.long_name = long_name
+            var.coordinates = 'time latitude longitude'
+
+        ncobj.Conventions = 'CF-1.6'
+        ncobj.featureType = 'timeSeries'
+        ncobj.title = 'Station time series'
+        return ncobj
+
+    def merge(self, ranks):
+        """
+        Merge the output files of the parallel processes `0` to
+        `ranks - 1` into the output files of a single process, and
+        remove them. This is called by one process once all of them
+        have shut down (see :meth:`shutdown`).
+
+        In CSV format, the rows of each station are concatenated in
+        rank order, and only the stations that see some wind are kept.
+        In NetCDF format, the samples are concatenated in rank order.
+
+        :param int ranks: the number of parallel processes.
+        """
+        if self.format == 'netcdf':
+            self._mergeNetcdf(ranks)
+        else:
+            self._mergeCsv(ranks)
+        log.info("Station data of %d processes merged" % ranks)
+
+    def _mergeCsv(self, ranks):
+        """
+        Concatenate the CSV files of each station written by the
+        parallel processes, one line at a time.
+        """
+        for stn in self.stations:
+            fnames = [self._filename(stn, rank) for rank in range(ranks)]
+            fnames = [fname for fname in fnames if os.path.exists(fname)]
+            if len(fnames) == 0:
+                continue
+
+            merged = self._filename(stn)
+            active = False
+            with open(merged, 'w') as out:
+                for k, fname in enumerate(fnames):
+                    with open(fname) as fh:
+                        for line in fh:
+                            if line.startswith('#'):
+                                if k == 0:
+                                    out.write(line)
+                                continue
+                            active = active or float(line.split(',')[3]) > 0.
+                            out.write(line)
+
+            for fname in fnames:
+                os.remove(fname)
+            if not active:
+                os.remove(merged)
+
+    def _mergeNetcdf(self, ranks):
+        """
+        Concatenate the samples of the NetCDF files written by the
+        parallel processes, one buffer of samples at a time.
+        """
+        fnames = [self._filename(rank=rank) for rank in range(ranks)]
+        fnames = [fname for fname in fnames if os.path.exists(fname)]
+        if len(fnames) == 0:
+            return
+
+        names = ['time', 'station_index'] + [var[0] for var in NC_VARIABLES]
+        chunk = BUFFER_SIZE * max(len(self.stations), 1)
+        ncobj = self._createNetcdf(self._filename())
+        try:
+            start = 0
+            for fname in fnames:
+                source = Dataset(fname)
+                try:
+                    nobs = len(source.dimensions['obs'])
+                    for first in range(0, nobs, chunk):
+                        last = min(first + chunk, nobs)
+                        end = start + last - first
+                        for name in names:
+                            ncobj.variables[name][start:end] = \
+                                source.variables[name][first:last]
+                        start = end
+                finally:
+                    source.close()
+        finally:
+            ncobj.close()
+
+        for fname in fnames:
+            os.remove(fname)
 
     def shutdown(self):
         """
-        Write the data to file, each station to a separate file.
+        Write the remaining data to file, and remove the files of the
+        stations that saw no wind (see :meth:`flush`). Only the files
+        this object created are removed. The files of a parallel
+        process are all kept, for the calm stations of all the
+        processes to be removed once merged (see :meth:`merge`).
         """
 
-        header = 'Time,Longitude,Latitude,Speed,UU,VV,Bearing,Pressure'
         #maxheader = ('Station,Longitude,Latitude,Time,Speed,'
         #                'UU,VV,Bearing,Pressure')
                 
-        for stn in self.stations:
-            
-            if np.any(np.array(stn.data)[:, 3] > 0.0):
-            
-                tmpdata = np.array(stn.data)
-                fname = pjoin(self.outputPath, 'ts.%s.csv' % str(stn.id))
-                tmpdata[:, 0] = np.array([tmpdata[i, 0].strftime(ISO_FORMAT) 
-                                    for i in xrange(tmpdata[:, 0].size)])
-
-                np.savetxt(fname, np.array(tmpdata), fmt=OUTPUT_FMT,
-                           delimiter=',', header=header)
+        parallel = self.rank is not None
+        self.flush(final=not parallel)
+
+        if self.format == 'csv' and not parallel:
+            for j in np.nonzero(self.written & ~self.active)[0]:
+                os.remove(self._filename(self.stations[j]))
+                self.written[j] = False
         
 
         """
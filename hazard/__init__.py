@@ -24,15 +24,14 @@ import sys
 import itertools
 import numpy as np
 import logging
-import random
 
 from os.path import join as pjoin
-from scipy.stats import scoreatpercentile as percentile
 from functools import wraps
 
 from Utilities.files import flProgramVersion
 from Utilities.config import ConfigParser
 from Utilities.parallel import attemptParallel, disableOnWorkers
+from Utilities.timeseries import loadStations
 import Utilities.nctools as nctools
 import evd
 
@@ -41,6 +40,16 @@ import pdb
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+#: Peak memory (bytes) of the hazard calculation for each record (event)
+#: of each grid point of a tile, without and with the confidence range
+#: (including the keys and order of the records shuffled for resampling)
+BYTES_PER_RECORD = 40
+BYTES_PER_RECORD_CI = 56
+
+#: The fewest tiles for each worker when running in parallel, so that
+#: the load stays balanced between them
+TILES_PER_WORKER = 4
+
 def setDomain(inputPath):
     """
     Establish the full extent of input wind field files
@@ -223,6 +232,97 @@ class TileGrid(object):
 
         return lon, lat
 
+class TileFile(object):
+    """
+    A file of the results of the hazard calculation for each tile of a
+    :class:`TileGrid`, that processes on different nodes can write their
+    tiles into directly.
+
+    Each tile is stored in a block of its own, at an offset given by the
+    position of the tile. The blocks are a whole number of pages, so the
+    processes never write to the same pages of the file.
+
+    """
+
+    PAGE_SIZE = 4096
+
+    def __init__(self, filename, tilegrid, nyears, calcCI=False):
+        """
+        :param str filename: path to the file.
+        :param tilegrid: :class:`TileGrid` instance
+        :param int nyears: number of return periods.
+        :param bool calcCI: if True, the tiles include the confidence
+                            range of the return period wind speeds.
+        """
+        self.filename = filename
+        self.tilegrid = tilegrid
+        self.nyears = nyears
+        self.calcCI = calcCI
+
+        # Fields of a tile: the return period wind speeds, the three
+        # distribution parameters and any confidence range
+        self.layers = [(nyears,), (), (), ()]
+        if calcCI:
+            self.layers += [(nyears,), (nyears,)]
+        self.depth = sum(int(np.prod(layer)) for layer in self.layers)
+
+        size = self.depth * tilegrid.xstep * tilegrid.ystep * 4
+        self.blockSize = -(-size // self.PAGE_SIZE) * self.PAGE_SIZE
+        self.ncols = int(np.ceil(tilegrid.xdim / float(tilegrid.xstep)))
+        self.nrows = int(np.ceil(tilegrid.ydim / float(tilegrid.ystep)))
+
+    def create(self):
+        """
+        Create the (sparse) file, large enough for all the tiles.
+        """
+        with open(self.filename, 'wb') as fh:
+            fh.truncate(self.ncols * self.nrows * self.blockSize)
+
+    def offset(self, limits):
+        """
+        Offset (bytes) of the block of the tile with `limits`.
+        """
+        x1, x2, y1, y2 = limits
+        col = (x1 - self.tilegrid.imin) // self.tilegrid.xstep
+        row = (y1 - self.tilegrid.jmin) // self.tilegrid.ystep
+        return (row * self.ncols + col) * self.blockSize
+
+    def write(self, result):
+        """
+        Write the `result` of a tile (see
+        :meth:`HazardCalculator.calculateHazard`) to its block.
+        """
+        limits = result[0]
+        data = np.concatenate([np.asarray(a, dtype='f').ravel()
+                               for a in result[1:]])
+        with open(self.filename, 'r+b') as fh:
+            fh.seek(self.offset(limits))
+            data.tofile(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def read(self, limits):
+        """
+        Read the result of the tile with `limits` from its block.
+
+        :returns: `tuple` of the tile limits and arrays, as
+                  :meth:`HazardCalculator.calculateHazard`.
+        """
+        x1, x2, y1, y2 = limits
+        shape = (y2 - y1, x2 - x1)
+        with open(self.filename, 'rb') as fh:
+            fh.seek(self.offset(limits))
+            data = np.fromfile(fh, dtype='f',
+                               count=self.depth * shape[0] * shape[1])
+
+        result = [limits]
+        start = 0
+        for layer in self.layers:
+            size = int(np.prod(layer + shape))
+            result.append(data[start:start + size].reshape(layer + shape))
+            start += size
+        return tuple(result)
+
 
 
 class HazardCalculator(object):
@@ -232,7 +332,7 @@ class HazardCalculator(object):
     """
 
     def __init__(self, configFile, tilegrid, numSim, minRecords, yrsPerSim,
-                 calcCI=False):
+                 calcCI=False, storeFile=None):
         """
         Initialise HazardCalculator object.
 
@@ -242,6 +342,9 @@ class HazardCalculator(object):
         :param int minRecords: minimum number of valid wind speed values required
                                to do fitting.
         :param int yrsPerSim:
+        :param str storeFile: optional gust store (see :func:`buildGustStore`)
+                              to load the tiles from, instead of the
+                              wind field files.
         """
         config = ConfigParser()
         config.read(configFile)
@@ -251,16 +354,19 @@ class HazardCalculator(object):
                                          'Years').split(',')).astype('f')
         self.outputPath = pjoin(config.get('Output', 'Path'), 'hazard')
         self.inputPath = pjoin(config.get('Output', 'Path'), 'windfield')
+        self.processPath = pjoin(config.get('Output', 'Path'), 'process')
         gridLimit = config.geteval('Region', 'gridLimit')
 
         self.numSim = numSim
         self.minRecords = minRecords
         self.yrsPerSim = yrsPerSim
         self.calcCI = calcCI
+        self.storeFile = storeFile
         if self.calcCI:
             log.debug("Bootstrap confidence intervals will be calculated")
             self.sample_size = config.getint('Hazard', 'SampleSize')
             self.prange = config.getint('Hazard', 'PercentileRange')
+            self.seed = config.getint('Hazard', 'Seed')
 
         self.tilegrid = tilegrid
         lon, lat = self.tilegrid.getDomainExtent()
@@ -274,6 +380,12 @@ class HazardCalculator(object):
         self.RPupper = np.zeros((len(self.years), len(lat), len(lon)), dtype='f')
         self.RPlower = np.zeros((len(self.years), len(lat), len(lon)), dtype='f')
 
+        # How the processes share the results of the tiles, if they do
+        # (see :meth:`shareOutput`)
+        self.shared = None
+        self.tileFile = TileFile(pjoin(self.processPath, 'hazard_tiles.dat'),
+                                 self.tilegrid, len(self.years), self.calcCI)
+
         self.global_atts = {'history': ('TCRM hazard simulation - '
                             'return period wind speeds'),
                             'version': flProgramVersion(),
@@ -294,24 +406,157 @@ class HazardCalculator(object):
 
         :param tilelimits: `tuple` of tile limits
         """
-        Vr = loadFilesFromPath(self.inputPath, tilelimits)
+        if self.storeFile:
+            Vr = loadTileFromStore(self.storeFile, self.tilegrid, tilelimits)
+        else:
+            Vr = loadFilesFromPath(self.inputPath, tilelimits)
 
         Rp, loc, scale, shp = calculate(Vr, self.years, self.nodata,
                                         self.minRecords, self.yrsPerSim)
 
         if self.calcCI:
+            # The resampling of each point draws on its own stream, seeded
+            # by the position of the point, so the intervals depend on
+            # neither the tiling nor which worker calculates the tile
+            x1, x2, y1, y2 = tilelimits
             RpUpper, RpLower = calculateCI(Vr, self.years, self.nodata,
                                            self.minRecords, self.yrsPerSim,
-                                           self.sample_size, self.prange)
+                                           self.sample_size, self.prange,
+                                           self.seed, (y1, x1))
 
             return (tilelimits, Rp, loc, scale, shp, RpUpper, RpLower)
         else:
             return (tilelimits, Rp, loc, scale, shp)
 
+    def outputNames(self):
+        """
+        Names of the output arrays, in the order of the results of
+        :meth:`calculateHazard`.
+        """
+        names = ['Rp', 'loc', 'scale', 'shp']
+        if self.calcCI:
+            names += ['RPupper', 'RPlower']
+        return names
+
+    def sharedArrayFile(self, name):
+        """
+        Path of the file memory-mapped as the shared output array `name`.
+        """
+        return pjoin(self.processPath, 'hazard.%s.npy' % name)
+
+    def createSharedArrays(self):
+        """
+        Replace the output arrays by arrays memory-mapped to files, which
+        hold the results of the tiles rather than the memory of the
+        master, and which the workers on the same node can write to.
+        """
+        for name in self.outputNames():
+            shape = getattr(self, name).shape
+            array = np.lib.format.open_memmap(self.sharedArrayFile(name),
+                                              mode='w+', dtype='f',
+                                              shape=shape)
+            setattr(self, name, array)
+
+    def openSharedArrays(self):
+        """
+        Open the output arrays created by :meth:`createSharedArrays`.
+        """
+        for name in self.outputNames():
+            setattr(self, name, np.load(self.sharedArrayFile(name),
+                                        mmap_mode='r+'))
+
+    def shareOutput(self):
+        """
+        Decide how the processes share the results of the tiles, rather
+        than the workers sending them to the master. When all processes
+        run on the same node, the workers write the results into the
+        output arrays memory-mapped by the master ('memmap'). Otherwise
+        they write them into a tile file (see :class:`TileFile`)
+        ('file'). Either way, the master only reads the results back one
+        tile at a time as it saves them (see :meth:`saveHazard`).
+        """
+        work_tag = 0
+        result_tag = 1
+        node = pp.get_processor_name()
+
+        if pp.rank() == 0:
+            nodes = set([node])
+            for d in range(1, pp.size()):
+                nodes.add(pp.receive(source=d, tag=result_tag))
+
+            self.shared = 'memmap' if len(nodes) == 1 else 'file'
+            if self.shared == 'memmap':
+                self.createSharedArrays()
+            else:
+                self.tileFile.create()
+            log.info("Sharing the hazard tiles by %s across %d node(s)" %
+                     (self.shared, len(nodes)))
+
+            for d in range(1, pp.size()):
+                pp.send(self.shared, destination=d, tag=work_tag)
+        else:
+            pp.send(node, destination=0, tag=result_tag)
+            self.shared = pp.receive(source=0, tag=work_tag)
+            if self.shared == 'memmap':
+                self.openSharedArrays()
+
+    @disableOnWorkers
+    def removeSharedOutput(self):
+        """
+        Remove the files of the shared output, once saved (see
+        :meth:`saveHazard`). The memory-mapped output arrays stay
+        readable until they are released.
+        """
+        if self.shared == 'memmap':
+            for name in self.outputNames():
+                os.unlink(self.sharedArrayFile(name))
+        elif self.shared == 'file':
+            os.unlink(self.tileFile.filename)
+
+    def storeTile(self, result):
+        """
+        Store the `result` of a tile (see :meth:`calculateHazard`) in the
+        output arrays.
+        """
+        # Reset the min/max bounds for the output array:
+        (xmin, xmax, ymin, ymax) = result[0]
+        xmin -= self.tilegrid.imin
+        xmax -= self.tilegrid.imin
+        ymin -= self.tilegrid.jmin
+        ymax -= self.tilegrid.jmin
+
+        for name, values in zip(self.outputNames(), result[1:]):
+            getattr(self, name)[..., ymin:ymax, xmin:xmax] = values
+
+    def tileResults(self):
+        """
+        Generate the result of each tile (see :meth:`calculateHazard`),
+        read back from the tile file or the output arrays (see
+        :meth:`shareOutput`), so that only one tile at a time is held
+        in memory.
+        """
+        for limits in getTiles(self.tilegrid):
+            if self.shared == 'file':
+                yield self.tileFile.read(limits)
+                continue
+
+            (xmin, xmax, ymin, ymax) = limits
+            xmin -= self.tilegrid.imin
+            xmax -= self.tilegrid.imin
+            ymin -= self.tilegrid.jmin
+            ymax -= self.tilegrid.jmin
+            yield (limits,) + tuple(np.array(getattr(self, name)
+                                             [..., ymin:ymax, xmin:xmax])
+                                    for name in self.outputNames())
+
     def dumpHazardFromTiles(self, tiles, progressCallback=None):
         """
         Iterate over tiles to calculate return period hazard levels
 
+        With MPI, the master hands out the tiles and the workers write
+        their results straight into the output arrays or a tile file
+        (see :meth:`shareOutput`), returning just the tile limits.
+
         Parameters:
         -----------
 
@@ -321,6 +566,9 @@ class HazardCalculator(object):
 
         work_tag = 0
         result_tag = 1
+        if pp.size() > 1:
+            self.shareOutput()
+
         if (pp.rank() == 0) and (pp.size() > 1):
             w = 0
             p = pp.size() - 1
@@ -338,31 +586,8 @@ class HazardCalculator(object):
 
             while(terminated < p):
 
-                result, status = pp.receive(pp.any_source, tag=result_tag,
-                                             return_status=True)
-
-                if self.calcCI:
-                    limits, Rp, loc, scale, shp, RPupper, RPlower = result
-                else:
-                    limits, Rp, loc, scale, shp = result
-
-
-                # Reset the min/max bounds for the output array:
-                (xmin, xmax, ymin, ymax) = limits
-                xmin -= self.tilegrid.imin
-                xmax -= self.tilegrid.imin
-                ymin -= self.tilegrid.jmin
-                ymax -= self.tilegrid.jmin
-
-                self.loc[ymin:ymax, xmin:xmax] = loc
-                self.scale[ymin:ymax, xmin:xmax] = scale
-                self.shp[ymin:ymax, xmin:xmax] = shp
-                self.Rp[:, ymin:ymax, xmin:xmax] = Rp[:, :, :]
-
-                if self.calcCI:
-                    self.RPupper[:, ymin:ymax, xmin:xmax] = RPupper[:, :, :]
-                    self.RPlower[:, ymin:ymax, xmin:xmax] = RPlower[:, :, :]
-
+                limits, status = pp.receive(pp.any_source, tag=result_tag,
+                                            return_status=True)
                 d = status.source
 
                 if w < len(tiles):
@@ -383,32 +608,21 @@ class HazardCalculator(object):
                 if W is None:
                     break
                 results = self.calculateHazard(W)
-                pp.send(results, destination=0, tag=result_tag)
+                if self.shared == 'memmap':
+                    self.storeTile(results)
+                else:
+                    self.tileFile.write(results)
+                pp.send(W, destination=0, tag=result_tag)
+
+            if self.shared == 'memmap':
+                for name in self.outputNames():
+                    getattr(self, name).flush()
 
         elif pp.size() == 1 and pp.rank() == 0:
             # Assumed no Pypar - helps avoid the need to extend DummyPypar()
             for i, tile in enumerate(tiles):
                 log.debug("Processing tile %d of %d" % (i, len(tiles)))
-                result = self.calculateHazard(tile)
-                if self.calcCI:
-                    limits, Rp, loc, scale, shp, RPupper, RPlower = result
-                else:
-                    limits, Rp, loc, scale, shp = result
-
-                # Reset the min/max bounds for the output array:
-                (xmin, xmax, ymin, ymax) = limits
-                xmin -= self.tilegrid.imin
-                xmax -= self.tilegrid.imin
-                ymin -= self.tilegrid.jmin
-                ymax -= self.tilegrid.jmin
-
-                self.loc[ymin:ymax, xmin:xmax] = loc
-                self.scale[ymin:ymax, xmin:xmax] = scale
-                self.shp[ymin:ymax, xmin:xmax] = shp
-                self.Rp[:, ymin:ymax, xmin:xmax] = Rp[:, :, :]
-                if self.calcCI:
-                    self.RPupper[:, ymin:ymax, xmin:xmax] = RPupper[:, :, :]
-                    self.RPlower[:, ymin:ymax, xmin:xmax] = RPlower[:, :, :]
+                self.storeTile(self.calculateHazard(tile))
 
                 if progressCallback:
                     progressCallback(i)
@@ -419,11 +633,17 @@ class HazardCalculator(object):
         """
         Save hazard data to a netCDF file.
 
+        The results are written one tile at a time (see
+        :meth:`tileResults`), into variables chunked by tile, so the
+        whole domain is never held in memory.
+
         """
 
         log.info("Saving hazard data file")
         # FIXME: need to ensure CF-1.6 and OGC compliance in output files.
         lon, lat = self.tilegrid.getDomainExtent()
+        chunks = (min(self.tilegrid.ystep, len(lat)),
+                  min(self.tilegrid.xstep, len(lon)))
 
         dimensions = {
             0: {
@@ -464,12 +684,12 @@ class HazardCalculator(object):
             0: {
                 'name': 'loc',
                 'dims': ('lat', 'lon'),
-                'values': self.loc,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': chunks,
                 'atts': {
                     'long_name': 'Location parameter for GEV distribution',
                     'units': 'm/s',
-                    'actual_range': (np.min(self.loc), np.max(self.loc)),
                     'valid_range': (0.0, 200.),
                     'grid_mapping': 'crs'
                 }
@@ -477,8 +697,9 @@ class HazardCalculator(object):
             1: {
                 'name': 'scale',
                 'dims': ('lat', 'lon'),
-                'values': self.scale,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': chunks,
                 'atts': {
                     'long_name': 'Scale parameter for GEV distribution',
                     'units': '',
@@ -488,8 +709,9 @@ class HazardCalculator(object):
             2: {
                 'name': 'shp',
                 'dims': ('lat', 'lon'),
-                'values': self.shp,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': chunks,
                 'least_significant_digit': 5,
                 'atts': {
                     'long_name': 'Shape parameter for GEV distribution',
@@ -500,12 +722,12 @@ class HazardCalculator(object):
             3: {
                 'name': 'wspd',
                 'dims': ('years', 'lat', 'lon'),
-                'values': self.Rp,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': (1,) + chunks,
                 'atts': {
                     'long_name': 'Return period wind speed',
                     'units': 'm/s',
-                    'actual_range': (np.min(self.Rp), np.max(self.Rp)),
                     'valid_range': (0.0, 200.),
                     'grid_mapping': 'crs'
                 }
@@ -513,8 +735,9 @@ class HazardCalculator(object):
             4: {
                 'name': 'wspdupper',
                 'dims': ('years', 'lat', 'lon'),
-                'values': self.RPupper,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': (1,) + chunks,
                 'atts': {
                     'long_name': 'Upper percentile return period wind speed',
                     'units': 'm/s',
@@ -526,8 +749,9 @@ class HazardCalculator(object):
             5: {
                 'name': 'wspdlower',
                 'dims': ('years', 'lat', 'lon'),
-                'values': self.RPlower,
+                'values': None,
                 'dtype': 'f',
+                'chunksizes': (1,) + chunks,
                 'atts': {
                     'long_name': 'Lower percentile return period wind speed',
                     'units': 'm/s',
@@ -551,13 +775,36 @@ class HazardCalculator(object):
         }
 
         # Create output file for return-period gust wind speeds and
-        # GEV parameters
-        nctools.ncSaveGrid(pjoin(self.outputPath, 'hazard.nc'),
-                           dimensions, variables,
-                           nodata=self.nodata,
-                           datatitle='TCRM hazard simulation',
-                           gatts=self.global_atts, writedata=True,
-                           keepfileopen=False)
+        # GEV parameters, and write the results tile by tile
+        ncobj = nctools.ncSaveGrid(pjoin(self.outputPath, 'hazard.nc'),
+                                   dimensions, variables,
+                                   nodata=self.nodata,
+                                   datatitle='TCRM hazard simulation',
+                                   gatts=self.global_atts, writedata=False,
+                                   keepfileopen=True)
+        try:
+            names = ['wspd', 'loc', 'scale', 'shp', 'wspdupper', 'wspdlower']
+            ranges = {'loc': [], 'wspd': []}
+            for result in self.tileResults():
+                (xmin, xmax, ymin, ymax) = result[0]
+                xmin -= self.tilegrid.imin
+                xmax -= self.tilegrid.imin
+                ymin -= self.tilegrid.jmin
+                ymax -= self.tilegrid.jmin
+
+                values = list(result[1:])
+                if not self.calcCI:
+                    values += [np.zeros_like(values[0])] * 2
+                for name, value in zip(names, values):
+                    ncobj.variables[name][..., ymin:ymax, xmin:xmax] = value
+                    if name in ranges:
+                        ranges[name].append((np.min(value), np.max(value)))
+
+            for name, extremes in ranges.items():
+                low, high = zip(*extremes)
+                ncobj.variables[name].actual_range = (min(low), max(high))
+        finally:
+            ncobj.close()
 
 
 def calculate(Vr, years, nodata, minRecords, yrsPerSim):
@@ -583,35 +830,37 @@ def calculate(Vr, years, nodata, minRecords, yrsPerSim):
     """
 
     Vr.sort(axis=0)
-    Rp = np.zeros((len(years),) + Vr.shape[1:], dtype='f')
-    loc = np.zeros(Vr.shape[1:], dtype='f')
-    scale = np.zeros(Vr.shape[1:], dtype='f')
-    shp = np.zeros(Vr.shape[1:], dtype='f')
-
-    for i in xrange(Vr.shape[1]):
-        for j in xrange(Vr.shape[2]):
-            if Vr[:,i,j].max() > 0.0:
-                w, l, sc, sh = evd.estimateEVD(Vr[:,i,j],
-                                               years,
-                                               nodata,
-                                               minRecords,
-                                               yrsPerSim)
-
-                Rp[:, i, j] = w
-                loc[i, j] = l
-                scale[i, j] = sc
-                shp[i, j] = sh
+
+    # Fit every point of the tile at once; points that never see any
+    # wind are left at zero rather than missing
+
+    w, l, sc, sh = evd.estimateEVDArray(Vr, years, nodata, minRecords,
+                                        yrsPerSim)
+    calm = Vr[-1] <= 0.
+    w[:, calm] = 0.
+    for param in (l, sc, sh):
+        param[calm] = 0.
+
+    Rp = w.astype('f')
+    loc = l.astype('f')
+    scale = sc.astype('f')
+    shp = sh.astype('f')
 
     return Rp, loc, scale, shp
 
 
 def calculateCI(Vr, years, nodata, minRecords, yrsPerSim=1,
-                sample_size=50, prange=90):
+                sample_size=50, prange=90, seed=None, origin=(0, 0)):
     """
     Fit a GEV to the wind speed records for a 2-D extent of
     wind speed values, providing a confidence range by resampling at
     random from the input values.
 
+    The records of each point are shuffled and split into samples of
+    `sample_size` records, and a GEV is fitted to every sample of every
+    point at once (see :func:`evd.estimateEVDArray`). The range is taken
+    over the samples that could be fitted.
+
     :param Vr: `numpy.ndarray` of wind speeds (3-D - event, lat, lon)
     :param years: `numpy.ndarray` of years for which to evaluate
                   return period values.
@@ -623,6 +872,11 @@ def calculateCI(Vr, years, nodata, minRecords, yrsPerSim=1,
     :param int sample_size: number of records to randomly sample for calculating
                             confidence interval of the fit.
     :param float prange: percentile range.
+    :param int seed: if given, the records of each point are shuffled
+                     by a stream of its own (see :func:`randomKeys`),
+                     otherwise by the global numpy PRNG.
+    :param origin: `tuple` of the indices of the first point of `Vr` in
+                   the domain.
 
 
     :return: `numpy.ndarray` of return period wind speed values
@@ -632,40 +886,133 @@ def calculateCI(Vr, years, nodata, minRecords, yrsPerSim=1,
     lower = (100 - prange) / 2.
     upper = 100. - lower
 
-    nrecords = Vr.shape[0]
+    nrecords, ny, nx = Vr.shape
     nsamples = nrecords / sample_size
-    RpUpper = nodata*np.ones((len(years), Vr.shape[1], Vr.shape[2]), dtype='f')
-    RpLower = nodata*np.ones((len(years), Vr.shape[1], Vr.shape[2]), dtype='f')
-
-    w = np.zeros((len(years), nsamples), dtype='f')
-    wUpper = np.zeros((len(years)), dtype='f')
-    wLower = np.zeros((len(years)), dtype='f')
-
-    for i in xrange(Vr.shape[1]):
-        for j in xrange(Vr.shape[2]):
-            if Vr[:, i, j].max() > 0.0:
-                random.shuffle(Vr[:, i, j])
-                for n in xrange(nsamples):
-                    nstart = n*sample_size
-                    nend  = (n + 1)*sample_size - 1
-                    vsub = Vr[nstart:nend, i, j]
-
-                    vsub.sort()
-                    if vsub.max( ) > 0.:
-                        w[:, n], loc, scale, shp = evd.estimateEVD(vsub, years, nodata,
-                                                                   minRecords/10, yrsPerSim)
-
-                for n in range(len(years)):
-                    wUpper[n] = percentile(w[n,:], upper)
-                    wLower[n] = percentile(w[n,:], lower)
-
-                RpUpper[:, i, j] = wUpper
-                RpLower[:, i, j] = wLower
+    RpUpper = nodata*np.ones((len(years), ny, nx), dtype='f')
+    RpLower = nodata*np.ones((len(years), ny, nx), dtype='f')
+
+    wet = Vr.max(axis=0) > 0.
+    if nsamples == 0 or not wet.any():
+        return RpUpper, RpLower
+
+    # Shuffle the records of each point by sorting random keys, then
+    # split them into samples, each sorted for fitting
+
+    if seed is None:
+        keys = np.random.random_sample(Vr.shape)
+    else:
+        keys = randomKeys(nrecords, (ny, nx), seed, origin)
+    order = keys.argsort(axis=0)
+    order = order[:nsamples * sample_size]
+    samples = np.take_along_axis(Vr, order, axis=0)
+    samples = samples.reshape((nsamples, sample_size, ny, nx))
+    samples.sort(axis=1)
+
+    w, loc, scale, shp = evd.estimateEVDArray(samples.swapaxes(0, 1), years,
+                                              nodata, minRecords/10,
+                                              yrsPerSim)
+
+    # The range over the samples that could be fitted
+
+    w[w == nodata] = np.nan
+    wLower = nanPercentile(w, lower, axis=1)
+    wUpper = nanPercentile(w, upper, axis=1)
+
+    fitted = wet & np.isfinite(wUpper)
+    RpUpper[fitted] = wUpper[fitted]
+    RpLower[fitted] = wLower[fitted]
 
     return RpUpper, RpLower
 
 
 
+def randomKeys(nrecords, shape, seed, origin=(0, 0)):
+    """
+    Random keys for shuffling the records of each point of a tile. Each
+    key is a hash (see :func:`mix64`) of `seed`, the position of the
+    point in the domain and the record, so the keys of a point are the
+    same whichever tile it falls in. The keys are evaluated as arrays,
+    a block of records at a time.
+
+    :param int nrecords: number of records of each point.
+    :param shape: `tuple` of the shape of the tile.
+    :param int seed: seed of the keys.
+    :param origin: `tuple` of the indices of the first point of the tile
+                   in the domain.
+
+    :return: `numpy.ndarray` of keys in [0, 1), as float32, of shape
+             `(nrecords,) + shape`.
+
+    """
+
+    y0, x0 = origin
+    ny, nx = shape
+    rows = np.arange(y0, y0 + ny, dtype=np.uint64)[:, np.newaxis]
+    cols = np.arange(x0, x0 + nx, dtype=np.uint64)[np.newaxis, :]
+    seeds = np.array([seed]).astype(np.uint64)
+    points = mix64(mix64(mix64(seeds) ^ rows) ^ cols)
+
+    keys = np.empty((nrecords, ny, nx), dtype='f')
+    records = np.arange(nrecords, dtype=np.uint64)[:, np.newaxis, np.newaxis]
+    block = max(1, 2 ** 20 // max(1, ny * nx))
+    for start in xrange(0, nrecords, block):
+        hashes = mix64(points ^ records[start:start + block])
+
+        # The top 24 bits, which a float32 holds exactly
+        keys[start:start + block] = hashes >> np.uint64(40)
+    keys *= 2. ** -24
+    return keys
+
+def mix64(h):
+    """
+    Hash an array of unsigned 64-bit integers, elementwise (the SplitMix64
+    generator of Steele et al., 2014, a bijection of the integers).
+
+    :param h: `numpy.ndarray` of `numpy.uint64` values.
+
+    :return: `numpy.ndarray` of hashed `numpy.uint64` values.
+
+    """
+
+    h = h + np.uint64(0x9E3779B97F4A7C15)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+def nanPercentile(a, q, axis=0):
+    """
+    The `q`-th percentile of the values of `a` along an `axis`, ignoring
+    NaNs, with linear interpolation between the values (as
+    :func:`numpy.nanpercentile`, which evaluates each set of values
+    separately).
+
+    :param a: `numpy.ndarray` of values.
+    :param float q: percentile, between 0 and 100.
+    :param int axis: axis along which the percentiles are taken.
+
+    :return: `numpy.ndarray` of percentiles, NaN where all the values
+             are NaN.
+
+    """
+
+    a = np.sort(a, axis=axis)
+    count = np.isfinite(a).sum(axis=axis)
+
+    # NaNs sort last, so the percentile lies between the values at the
+    # two positions either side of `q` percent of the finite values
+
+    position = q / 100. * np.maximum(count - 1, 0)
+    below = np.floor(position).astype(int)
+    above = np.minimum(below + 1, np.maximum(count - 1, 0))
+    fraction = position - below
+
+    low = np.take_along_axis(a, np.expand_dims(below, axis), axis=axis)
+    high = np.take_along_axis(a, np.expand_dims(above, axis), axis=axis)
+    result = (np.squeeze(low, axis=axis) * (1. - fraction) +
+              np.squeeze(high, axis=axis) * fraction)
+    result[count == 0] = np.nan
+    return result
+
 def loadFilesFromPath(inputPath, tilelimits):
     """
     Load wind field data for each subset into a 3-D array.
@@ -678,24 +1025,39 @@ def loadFilesFromPath(inputPath, tilelimits):
 
     """
 
-    fileList = os.listdir(inputPath)
-    files = [pjoin(inputPath, f) for f in fileList]
-    files = [f for f in files if os.path.isfile(f)]
+    files = windfieldFiles(inputPath)
     log.debug("Loading data from %d files" % (len(files)))
 
     ysize = tilelimits[3] - tilelimits[2]
     xsize = tilelimits[1] - tilelimits[0]
     Vr = np.empty((len(files), ysize, xsize), dtype='f')
 
-    for n, f in enumerate(sorted(files)):
+    for n, f in enumerate(files):
         Vr[n,:,:] = loadFile(f, tilelimits)
 
     return Vr
 
+def windfieldFiles(inputPath):
+    """
+    The wind field files (one for each event) of `inputPath`, in the
+    order their records are loaded.
+
+    :param str inputPath: path to wind field files.
+
+    :returns: sorted `list` of the paths of the files.
+
+    """
+
+    fileList = os.listdir(inputPath)
+    files = [pjoin(inputPath, f) for f in fileList]
+    return sorted([f for f in files if os.path.isfile(f)])
+
 def loadFile(filename, limits):
     """
     Load a subset of the data from the given file, with the extent
-    of the subset specified in the `limits` tuple
+    of the subset specified in the `limits` tuple. Wind speeds packed
+    as integers (see :attr:`wind.WindfieldGenerator.packOutput`) are
+    unpacked.
 
     :param str filename: str full path to file to load.
 
@@ -709,10 +1071,325 @@ def loadFile(filename, limits):
 
     ncobj = nctools.ncLoadFile(filename)
     ncobj_vmax = nctools.ncGetVar(ncobj, 'vmax')
+    ncobj_vmax.set_auto_maskandscale(True)
     data_subset = ncobj_vmax[ymin:ymax, xmin:xmax]
     ncobj.close()
     return data_subset
 
+def buildGustStore(inputPath, storeFile, tilegrid, batchSize=100):
+    """
+    Gather the wind speeds of all the wind field files in the domain of
+    `tilegrid` into a single file, holding vmax as (event, lat, lon) in
+    chunks of one tile. Each tile can then be loaded with a single read
+    (see :func:`loadTileFromStore`), rather than by opening every wind
+    field file for every tile. Events are in the order of the wind
+    field file names, as for :func:`loadFilesFromPath`.
+
+    The store is left as is if it is already up to date with the wind
+    field files and the tiles.
+
+    :param str inputPath: path to wind field files.
+    :param str storeFile: path to the store file.
+    :param tilegrid: :class:`TileGrid` instance.
+    :param int batchSize: number of events held in memory while building
+                          the store.
+
+    """
+
+    files = windfieldFiles(inputPath)
+
+    lon, lat = tilegrid.getDomainExtent()
+    shape = (len(files), len(lat), len(lon))
+
+    # Chunks of a whole tile, as long as the chunk stays below 1 GB
+
+    ystep = min(tilegrid.ystep, len(lat))
+    xstep = min(tilegrid.xstep, len(lon))
+    chunks = (max(1, min(len(files), 2**28 // (ystep * xstep))), ystep, xstep)
+
+    if gustStoreIsCurrent(storeFile, files, lon, lat, chunks):
+        log.info("Using the gust store %s" % storeFile)
+        return
+
+    log.info("Gathering %d wind field files into %s" %
+             (len(files), storeFile))
+
+    path = os.path.dirname(storeFile)
+    if path and not os.path.isdir(path):
+        os.makedirs(path)
+
+    dimensions = {
+        0: {
+            'name': 'event',
+            'values': np.arange(len(files)),
+            'dtype': 'i',
+            'atts': {
+                'long_name': 'Event number (sorted wind field file)'
+            }
+        },
+        1: {
+            'name': 'lat',
+            'values': lat,
+            'dtype': 'f',
+            'atts': {
+                'long_name': 'Latitude',
+                'standard_name': 'latitude',
+                'units': 'degrees_north',
+                'axis': 'Y'
+            }
+        },
+        2: {
+            'name': 'lon',
+            'values': lon,
+            'dtype': 'f',
+            'atts': {
+                'long_name': 'Longitude',
+                'standard_name': 'longitude',
+                'units': 'degrees_east',
+                'axis': 'X'
+            }
+        }
+    }
+
+    variables = {
+        0: {
+            'name': 'vmax',
+            'dims': ('event', 'lat', 'lon'),
+            'values': None,
+            'dtype': 'f',
+            'chunksizes': chunks,
+            'atts': {
+                'long_name': 'Maximum 3-second gust wind speed',
+                'units': 'm/s'
+            }
+        }
+    }
+
+    # Uncompressed, so that partial chunks can be written directly
+
+    ncobj = nctools.ncSaveGrid(storeFile, dimensions, variables,
+                               datatitle='TCRM gust store',
+                               writedata=False, keepfileopen=True,
+                               zlib=False)
+    vmax = ncobj.variables['vmax']
+
+    limits = (tilegrid.imin, tilegrid.imax + 1,
+              tilegrid.jmin, tilegrid.jmax + 1)
+    block = np.empty((min(batchSize, len(files)),) + shape[1:], dtype='f')
+    for start in xrange(0, len(files), batchSize):
+        batch = files[start:start + batchSize]
+        for n, f in enumerate(batch):
+            block[n, :, :] = loadFile(f, limits)
+        vmax[start:start + len(batch), :, :] = block[:len(batch)]
+
+    ncobj.close()
+
+def gustStoreIsCurrent(storeFile, files, lon, lat, chunks):
+    """
+    Check the gust store is newer than all the wind field files, covers
+    the expected domain and has the expected shape and chunks. A domain
+    shifted by whole grid cells has the same shape, so the coordinates
+    of the store are compared too.
+
+    :param str storeFile: path to the store file.
+    :param list files: the wind field files.
+    :param lon: :class:`numpy.ndarray` of the longitudes of the domain.
+    :param lat: :class:`numpy.ndarray` of the latitudes of the domain.
+    :param tuple chunks: the chunk sizes of the store.
+
+    :returns: True if the store can be used as is.
+
+    """
+
+    if not os.path.isfile(storeFile):
+        return False
+    modified = os.path.getmtime(storeFile)
+    if any(os.path.getmtime(f) > modified for f in files):
+        return False
+
+    try:
+        ncobj = nctools.ncLoadFile(storeFile)
+    except IOError:
+        return False
+    vmax = ncobj.variables['vmax']
+    current = (vmax.shape == (len(files), len(lat), len(lon)) and
+               vmax.chunking() == list(chunks) and
+               np.array_equal(ncobj.variables['lat'][:],
+                              np.asarray(lat, dtype='f')) and
+               np.array_equal(ncobj.variables['lon'][:],
+                              np.asarray(lon, dtype='f')))
+    ncobj.close()
+    return current
+
+def loadTileFromStore(storeFile, tilegrid, tilelimits):
+    """
+    Load the wind speeds of all events over a tile from the gust store
+    (see :func:`buildGustStore`).
+
+    :param str storeFile: path to the store file.
+    :param tilegrid: :class:`TileGrid` instance the store was built for.
+    :param tuple tilelimits: tuple of index limits of a tile.
+
+    :returns: 3-D `numpy.narray` of wind field records.
+
+    """
+
+    (xmin, xmax, ymin, ymax) = tilelimits
+    xmin -= tilegrid.imin
+    xmax -= tilegrid.imin
+    ymin -= tilegrid.jmin
+    ymax -= tilegrid.jmin
+
+    ncobj = nctools.ncLoadFile(storeFile)
+    vmax = nctools.ncGetVar(ncobj, 'vmax')
+    Vr = np.array(vmax[:, ymin:ymax, xmin:xmax], dtype='f')
+    ncobj.close()
+    return Vr
+
+def loadSiteGusts(filename):
+    """
+    Load the maximum wind gusts at the sites for each event (see
+    :func:`wind.saveSiteGusts`).
+
+    :param str filename: the site gust file.
+
+    :returns: the longitudes and latitudes of the sites, and a 2-D
+              `numpy.ndarray` of the gusts (event, site).
+
+    """
+
+    ncobj = nctools.ncLoadFile(filename)
+    lon = nctools.ncGetData(ncobj, 'lon')
+    lat = nctools.ncGetData(ncobj, 'lat')
+    vmax = np.array(nctools.ncGetData(ncobj, 'vmax'), dtype='f')
+    ncobj.close()
+    return lon, lat, vmax
+
+def saveSiteHazard(filename, stations, years, Rp, loc, scale, shp,
+                   RpUpper=None, RpLower=None):
+    """
+    Save the return period wind speeds and distribution parameters of
+    the sites to a table, one row per site.
+
+    :param str filename: the site hazard file.
+    :param list stations: :class:`Utilities.timeseries.Station` instances.
+    :param years: `numpy.ndarray` of return periods.
+    :param Rp: `numpy.ndarray` of return period wind speeds (years, site).
+    :param loc: `numpy.ndarray` of location parameters of the sites.
+    :param scale: `numpy.ndarray` of scale parameters of the sites.
+    :param shp: `numpy.ndarray` of shape parameters of the sites.
+    :param RpUpper: optional upper limits of the return period wind speeds.
+    :param RpLower: optional lower limits of the return period wind speeds.
+
+    """
+
+    columns = ['Station', 'Longitude', 'Latitude',
+               'Location', 'Scale', 'Shape']
+    columns += ['RP%g' % t for t in years]
+    values = [Rp]
+    if RpUpper is not None:
+        columns += ['RP%g_upper' % t for t in years]
+        columns += ['RP%g_lower' % t for t in years]
+        values += [RpUpper, RpLower]
+    values = np.concatenate(values).T
+
+    data = np.empty((len(stations), len(columns)), dtype=object)
+    data[:, 0] = [str(stn.id) for stn in stations]
+    data[:, 1] = [float(stn.lon) for stn in stations]
+    data[:, 2] = [float(stn.lat) for stn in stations]
+    data[:, 3] = loc
+    data[:, 4] = scale
+    data[:, 5] = shp
+    data[:, 6:] = values
+
+    fmt = ['%s', '%8.3f', '%8.3f', '%9.4f', '%9.4f', '%9.4f']
+    fmt += ['%7.2f'] * values.shape[1]
+    np.savetxt(filename, data, fmt=fmt, delimiter=',',
+               header=','.join(columns))
+
+@disableOnWorkers
+def runSites(configFile):
+    """
+    Run the hazard calculations at the sites of the station file only,
+    from the maximum gusts at the sites for each event (see
+    :func:`wind.saveSiteGusts`), rather than on the regional grid. The
+    return period wind speeds and distribution parameters of the sites
+    are saved to a table (see :func:`saveSiteHazard`).
+
+    :param configFile: str
+
+    """
+
+    config = ConfigParser()
+    config.read(configFile)
+
+    outputPath = config.get('Output', 'Path')
+    years = np.array(config.get('Hazard', 'Years').split(',')).astype('f')
+    yrsPerSim = config.getint('TrackGenerator', 'YearsPerSimulation')
+    minRecords = config.getint('Hazard', 'MinimumRecords')
+    calculate_confidence = config.getboolean('Hazard', 'CalculateCI')
+    nodata = -9999.
+
+    stations, _ = loadStations(config.get('Sites', 'StationFile'))
+    lon, lat, Vr = loadSiteGusts(pjoin(outputPath, 'process',
+                                       'site_gusts.nc'))
+    if Vr.shape[1] != len(stations):
+        raise ValueError("The site gusts hold %d sites, but the station "
+                         "file has %d" % (Vr.shape[1], len(stations)))
+
+    log.info("Calculating hazard at %d sites from %d events" %
+             (Vr.shape[1], Vr.shape[0]))
+
+    # The sites are treated as a single row of grid points
+
+    Vr = Vr[:, np.newaxis, :]
+    Rp, loc, scale, shp = calculate(Vr, years, nodata, minRecords, yrsPerSim)
+
+    RpUpper = RpLower = None
+    if calculate_confidence:
+        sample_size = config.getint('Hazard', 'SampleSize')
+        prange = config.getint('Hazard', 'PercentileRange')
+        seed = config.getint('Hazard', 'Seed')
+        RpUpper, RpLower = calculateCI(Vr, years, nodata, minRecords,
+                                       yrsPerSim, sample_size, prange, seed)
+        RpUpper, RpLower = RpUpper[:, 0], RpLower[:, 0]
+
+    saveSiteHazard(pjoin(outputPath, 'hazard', 'site_hazard.csv'),
+                   stations, years, Rp[:, 0], loc[0], scale[0], shp[0],
+                   RpUpper, RpLower)
+
+def planTiles(nevents, xdim, ydim, memory, workers=1, calcCI=False):
+    """
+    Choose the size of the hazard tiles. The tiles are as large as fits
+    in the `memory` of a worker, given the number of records of each
+    grid point, but no larger than gives each of several `workers` a
+    few tiles (see `TILES_PER_WORKER`). The tiles are square as far as
+    the domain allows.
+
+    :param int nevents: number of events (records of each grid point).
+    :param int xdim: size of the domain in the x-direction.
+    :param int ydim: size of the domain in the y-direction.
+    :param int memory: memory (bytes) available to each worker.
+    :param int workers: number of workers calculating tiles.
+    :param bool calcCI: if True, the confidence range is calculated.
+
+    :return: `tuple` of the size of the tiles in the x- and y-directions.
+
+    """
+
+    perPoint = max(1, nevents) * (BYTES_PER_RECORD_CI if calcCI
+                                  else BYTES_PER_RECORD)
+    points = max(1, int(memory // perPoint))
+    if workers > 1:
+        share = int(np.ceil(xdim * ydim / float(TILES_PER_WORKER * workers)))
+        points = min(points, max(1, share))
+
+    xstep = int(min(xdim, max(1, np.sqrt(points))))
+    ystep = int(min(ydim, max(1, points // xstep)))
+    if ystep == ydim:
+        xstep = int(min(xdim, max(1, points // ystep)))
+    return xstep, ystep
+
 def getTiles(tilegrid):
     """
     Helper to obtain a generator that yields tile numbers
@@ -802,15 +1479,46 @@ def run(configFile, callback=None):
     minRecords = config.getint('Hazard', 'MinimumRecords')
     calculate_confidence = config.getboolean('Hazard', 'CalculateCI')
 
-    wf_lon, wf_lat = setDomain(inputPath)
-
     global pp
     pp = attemptParallel()
 
+    if config.getboolean('Sites', 'Enabled'):
+        log.info("Running hazard calculations at the sites")
+        runSites(configFile)
+        pp.barrier()
+        log.info("Completed hazard calculation")
+        return
+
+    wf_lon, wf_lat = setDomain(inputPath)
+
     log.info("Running hazard calculations")
     TG = TileGrid(gridLimit, wf_lon, wf_lat)
+
+    # Size the tiles to the memory of the workers, unless fixed
+
+    memory = config.getint('Hazard', 'TileMemory')
+    if memory > 0:
+        nevents = len(windfieldFiles(inputPath))
+        workers = max(1, pp.size() - 1)
+        xstep, ystep = planTiles(nevents, TG.xdim, TG.ydim,
+                                 memory * 1024 ** 2, workers,
+                                 calculate_confidence)
+        TG = TileGrid(gridLimit, wf_lon, wf_lat, xstep, ystep)
+        perRecord = (BYTES_PER_RECORD_CI if calculate_confidence
+                     else BYTES_PER_RECORD)
+        log.info("Hazard tiles of %d x %d points (%d tile(s)) for %d events "
+                 "and %d worker(s), about %d MB each of %d MB" %
+                 (xstep, ystep, TG.num_tiles, nevents, workers,
+                  xstep * ystep * nevents * perRecord / 1024 ** 2, memory))
+
     tiles = getTiles(TG)
 
+    storeFile = None
+    if config.getboolean('Hazard', 'GustStore'):
+        storeFile = pjoin(outputPath, 'process', 'gust_store.nc')
+        if pp.rank() == 0:
+            buildGustStore(inputPath, storeFile, TG)
+
     #def progress(i):
     #    callback(i, len(tiles))
 
@@ -819,7 +1527,8 @@ def run(configFile, callback=None):
                           numsimulations,
                           minRecords,
                           yrsPerSim,
-                          calculate_confidence)
+                          calculate_confidence,
+                          storeFile)
 
 
 
@@ -829,6 +1538,7 @@ def run(configFile, callback=None):
     pp.barrier()
 
     hc.saveHazard()
+    hc.removeSharedOutput()
 
     log.info("Completed hazard calculation")
 
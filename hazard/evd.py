@@ -17,6 +17,8 @@ References:
 import logging as log
 import numpy as np
 
+from Utilities import lmomentFit
+
 try:
     import lmoments as lmom
 except ImportError:
@@ -91,3 +93,72 @@ def estimateEVD(v, years, missingValue=-9999., minRecords=50, yrspersim=1):
                 w[i] = missingValue
 
     return w, loc, scale, shp
+
+def estimateEVDArray(v, years, missingValue=-9999., minRecords=50,
+                     yrspersim=1):
+    """
+    Calculate extreme value distribution parameters for many sets of data
+    values at once, such as the wind speeds at each point of a grid. The
+    result for each set along the first axis is that of
+    :func:`estimateEVD`, but the L-moments, parameters and return period
+    values are evaluated as whole arrays.
+
+    :param v: array of data values, not negative and sorted in ascending
+              order along the first axis.
+    :type v: :class:`numpy.ndarray`
+    :param years: array of years for which to calculate return period values.
+    :type years: :class:`numpy.ndarray`
+    :param float missingValue: value to insert if fit does not converge.
+    :param int minRecords: minimum number of valid observations required to
+                           perform fitting.
+    :param int yrspersim: data represent block maxima - this gives the length
+                          of each block in years.
+
+    :return: return period values, of shape `(len(years),) + v.shape[1:]`
+    :rtype: :class:`numpy.ndarray`
+    :return: location, scale and shape parameters of the distributions,
+             of shape `v.shape[1:]`
+    :rtype: :class:`numpy.ndarray`
+    """
+    yrspersim = float(yrspersim)
+    missingValue = float(missingValue)
+    years = np.array(years, dtype=float)
+    N = v.shape[0]
+
+    # The zero values sort first, so the valid values of each set are
+    # its last `count` values
+    count = np.count_nonzero(v, axis=0)
+    first = np.minimum(N - count, N - 1)[np.newaxis]
+    vmin = np.take_along_axis(v, first, axis=0)[0]
+    vmax = v[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        l1, l2, l3 = lmomentFit.samlmu(v, 3, axis=0, count=count)
+        t3 = l3 / l2
+
+        # Only fit sets where the values are not all equal, with enough
+        # valid values and valid l-moments
+        valid = ((vmax > 0.) & (vmin != vmax) & (count >= minRecords) &
+                 (l2 > 0.) & (np.abs(t3) < 1.))
+
+        loc = np.empty(v.shape[1:])
+        scale = np.empty(v.shape[1:])
+        shp = np.empty(v.shape[1:])
+        loc[valid], scale[valid], shp[valid] = lmomentFit.pelgev(
+            [l1[valid], l2[valid], t3[valid]])
+
+        # We only store the values if the location parameter is finite
+        valid &= np.isfinite(loc)
+        loc[~valid] = missingValue
+        scale[~valid] = missingValue
+        shp[~valid] = missingValue
+
+        t = years.reshape((-1,) + (1,) * shp.ndim)
+        x = -1. * np.log(1. - yrspersim / t)
+        w = loc + (scale / shp) * (1. - np.power(x, shp))
+
+    # Replace any non-finite numbers with the missing value:
+    w[:, ~valid] = missingValue
+    w[~np.isfinite(w)] = missingValue
+
+    return w, loc, scale, shp
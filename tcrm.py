@@ -167,6 +167,11 @@ def doOutputDirectoryCreation(configFile):
                'plots/stats', 'log', 'process', 'process/timeseries',
                'process/dat']
 
+    # Sites mode keeps the gusts at the sites only, in process/
+
+    if config.getboolean('Sites', 'Enabled'):
+        subdirs.remove('windfield')
+
     if not isdir(outputPath):
         try:
             os.makedirs(outputPath)
@@ -209,12 +214,14 @@ def doTrackGeneration(configFile):
     log.info('Completed track generation')
 
 
-def doWindfieldCalculations(configFile):
+def doWindfieldCalculations(configFile, processes=None):
     """
     Do the wind field calculations. The wind field settings are read
     from *configFile*.
 
     :param str configFile: Name of configuration file.
+    :param int processes: Optional number of worker processes, overriding
+                          the configuration setting.
 
     """
 
@@ -231,7 +238,7 @@ def doWindfieldCalculations(configFile):
         pbar.update(float(done)/total)
 
     import wind
-    wind.run(configFile, status)
+    wind.run(configFile, status, processes)
 
     pbar.update(1.0)
     log.info('Completed wind field calculations')
@@ -442,6 +449,10 @@ def doHazardPlotting(configFile):
     config = ConfigParser()
     config.read(configFile)
 
+    if config.getboolean('Sites', 'Enabled'):
+        log.info('No hazard maps to plot in sites mode')
+        return
+
     log.info('Plotting Hazard Maps')
 
     showProgressBar = config.get('Logging', 'ProgressBar')
@@ -471,13 +482,15 @@ def doEvaluation(configFile):
     
 
 @timer
-def main(configFile='main.ini'):
+def main(configFile='main.ini', processes=None):
     """
     Main interface of TCRM that allows control and interaction with the
     5 interfaces: DataProcess, StatInterface, TrackGenerator,
     WindfieldInterface and HazardInterface
 
     :param str configFile: Name of file containing configuration settings for running TCRM
+    :param int processes: Optional number of worker processes for the
+                          wind field calculations.
 
     """
 
@@ -512,7 +525,7 @@ def main(configFile='main.ini'):
     pp.barrier()
 
     if config.getboolean('Actions', 'ExecuteWindfield'):
-        doWindfieldCalculations(configFile)
+        doWindfieldCalculations(configFile, processes)
 
     pp.barrier()
 
@@ -545,6 +558,8 @@ def startup():
                         action='store_true')
     parser.add_argument('-d', '--debug', help='Allow pdb traces',
                         action='store_true')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='Number of worker processes for the wind fields')
     args = parser.parse_args()
 
     configFile = args.config_file
@@ -605,10 +620,10 @@ def startup():
     warnings.filterwarnings("ignore", category=RuntimeWarning)
     
     if debug:
-        main(configFile)
+        main(configFile, args.processes)
     else:
         try:
-            main(configFile)
+            main(configFile, args.processes)
         except Exception:  # pylint: disable=W0703
             # Catch any exceptions that occur and log them (nicely):
             tblines = traceback.format_exc().splitlines()
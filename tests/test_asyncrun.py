@@ -0,0 +1,100 @@
+"""
+Testing the background writer
+"""
+
+import sys
+import threading
+import unittest
+
+try:
+    import pathLocate
+except:
+    from unittests import pathLocate
+
+# Add parent folder to python path
+sys.path.append(pathLocate.getRootDirectory())
+from Utilities.AsyncRun import AsyncWriter
+
+
+class TestAsyncWriter(unittest.TestCase):
+
+    def testOrder(self):
+        """Testing writes are made in order"""
+        for size in [0, 1, 3]:
+            written = []
+            writer = AsyncWriter(size)
+            for i in range(10):
+                writer.put(written.append, i)
+            writer.close()
+            self.assertEqual(written, range(10))
+
+    def testBackPressure(self):
+        """Testing a full queue blocks the caller"""
+        release = threading.Event()
+        writer = AsyncWriter(1)
+        writer.put(release.wait)
+        writer.put(release.wait)
+
+        blocked = threading.Thread(target=writer.put, args=(release.wait,))
+        blocked.start()
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+
+        release.set()
+        blocked.join()
+        writer.close()
+
+    def testError(self):
+        """Testing a failed write is raised in the caller"""
+        def fail(value):
+            raise IOError(value)
+
+        written = []
+        release = threading.Event()
+        writer = AsyncWriter(3)
+        writer.put(release.wait)
+        writer.put(fail, 'disk full')
+        writer.put(written.append, 1)
+        release.set()
+        self.assertRaises(IOError, writer.close)
+        self.assertEqual(written, [])
+
+        writer = AsyncWriter(2)
+        writer.put(fail, 'disk full')
+        while writer.error is None:
+            writer.join(0.01)
+        self.assertRaises(IOError, writer.put, written.append, 2)
+        writer.close()
+        self.assertEqual(written, [])
+
+    def testSerialised(self):
+        """Testing serialised calls never overlap a write"""
+        events = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def write():
+            started.set()
+            release.wait()
+            events.append('write')
+
+        writer = AsyncWriter(2)
+        writer.put(write)
+        started.wait()
+
+        call = threading.Thread(target=writer.serialised(events.append),
+                                args=('call',))
+        call.start()
+        call.join(0.2)
+        self.assertTrue(call.is_alive())
+
+        release.set()
+        call.join()
+        self.assertEqual(list(writer.iterate(range(3))), range(3))
+        writer.close()
+        self.assertEqual(events, ['write', 'call'])
+        self.assertEqual(writer.serialised(None), None)
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestAsyncWriter, 'test')
+    unittest.TextTestRunner().run(suite)
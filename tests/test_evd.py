@@ -6,7 +6,7 @@ import unittest
 import numpy as np
 
 from numpy.testing import assert_almost_equal
-from hazard.evd import estimateEVD
+from hazard.evd import estimateEVD, estimateEVDArray
 
 
 class TestEvd(unittest.TestCase):
@@ -45,6 +45,32 @@ class TestEvd(unittest.TestCase):
         assert_almost_equal(scale2, self.missingValue, decimal=5)
         assert_almost_equal(shp2, self.missingValue, decimal=5)
 
+    def testEVDArray(self):
+        """Testing extreme value distributions fitted as arrays"""
+        rs = np.random.RandomState(1)
+        v = np.zeros((60, 2, 3))
+        v[:7, 0, 0] = self.v
+        v[:, 0, 1] = rs.gumbel(30., 8., 60)
+        v[:30, 0, 2] = 40.
+        v[:, 1, 1] = rs.gumbel(30., 8., 60)
+        v[:2, 1, 1] = 0.
+        v[:, 1, 2] = 60. - 10. * rs.rand(60)
+        v.sort(axis=0)
+
+        w, loc, scale, shp = estimateEVDArray(v, self.years, -9999., 3, 10)
+        self.assertEqual(w.shape, (6, 2, 3))
+        for i in range(2):
+            for j in range(3):
+                w0, loc0, scale0, shp0 = estimateEVD(v[:, i, j], self.years,
+                                                     -9999., 3, 10)
+                assert_almost_equal(w[:, i, j], w0, decimal=5)
+                assert_almost_equal(loc[i, j], loc0, decimal=5)
+                assert_almost_equal(scale[i, j], scale0, decimal=5)
+                assert_almost_equal(shp[i, j], shp0, decimal=5)
+        assert_almost_equal(w[:, 0, 0], self.w0, decimal=5)
+        self.assertTrue((w[:, 1, 0] == -9999.).all())
+        self.assertTrue((w[:, 0, 2] == -9999.).all())
+
 if __name__ == "__main__":
     suite = unittest.makeSuite(TestEvd, 'test')
     unittest.TextTestRunner().run(suite)
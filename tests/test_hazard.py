@@ -0,0 +1,340 @@
+"""
+Testing the hazard calculation
+"""
+
+import os
+import sys
+import Queue
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+
+from numpy.testing import assert_almost_equal
+try:
+    import pathLocate
+except:
+    from unittests import pathLocate
+
+# Add parent folder to python path
+sys.path.append(pathLocate.getRootDirectory())
+from Utilities import nctools
+from Utilities.config import ConfigParser
+from Utilities.timeseries import Station
+import hazard
+import wind
+from hazard import TileGrid
+from hazard.evd import estimateEVD
+
+
+class Status(object):
+    def __init__(self, source):
+        self.source = source
+
+class NodesPypar(object):
+    """
+    Processes each on a node of its own, run as threads (the rank is
+    that of the calling thread), exchanging messages through queues.
+    """
+    any_source = -1
+
+    def __init__(self, size):
+        self.local = threading.local()
+        self.queues = [Queue.Queue() for _ in range(size)]
+
+    def size(self):
+        return len(self.queues)
+
+    def rank(self):
+        return self.local.rank
+
+    def get_processor_name(self):
+        return 'node%d' % self.rank()
+
+    def send(self, obj, destination, tag):
+        self.queues[destination].put((self.rank(), tag, obj))
+
+    def receive(self, source, tag, return_status=False):
+        waiting = []
+        while True:
+            message = self.queues[self.rank()].get()
+            if source in (self.any_source, message[0]) and message[1] == tag:
+                break
+            waiting.append(message)
+        for other in waiting:
+            self.queues[self.rank()].put(other)
+        if return_status:
+            return message[2], Status(message[0])
+        return message[2]
+
+class TestGustStore(unittest.TestCase):
+
+    def setUp(self):
+        hazard.pp = hazard.attemptParallel()
+        self.tmpdir = tempfile.mkdtemp()
+        self.inputPath = os.path.join(self.tmpdir, 'windfield')
+        os.mkdir(self.inputPath)
+
+        self.lon = np.arange(110., 112.01, 0.1)
+        self.lat = np.arange(-20., -18.49, 0.1)
+        rs = np.random.RandomState(1)
+        for k in range(7):
+            dimensions = {
+                0: {'name': 'lat', 'values': self.lat, 'dtype': 'f',
+                    'atts': {}},
+                1: {'name': 'lon', 'values': self.lon, 'dtype': 'f',
+                    'atts': {}}}
+            variables = {
+                0: {'name': 'vmax', 'dims': ('lat', 'lon'),
+                    'values': 50. * rs.rand(len(self.lat), len(self.lon)),
+                    'dtype': 'f', 'atts': {}}}
+            nctools.ncSaveGrid(os.path.join(self.inputPath,
+                                            'gust.%05d.nc' % k),
+                               dimensions, variables)
+
+        self.gridLimit = {'xMin': 110.3, 'xMax': 111.8,
+                          'yMin': -19.9, 'yMax': -18.7}
+        self.tilegrid = TileGrid(self.gridLimit, self.lon, self.lat, 4, 5)
+        self.storeFile = os.path.join(self.tmpdir, 'process', 'store.nc')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testStore(self):
+        """Testing tiles of the gust store match the wind field files"""
+        hazard.buildGustStore(self.inputPath, self.storeFile, self.tilegrid,
+                              batchSize=3)
+
+        for limits in hazard.getTiles(self.tilegrid):
+            expected = hazard.loadFilesFromPath(self.inputPath, limits)
+            Vr = hazard.loadTileFromStore(self.storeFile, self.tilegrid,
+                                          limits)
+            self.assertEqual(Vr.shape, expected.shape)
+            assert_almost_equal(Vr, expected)
+
+    def testCurrent(self):
+        """Testing the gust store is only rebuilt when out of date"""
+        hazard.buildGustStore(self.inputPath, self.storeFile, self.tilegrid)
+        modified = os.path.getmtime(self.storeFile) - 10.
+        os.utime(self.storeFile, (modified, modified))
+        for f in os.listdir(self.inputPath):
+            os.utime(os.path.join(self.inputPath, f),
+                     (modified - 10., modified - 10.))
+
+        hazard.buildGustStore(self.inputPath, self.storeFile, self.tilegrid)
+        self.assertAlmostEqual(os.path.getmtime(self.storeFile), modified,
+                               places=3)
+
+        tilegrid = TileGrid({'xMin': 110.3, 'xMax': 111.8,
+                             'yMin': -19.9, 'yMax': -18.7},
+                            self.lon, self.lat, 6, 6)
+        hazard.buildGustStore(self.inputPath, self.storeFile, tilegrid)
+        self.assertTrue(os.path.getmtime(self.storeFile) > modified + 1.)
+
+        os.utime(self.storeFile, (modified, modified))
+        os.utime(os.path.join(self.inputPath, 'gust.00003.nc'), None)
+        hazard.buildGustStore(self.inputPath, self.storeFile, tilegrid)
+        self.assertTrue(os.path.getmtime(self.storeFile) > modified + 1.)
+
+        # The same tiles over a domain shifted by whole grid cells
+
+        os.utime(self.storeFile, (modified, modified))
+        for f in os.listdir(self.inputPath):
+            os.utime(os.path.join(self.inputPath, f),
+                     (modified - 10., modified - 10.))
+        shifted = TileGrid({'xMin': 110.1, 'xMax': 111.6,
+                            'yMin': -19.8, 'yMax': -18.6},
+                           self.lon, self.lat, 6, 6)
+        self.assertEqual(shifted.num_tiles, tilegrid.num_tiles)
+        hazard.buildGustStore(self.inputPath, self.storeFile, shifted)
+        self.assertTrue(os.path.getmtime(self.storeFile) > modified + 1.)
+
+        for limits in hazard.getTiles(shifted):
+            assert_almost_equal(
+                hazard.loadTileFromStore(self.storeFile, shifted, limits),
+                hazard.loadFilesFromPath(self.inputPath, limits))
+
+    def testWindfieldFiles(self):
+        """Testing only the wind field files are counted as events"""
+        os.mkdir(os.path.join(self.inputPath, 'old'))
+        files = hazard.windfieldFiles(self.inputPath)
+        self.assertEqual([os.path.basename(f) for f in files],
+                         ['gust.%05d.nc' % k for k in range(7)])
+
+    def testTileFile(self):
+        """Testing tiles read back from the tile file as written"""
+        tileFile = hazard.TileFile(os.path.join(self.tmpdir, 'tiles.dat'),
+                                   self.tilegrid, 2, calcCI=True)
+        tileFile.create()
+
+        rs = np.random.RandomState(3)
+        results = []
+        for limits in hazard.getTiles(self.tilegrid):
+            x1, x2, y1, y2 = limits
+            shape = (y2 - y1, x2 - x1)
+            result = (limits, rs.rand(2, *shape), rs.rand(*shape),
+                      rs.rand(*shape), rs.rand(*shape),
+                      rs.rand(2, *shape), rs.rand(2, *shape))
+            tileFile.write(result)
+            results.append(result)
+
+        for result in results:
+            tile = tileFile.read(result[0])
+            self.assertEqual(tile[0], result[0])
+            for values, expected in zip(tile[1:], result[1:]):
+                assert_almost_equal(values, expected)
+
+    def testSharedTiles(self):
+        """Testing workers on other nodes save their tiles via the tile file"""
+        config = ConfigParser()
+        outputPath = config.get('Output', 'Path')
+        config.set('Output', 'Path', self.tmpdir)
+        config.set('Region', 'gridLimit', repr(self.gridLimit))
+        os.mkdir(os.path.join(self.tmpdir, 'process'))
+        os.mkdir(os.path.join(self.tmpdir, 'hazard'))
+        hazardFile = os.path.join(self.tmpdir, 'hazard', 'hazard.nc')
+        tiles = hazard.getTiles(self.tilegrid)
+
+        try:
+            hc = hazard.HazardCalculator(None, self.tilegrid, 7, 5, 1)
+            hc.dumpHazardFromTiles(tiles)
+            hc.saveHazard()
+            ncobj = nctools.ncLoadFile(hazardFile)
+            expected = [np.array(ncobj.variables[name][:])
+                        for name in ['wspd', 'loc', 'scale', 'shp']]
+            ncobj.close()
+
+            hazard.pp = NodesPypar(2)
+            calculators = [None, None]
+            def process(rank):
+                hazard.pp.local.rank = rank
+                calculators[rank] = hazard.HazardCalculator(
+                    None, self.tilegrid, 7, 5, 1)
+                calculators[rank].dumpHazardFromTiles(tiles)
+
+            threads = [threading.Thread(target=process, args=(rank,))
+                       for rank in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            hazard.pp.local.rank = 0
+            hc = calculators[0]
+            self.assertEqual(hc.shared, 'file')
+            self.assertFalse(hc.Rp.any())
+            hc.saveHazard()
+            hc.removeSharedOutput()
+        finally:
+            config.set('Output', 'Path', outputPath)
+            config.remove_option('Region', 'gridLimit')
+            hazard.pp = hazard.attemptParallel()
+
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'process')), [])
+        ncobj = nctools.ncLoadFile(hazardFile)
+        for name, values in zip(['wspd', 'loc', 'scale', 'shp'], expected):
+            assert_almost_equal(ncobj.variables[name][:], values)
+        ncobj.close()
+
+class TestTiles(unittest.TestCase):
+
+    def testPlanTiles(self):
+        """Testing tiles are sized to the memory and the workers"""
+        perPoint = 1000 * hazard.BYTES_PER_RECORD
+        xstep, ystep = hazard.planTiles(1000, 500, 400, 2500 * perPoint)
+        self.assertEqual((xstep, ystep), (50, 50))
+
+        # Without the room, a point at a time
+        self.assertEqual(hazard.planTiles(1000, 500, 400, 10), (1, 1))
+
+        # Enough tiles for each worker
+        xstep, ystep = hazard.planTiles(1000, 500, 400, 10 ** 12, workers=5)
+        self.assertEqual((xstep, ystep), (100, 100))
+        self.assertTrue(xstep * ystep * hazard.TILES_PER_WORKER * 5 <=
+                        500 * 400)
+
+        # The confidence range needs more memory
+        xstep, ystep = hazard.planTiles(1000, 500, 400, 2500 * perPoint,
+                                        calcCI=True)
+        self.assertTrue(xstep * ystep < 2500)
+
+        # Narrow domains get long tiles
+        self.assertEqual(hazard.planTiles(1000, 500, 10, 2500 * perPoint),
+                         (250, 10))
+
+    def testRandomKeys(self):
+        """Testing the keys of a point do not depend on the tile"""
+        keys = hazard.randomKeys(300, (6, 8), 1, (10, 20))
+        self.assertEqual(keys.dtype, np.float32)
+        self.assertTrue((keys >= 0.).all() and (keys < 1.).all())
+        self.assertAlmostEqual(keys.mean(), 0.5, places=2)
+
+        tile = hazard.randomKeys(300, (3, 2), 1, (12, 25))
+        assert_almost_equal(tile, keys[:, 2:5, 5:7])
+        other = hazard.randomKeys(300, (6, 8), 2, (10, 20))
+        self.assertFalse((other == keys).any())
+
+class TestSites(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.lon = np.array([110.5, 111., 111.2])
+        self.lat = np.array([-19., -18.5, -18.2])
+        rs = np.random.RandomState(2)
+        self.gusts = (30. + 8. * rs.gumbel(size=(200, 3))).astype('f')
+        self.gusts[:, 2] = 0.
+        self.stations = [Station(str(k), lon, lat) for k, (lon, lat)
+                         in enumerate(zip(self.lon, self.lat))]
+        self.years = np.array([10., 100.], dtype='f')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testSiteHazard(self):
+        """Testing the hazard table of the site gusts"""
+        siteFile = os.path.join(self.tmpdir, 'site_gusts.nc')
+        wind.saveSiteGusts(siteFile, self.lon, self.lat, self.gusts)
+        lon, lat, Vr = hazard.loadSiteGusts(siteFile)
+        assert_almost_equal(lon, self.lon, decimal=5)
+        assert_almost_equal(Vr, self.gusts)
+
+        Rp, loc, scale, shp = hazard.calculate(Vr[:, np.newaxis, :],
+                                               self.years, -9999., 50, 1)
+        hazardFile = os.path.join(self.tmpdir, 'site_hazard.csv')
+        hazard.saveSiteHazard(hazardFile, self.stations, self.years,
+                              Rp[:, 0], loc[0], scale[0], shp[0])
+
+        with open(hazardFile) as fh:
+            header = fh.readline()
+        self.assertEqual(header.strip('# \n').split(','),
+                         ['Station', 'Longitude', 'Latitude', 'Location',
+                          'Scale', 'Shape', 'RP10', 'RP100'])
+        table = np.loadtxt(hazardFile, delimiter=',')
+        self.assertEqual(table.shape, (3, 8))
+
+        w, l, sc, sh = estimateEVD(np.sort(self.gusts[:, 0]), self.years,
+                                   -9999., 50, 1)
+        assert_almost_equal(table[0, 3:6], [l, sc, sh], decimal=3)
+        assert_almost_equal(table[0, 6:], w, decimal=2)
+        self.assertEqual(table[2, 6], 0.)
+
+    def testConfidence(self):
+        """Testing the resampled confidence range is reproducible"""
+        Vr = np.sort(self.gusts, axis=0)[:, np.newaxis, :]
+        Rp, loc, scale, shp = hazard.calculate(Vr.copy(), self.years,
+                                               -9999., 50, 1)
+        upper, lower = hazard.calculateCI(Vr, self.years, -9999., 50, 1,
+                                          40, 90, seed=1)
+        self.assertEqual(upper.shape, (2, 1, 3))
+        self.assertTrue((lower[:, 0, :2] < Rp[:, 0, :2]).all())
+        self.assertTrue((upper[:, 0, :2] > Rp[:, 0, :2]).all())
+        self.assertTrue((upper[:, 0, 2] == -9999.).all())
+
+        again = hazard.calculateCI(Vr, self.years, -9999., 50, 1,
+                                   40, 90, seed=1)
+        assert_almost_equal(again[0], upper)
+        assert_almost_equal(again[1], lower)
+
+if __name__ == "__main__":
+    unittest.main()
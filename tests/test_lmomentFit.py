@@ -78,6 +78,42 @@ class Testlmoments(NumpyTestCase.NumpyTestCase):
         params = lmom.pelgev(xmom)
         self.numpyAssertAlmostEqual(params,self.params)
 
+    def test_samlmu_axis(self):
+        """Test samlmu along an axis matches each set of values"""
+        values = numpy.sort(self.values)
+        data = numpy.zeros((len(values), 2, 3))
+        data[:, 0, 0] = values
+        data[:, 1, 2] = values[::-1]
+        data = numpy.sort(data, axis=0)
+        moments = lmom.samlmu(data, 5, axis=0)
+        self.assertEqual(moments.shape, (5, 2, 3))
+        self.numpyAssertAlmostEqual(moments[:, 0, 0], lmom.samlmu(values, 5))
+        self.numpyAssertAlmostEqual(moments[:, 1, 2], lmom.samlmu(values, 5))
+
+        # Leading values are left out of sets with fewer values
+        count = numpy.array([[len(values), 10, 10], [10, 10, len(values) - 5]])
+        moments = lmom.samlmu(data, 3, axis=0, count=count)
+        self.numpyAssertAlmostEqual(moments[:, 1, 2],
+                                    lmom.samlmu(values[5:], 3))
+
+    def test_pelgev_array(self):
+        """Test pelgev with arrays of moments matches single moments"""
+        l1 = numpy.array([30., 30., 30., 30.])
+        l2 = numpy.array([5., 5., 5., -1.])
+        t3 = numpy.array([0.2, -0.5, -0.9, 0.2])
+        params = lmom.pelgev([l1, l2, t3])
+        self.assertEqual(params.shape, (3, 4))
+        for i in range(3):
+            self.numpyAssertAlmostEqual(params[:, i],
+                                        lmom.pelgev([l1[i], l2[i], t3[i]]))
+        self.assertTrue(numpy.isnan(params[:, 3]).all())
+
+        params = lmom.pelgpa([l1, l2, t3])
+        for i in range(3):
+            self.numpyAssertAlmostEqual(params[:, i],
+                                        lmom.pelgpa([l1[i], l2[i], t3[i]]))
+        self.assertTrue(numpy.isnan(params[:, 3]).all())
+
 if __name__ == "__main__":
     flStartLog('', 'CRITICAL', False)
     testSuite = unittest.makeSuite(Testlmoments,'test')
@@ -155,6 +155,60 @@ class TestMapUtils(NumpyTestCase.NumpyTestCase):
         """Test that find_nearest raises ValueError if second arg is an array"""
         self.assertRaises(ValueError, maputils.find_nearest, self.lon, self.findpts)
 
+    def test_MakePoints(self):
+        """Test makePoints matches makeGrid at the grid points"""
+        R0, theta0 = maputils.makeGrid(118.3, -17.2, 1., 0.1)
+        lon = (118300 - 1000 + 100 * numpy.arange(R0.shape[1])) / 1000.
+        lat = (-17200 - 1000 + 100 * numpy.arange(R0.shape[0])) / 1000.
+        lon, lat = numpy.meshgrid(lon, lat)
+
+        R, theta = maputils.makePoints(118.3, -17.2, lon.ravel(), lat.ravel())
+        self.numpyAssertAlmostEqual(R, R0.ravel())
+        self.numpyAssertAlmostEqual(theta, theta0.ravel())
+
+        R, theta = maputils.makePoints([118.3, 118.3], [-17.2, -17.2],
+                                       lon.ravel(), lat.ravel())
+        self.assertEqual(R.shape, (2, lon.size))
+        self.numpyAssertAlmostEqual(R[1], R0.ravel())
+
+class TestStencilCache(NumpyTestCase.NumpyTestCase):
+
+    def test_StencilCache(self):
+        """Test cached stencils match makeGrid within the error bounds"""
+        cache = maputils.StencilCache(latStep=0.1, maxError=0.5, maxAngle=2.0)
+        for cLon, cLat in [(118.3, -17.2), (118.3456, -17.23), (150., 25.04)]:
+            R, theta = cache.makeGrid(cLon, cLat, 2., 0.05)
+            R0, theta0 = maputils.makeGrid(cLon, cLat, 2., 0.05)
+            self.assertEqual(R.shape, R0.shape)
+            self.assertTrue(numpy.abs(R - R0).max() <= 0.5)
+            # Angles are compared away from the storm centre
+            centre = R <= 1e-30
+            dtheta = numpy.abs((theta - theta0 + numpy.pi) %
+                               (2. * numpy.pi) - numpy.pi)
+            self.assertTrue(numpy.degrees(dtheta[~centre]).max() <= 2.0)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits, 3)
+
+    def test_StencilCacheFallback(self):
+        """Test stencils fall back to makeGrid when the bound is exceeded"""
+        cache = maputils.StencilCache(latStep=1.0, maxError=0.001)
+        R, theta = cache.makeGrid(118.3, -17.2, 2., 0.05)
+        R0, theta0 = maputils.makeGrid(118.3, -17.2, 2., 0.05)
+        self.numpyAssertAlmostEqual(R, R0)
+        self.numpyAssertAlmostEqual(theta, theta0)
+        self.assertEqual(cache.misses, 1)
+
+    def test_StencilCacheAngleFallback(self):
+        """Test stencils fall back to makeGrid when the angle bound is exceeded"""
+        cache = maputils.StencilCache(latStep=0.1, maxError=0.5,
+                                      maxAngle=0.01)
+        R, theta = cache.makeGrid(118.3456, -17.23, 2., 0.05)
+        R0, theta0 = maputils.makeGrid(118.3456, -17.23, 2., 0.05)
+        self.numpyAssertAlmostEqual(R, R0)
+        self.numpyAssertAlmostEqual(theta, theta0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 1)
+
 #class TestInput(unittest.TestCase):
 #   xx=[1, 3, 5, 9, 11]
 #   yy=[1, 4, 12, 40, 60]
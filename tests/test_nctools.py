@@ -25,7 +25,9 @@
 
  $Id: testNetCDF.py 276 2010-04-16 02:24:00Z nsummons $
 """
+import os
 import sys
+import tempfile
 from os.path import join as pjoin
 import unittest
 import NumpyTestCase
@@ -278,6 +280,35 @@ class TestNetCDF(NumpyTestCase.NumpyTestCase):
                            self.nullvalue_var)
                       
                           
+    def test_ncSaveGridPacked(self):
+        """Test ncSaveGrid packs variables with a scale factor and offset"""
+        press_out = self.variables[0]['values'] + 0.26
+        packed = {
+            0: {
+                'name': 'pressure',
+                'values': press_out,
+                'dtype': 'i2',
+                'nodata': -32768,
+                'dims': ('time', 'level', 'lat', 'lon'),
+                'atts': {
+                    'units': 'hPa',
+                    'scale_factor': np.float32(0.5),
+                    'add_offset': np.float32(1000.)
+                    }
+                }
+            }
+        filename = tempfile.mktemp(suffix='.nc')
+        try:
+            nctools.ncSaveGrid(filename, self.dimensions, packed)
+            ncobj = nctools.ncLoadFile(filename)
+            self.assertEqual(ncobj.variables['pressure'].dtype, np.int16)
+            press = nctools.ncGetData(ncobj, 'pressure')
+            ncobj.close()
+        finally:
+            os.unlink(filename)
+
+        self.numpyAssertAlmostEqual(press, press_out + 0.24)
+
     def test_ncReadFile(self):
         """Test nctools functions for reading dimensions and variables"""
         ncobj = nctools.ncLoadFile(self.ncfile)
@@ -0,0 +1,267 @@
+"""
+Testing the extraction of station time series
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+from netCDF4 import Dataset, num2date
+
+try:
+    import pathLocate
+except:
+    from unittests import pathLocate
+
+# Add parent folder to python path
+sys.path.append(pathLocate.getRootDirectory())
+from Utilities.config import ConfigParser
+from Utilities.maputils import find_index
+from Utilities import timeseries
+from Utilities.timeseries import Timeseries, nearestIndex
+
+
+class TestNearestIndex(unittest.TestCase):
+
+    def testFindIndex(self):
+        """Testing nearestIndex matches find_index, including ties"""
+        array = np.arange(0., 2.01, 0.25)
+        values = np.array([-1., 0., 0.1, 0.125, 0.375, 0.4, 1.875,
+                           2., 2.2, 3.])
+        expected = [find_index(array, value) for value in values]
+        self.assertEqual(list(nearestIndex(array, values)), expected)
+        self.assertEqual(list(nearestIndex(np.array([1.]), values)),
+                         [0] * len(values))
+
+
+class TestTimeseries(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        stnFile = os.path.join(self.tmpdir, 'stations.csv')
+        with open(stnFile, 'w') as fh:
+            fh.write('1,116.125,-18.5\n2,117.3,-17.0\n3,130.0,-20.0\n')
+
+        config = ConfigParser()
+        self.outputPath = config.get('Output', 'Path')
+        config.set('Timeseries', 'StationFile', stnFile)
+        config.set('Output', 'Path', self.tmpdir)
+        self.ts = Timeseries(None)
+        self.ts.outputPath = self.tmpdir
+        self.ts.chunkSize = 0
+
+        self.times = [datetime(2000, 1, 1) + timedelta(hours=i)
+                      for i in range(6)]
+
+    def tearDown(self):
+        ConfigParser().set('Output', 'Path', self.outputPath)
+        shutil.rmtree(self.tmpdir)
+
+    def grid(self, i, resolution=0.25):
+        """
+        A local grid around a storm moving one node each time step, and
+        fields telling the nodes apart.
+        """
+        gridx = 115. + resolution * (i + np.arange(12))
+        gridy = -19.5 + resolution * (i + np.arange(10))
+        spd = np.add.outer(100. * np.arange(10), np.arange(12)) + 1.
+        return gridx, gridy, spd
+
+    def testExtract(self):
+        """Testing stations sample the nearest nodes as the grid moves"""
+        for resolution in [0.25, 0.1]:
+            for i, dt in enumerate(self.times):
+                gridx, gridy, spd = self.grid(i, resolution)
+                self.ts.extract(dt, spd, spd, -spd, spd + 1e5, gridx, gridy)
+
+                values = self.ts.values[len(self.ts.times) - 1]
+                for j, stn in enumerate(self.ts.stations):
+                    if not stn.insideGrid(gridx, gridy):
+                        self.assertEqual(values[j, 0], 0.)
+                        continue
+                    x = find_index(gridx, stn.lon)
+                    y = find_index(gridy, stn.lat)
+                    assert_almost_equal(values[j, [0, 1, 2, 4]],
+                                        [spd[y, x], spd[y, x], -spd[y, x],
+                                         spd[y, x] + 1e5])
+
+        self.assertTrue(self.ts.inside[:, 0].any())
+        self.assertFalse(self.ts.inside[:, 2].any())
+
+    def testBuffers(self):
+        """Testing the buffers grow when full and flush every chunk"""
+        gridx, gridy, spd = self.grid(0)
+        n = timeseries.BUFFER_SIZE + 10
+        for i in range(n):
+            spd[4, 4] = i
+            self.ts.extract(self.times[0] + timedelta(hours=i), spd, spd,
+                            spd, spd, gridx, gridy)
+
+        times, values, inside = self.ts.popData()
+        self.assertEqual(len(times), n)
+        self.assertEqual(values.shape, (n, 3, 5))
+        assert_almost_equal(values[:, 0, 4], np.arange(n))
+        self.assertEqual(self.ts.times, [])
+
+        flushed = []
+        self.ts.flush = lambda: flushed.append(len(self.ts.popData()[0]))
+        self.ts.chunkSize = 4
+        for i in range(10):
+            self.ts.extract(self.times[0], spd, spd, spd, spd, gridx, gridy)
+        self.assertEqual(flushed, [4, 4])
+        self.assertEqual(len(self.ts.times), 2)
+
+    def extractAll(self, steps=None):
+        """
+        Extract the time steps of a storm moving across the grid (or
+        only the time steps `steps`), with the output written every two
+        steps, and return the samples expected of each station.
+        """
+        if steps is None:
+            steps = range(len(self.times))
+        self.ts.chunkSize = 2
+        expected = dict((j, []) for j in range(len(self.ts.stations)))
+        for i in steps:
+            dt = self.times[i]
+            gridx, gridy, spd = self.grid(i)
+            self.ts.extract(dt, spd, spd, -spd, spd + 1e5, gridx, gridy)
+            for j, stn in enumerate(self.ts.stations):
+                if stn.insideGrid(gridx, gridy):
+                    x = find_index(gridx, stn.lon)
+                    y = find_index(gridy, stn.lat)
+                    expected[j].append((dt, spd[y, x], spd[y, x] + 1e5))
+        self.ts.shutdown()
+        return expected
+
+    def testCsv(self):
+        """Testing the CSV files hold every time step of each station"""
+        self.ts.format = 'csv'
+        expected = self.extractAll()
+        self.assertEqual(sorted(os.listdir(self.ts.outputPath)),
+                         ['stations.csv', 'ts.1.0.csv', 'ts.2.0.csv'])
+
+        for j in [0, 1]:
+            stn = self.ts.stations[j]
+            fname = os.path.join(self.ts.outputPath,
+                                 'ts.%s.csv' % str(stn.id))
+            with open(fname) as fh:
+                rows = [line.strip().split(',') for line in fh
+                        if not line.startswith('#')]
+            self.assertEqual(len(rows), len(self.times))
+            self.assertTrue(2 < len(expected[j]) < len(self.times))
+
+            # Calm winds, and the pressure of the grid corner, while the
+            # station is outside the grid
+
+            samples = dict((dt, (speed, pressure))
+                           for dt, speed, pressure in expected[j])
+            for row, dt in zip(rows, self.times):
+                speed, pressure = samples.get(dt, (0., 1. + 1e5))
+                self.assertEqual(row[0], dt.strftime(timeseries.ISO_FORMAT))
+                assert_almost_equal(float(row[1]), stn.lon, 3)
+                assert_almost_equal(float(row[3]), speed, 2)
+                assert_almost_equal(float(row[7]), pressure, 2)
+
+    def testNetcdf(self):
+        """Testing the NetCDF file holds the samples of each station"""
+        self.ts.format = 'netcdf'
+        expected = self.extractAll()
+
+        ncobj = Dataset(os.path.join(self.ts.outputPath, 'timeseries.nc'))
+        try:
+            variables = ncobj.variables
+            self.assertEqual(list(variables['station_id'][:]),
+                             ['1.0', '2.0', '3.0'])
+            index = variables['station_index'][:]
+            times = num2date(variables['time'][:], variables['time'].units)
+            for j in range(3):
+                samples = index == j
+                self.assertEqual(samples.sum(), len(expected[j]))
+                self.assertEqual(list(times[samples]),
+                                 [dt for dt, _, _ in expected[j]])
+                assert_almost_equal(variables['speed'][samples],
+                                    [speed for _, speed, _ in expected[j]])
+                assert_almost_equal(variables['pressure'][samples],
+                                    [p for _, _, p in expected[j]])
+        finally:
+            ncobj.close()
+
+    def testShutdown(self):
+        """Testing only the files of this object are suffixed and removed"""
+        other = os.path.join(self.ts.outputPath, 'ts.2.0.001.csv')
+        with open(other, 'w') as fh:
+            fh.write('# Written by another process\n')
+
+        # Station 2 is sampled but sees no wind
+
+        self.ts.format = 'csv'
+        self.grid = lambda i: (115. + 0.25 * (i + np.arange(12)),
+                               -19.5 + 0.25 * (i + np.arange(10)),
+                               np.where(np.arange(10) < 5, 1., 0.)[:, None] *
+                               np.ones(12))
+        self.extractAll()
+        self.assertEqual(sorted(os.listdir(self.ts.outputPath)),
+                         ['stations.csv', 'ts.1.0.csv', 'ts.2.0.001.csv'])
+        self.assertEqual(list(self.ts.written), [True, False, False])
+
+        # A parallel process keeps the files of its calm stations for
+        # the merge
+
+        os.remove(other)
+        self.ts = Timeseries(None, 1)
+        self.ts.outputPath = self.tmpdir
+        self.ts.format = 'csv'
+        self.extractAll()
+        self.assertEqual(sorted(os.listdir(self.ts.outputPath)),
+                         ['stations.csv', 'ts.1.0.001.csv', 'ts.1.0.csv',
+                          'ts.2.0.001.csv', 'ts.3.0.001.csv'])
+        self.assertEqual(list(self.ts.written), [True, True, True])
+
+    def testMerge(self):
+        """Testing merged parallel output matches a single process"""
+        for fmt in ['csv', 'netcdf']:
+            serialPath = os.path.join(self.tmpdir, 'serial.' + fmt)
+            parallelPath = os.path.join(self.tmpdir, 'parallel.' + fmt)
+            os.mkdir(serialPath)
+            os.mkdir(parallelPath)
+
+            self.ts = Timeseries(None)
+            self.ts.outputPath = serialPath
+            self.ts.format = fmt
+            self.extractAll()
+
+            for rank, steps in enumerate([range(3), range(3, 6)]):
+                self.ts = Timeseries(None, rank)
+                self.ts.outputPath = parallelPath
+                self.ts.format = fmt
+                self.extractAll(steps)
+            self.ts.merge(2)
+
+            fnames = sorted(os.listdir(serialPath))
+            self.assertEqual(sorted(os.listdir(parallelPath)), fnames)
+            self.assertTrue(len(fnames) > 0)
+            for fname in fnames:
+                serial = os.path.join(serialPath, fname)
+                parallel = os.path.join(parallelPath, fname)
+                if fmt == 'csv':
+                    with open(serial) as fh, open(parallel) as ph:
+                        self.assertEqual(ph.read(), fh.read())
+                    continue
+
+                expected = Dataset(serial)
+                merged = Dataset(parallel)
+                try:
+                    for name, var in expected.variables.items():
+                        self.assertEqual(list(merged.variables[name][:]),
+                                         list(var[:]))
+                finally:
+                    expected.close()
+                    merged.close()
+
+if __name__ == "__main__":
+    unittest.main()
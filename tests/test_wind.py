@@ -0,0 +1,440 @@
+"""
+Testing the wind field accumulation
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from datetime import datetime, timedelta
+from numpy.testing import assert_almost_equal
+try:
+    import pathLocate
+except:
+    from unittests import pathLocate
+
+# Add parent folder to python path
+sys.path.append(pathLocate.getRootDirectory())
+from wind import ExtremesAccumulator, Track, WindfieldAroundTrack
+from wind import WindfieldGenerator, TRACKFILE_COLS, TRACKFILE_FMTS
+from Utilities.config import ConfigParser
+from Utilities.parallel import attemptParallel
+from Utilities import nctools
+from hazard import loadFile
+import wind
+
+
+class TestExtremesAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        self.Ux = np.array([[-3., 4.], [0., -6.]])
+        self.Vy = np.array([[4., 3.], [-5., 8.]])
+        self.gust = np.hypot(self.Ux, self.Vy)
+        self.P = np.array([[99000., 98000.], [100500., 97000.]])
+
+    def testUpdate(self):
+        """Testing in-place update of the extremes"""
+        acc = ExtremesAccumulator((3, 4), 100000.)
+        acc.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+        acc.update(0, 1, 0.5 * self.gust, 0.5 * self.Ux, 0.5 * self.Vy,
+                   self.P - 500.)
+
+        gust = np.array([[0., 2.5, 2.5, 0.],
+                         [0., 2.5, 5., 5.],
+                         [0., 0., 5., 10.]])
+        pressure = np.array([[100000., 98500., 97500., 100000.],
+                             [100000., 100000., 96500., 98000.],
+                             [100000., 100000., 100000., 97000.]])
+
+        assert_almost_equal(acc.gust, gust)
+        assert_almost_equal(acc.pressure, pressure)
+        assert_almost_equal(acc.UU[2, 3], -6.)
+        assert_almost_equal(acc.VV[1, 1], -2.5)
+
+    def testUpdatePoints(self):
+        """Testing scattered points match the update of a whole field"""
+        acc = ExtremesAccumulator((3, 4), 100000.)
+        acc.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+
+        sparse = ExtremesAccumulator((3, 4), 100000.)
+        jj, ii = np.nonzero(np.ones((2, 2), dtype=bool))
+        sparse.updatePoints(jj + 1, ii + 2, self.gust.ravel(),
+                            self.Ux.ravel(), self.Vy.ravel())
+        sparse.updatePressure(1, 2, self.P)
+
+        assert_almost_equal(sparse.gust, acc.gust)
+        assert_almost_equal(sparse.UU, acc.UU)
+        assert_almost_equal(sparse.VV, acc.VV)
+        assert_almost_equal(sparse.pressure, acc.pressure)
+
+        sparse.updatePoints(np.array([1]), np.array([3]), np.array([1.]),
+                            np.array([1.]), np.array([0.]))
+        assert_almost_equal(sparse.gust[1, 3], 5.)
+        assert_almost_equal(sparse.UU[1, 3], 4.)
+
+    def testMerge(self):
+        """Testing swaths merge into the regional grid by their offset"""
+        acc = ExtremesAccumulator((3, 4), 100000.)
+        acc.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+        acc.update(0, 1, 0.5 * self.gust, 0.5 * self.Ux, 0.5 * self.Vy,
+                   self.P - 500.)
+
+        first = ExtremesAccumulator((2, 2), 100000., offset=(1, 2))
+        first.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+        second = ExtremesAccumulator((2, 2), 100200., offset=(0, 1))
+        second.update(0, 1, 0.5 * self.gust, 0.5 * self.Ux, 0.5 * self.Vy,
+                      self.P - 500.)
+
+        region = ExtremesAccumulator.region((3, 4))
+        region.merge(first)
+        region.merge(second)
+        region.merge(ExtremesAccumulator((0, 0), np.NaN))
+        region.fillPressure()
+
+        assert_almost_equal(region.gust, acc.gust)
+        assert_almost_equal(region.UU, acc.UU)
+        assert_almost_equal(region.VV, acc.VV)
+        assert_almost_equal(region.pressure, acc.pressure)
+
+    def testClipping(self):
+        """Testing tiles only retain the parts of fields they overlap"""
+        acc = ExtremesAccumulator((3, 4), 100000.)
+        acc.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+        acc.update(0, 1, 0.5 * self.gust, 0.5 * self.Ux, 0.5 * self.Vy,
+                   self.P - 500.)
+
+        jj, ii = np.nonzero(np.ones((2, 2), dtype=bool))
+        for offset in [(0, 0), (0, 2), (2, 0), (2, 2)]:
+            tile = ExtremesAccumulator((2, 2), 100000., offset=offset)
+            tile.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+            tile.update(0, 1, 0.5 * self.gust, 0.5 * self.Ux,
+                        0.5 * self.Vy, self.P - 500.)
+
+            region = (slice(offset[0], offset[0] + 2),
+                      slice(offset[1], offset[1] + 2))
+            ny, nx = acc.gust[region].shape
+            assert_almost_equal(tile.gust[:ny, :nx], acc.gust[region])
+            assert_almost_equal(tile.UU[:ny, :nx], acc.UU[region])
+            assert_almost_equal(tile.pressure[:ny, :nx], acc.pressure[region])
+
+            points = ExtremesAccumulator((2, 2), 100000., offset=offset)
+            points.updatePoints(jj + 1, ii + 2, self.gust.ravel(),
+                                self.Ux.ravel(), self.Vy.ravel())
+            assert_almost_equal(points.gust[:ny, :nx],
+                                np.where(acc.gust[region] > 2.5,
+                                         acc.gust[region], 0.))
+
+    def testBearing(self):
+        """Testing the bearing is only set where a gust was recorded"""
+        acc = ExtremesAccumulator((3, 4), 100000.)
+        acc.update(1, 2, self.gust, self.Ux, self.Vy, self.P)
+        bearing = acc.bearing()
+
+        expected = np.arctan2(-self.Ux, -self.Vy) * 180. / np.pi
+        assert_almost_equal(bearing[1:, 2:], expected, decimal=5)
+        assert_almost_equal(bearing[0, :], np.zeros(4))
+        assert_almost_equal(bearing[:, :2], np.zeros((3, 2)))
+
+
+class TestWindfieldAroundTrack(unittest.TestCase):
+
+    def setUp(self):
+        n = 12
+        data = np.zeros(n, dtype={'names': TRACKFILE_COLS,
+                                  'formats': TRACKFILE_FMTS})
+        data['CycloneNumber'] = 1
+        data['Datetime'] = [datetime(2000, 1, 1) + timedelta(hours=i)
+                            for i in range(n)]
+        data['TimeElapsed'] = np.arange(n)
+        data['Longitude'] = 118. - 0.2 * np.arange(n)
+        data['Latitude'] = -17. - 0.15 * np.arange(n)
+        data['Speed'] = 5.
+        data['Bearing'] = 220.
+        data['CentralPressure'] = 95000. + 100. * np.arange(n)
+        data['EnvPressure'] = 100800.
+        data['rMax'] = 30.
+        self.track = Track(data)
+        self.gridLimit = {'xMin': 115., 'xMax': 119.,
+                          'yMin': -19., 'yMax': -16.}
+
+    def testThreads(self):
+        """Testing threaded time steps give the serial extremes"""
+        times = []
+        def callback(dt, *args):
+            times.append(dt)
+
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1)
+        serial = wt.regionalExtremes(self.gridLimit)
+
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1,
+                                  threads=3)
+        threaded = wt.regionalExtremes(self.gridLimit, callback)
+
+        for expected, result in zip(serial, threaded):
+            assert_almost_equal(result, expected)
+        self.assertEqual(times, sorted(times))
+        self.assertTrue(len(times) > 0)
+
+    def testPoints(self):
+        """Testing winds at points match the local grids at their nodes"""
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1)
+        Ux, Vy, P = wt.localWindFields([2, 5])
+
+        # Nodes of the local grids around both storm centres
+
+        lon = np.array([116000, 116800, 117400]) / 1000.
+        lat = np.array([-17450, -17150, -18250]) / 1000.
+        jj, ii = np.array([13, 16, 5]), np.array([0, 8, 14])
+
+        UxPoints, VyPoints, PPoints = wt.pointWindFields([5], lon, lat)
+        assert_almost_equal(UxPoints[0], Ux[1][jj, ii])
+        assert_almost_equal(VyPoints[0], Vy[1][jj, ii])
+        assert_almost_equal(PPoints[0], P[1][jj, ii])
+
+        calls = {}
+        def callback(dt, gust, Ux, Vy, P, inside):
+            calls[dt] = inside
+
+        maxGust = wt.pointTimeseries(self.gridLimit, lon, lat, callback)
+        self.assertEqual(maxGust.shape, (3,))
+        self.assertEqual(len(calls),
+                         len(wt.swathIndices(self.gridLimit)[2]))
+        self.assertEqual(list(calls[self.track.Datetime[3]]),
+                         [False, True, True])
+        self.assertTrue(calls[self.track.Datetime[5]].all())
+
+    def testReuse(self):
+        """Testing wind fields are reused within tolerances and the cap"""
+        times = range(7)
+        wt = WindfieldAroundTrack(self.track, maxReuse=2,
+                                  reuseTolerance={'CentralPressure': 1e9})
+        self.assertEqual(list(wt.fieldSources(times)), [0, 0, 0, 3, 3, 3, 6])
+
+        wt = WindfieldAroundTrack(self.track, maxReuse=5,
+                                  reuseTolerance={'CentralPressure': 150.})
+        self.assertEqual(list(wt.fieldSources(times)), [0, 0, 2, 2, 4, 4, 6])
+
+        # Reusing nothing gives the evaluated extremes
+
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1)
+        expected = wt.regionalExtremes(self.gridLimit)
+
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1,
+                                  maxReuse=3,
+                                  reuseTolerance={'CentralPressure': 0.})
+        for field, result in zip(expected,
+                                 wt.regionalExtremes(self.gridLimit)):
+            assert_almost_equal(result, field)
+
+        # Reused fields are still placed at every time step
+
+        calls = []
+        def callback(dt, *args):
+            calls.append(dt)
+
+        wt = WindfieldAroundTrack(self.track, margin=1., resolution=0.1,
+                                  maxReuse=3,
+                                  reuseTolerance={'CentralPressure': 1e9})
+        wt.regionalExtremes(self.gridLimit, callback)
+        self.assertEqual(len(calls),
+                         len(wt.swathIndices(self.gridLimit)[2]))
+
+
+    def testWeakStorm(self):
+        """Testing a storm below the wind floor gives calm winds"""
+        self.track.data['CentralPressure'] = 100700.
+        for profileType, windFieldType in [('doubleholland', 'kepert'),
+                                           ('holland', 'mcconochie'),
+                                           ('doubleholland', 'hubbert')]:
+            wt = WindfieldAroundTrack(self.track, profileType=profileType,
+                                      windFieldType=windFieldType,
+                                      margin=1., resolution=0.1,
+                                      windFloor=40.)
+            mask, Ux, Vy, P = wt.localWindPoints(2)
+            self.assertFalse(mask.any())
+            self.assertEqual(Ux.shape, (0,))
+            self.assertEqual(Vy.shape, (0,))
+            self.assertEqual(P.shape, mask.shape)
+
+            gust, bearing, UU, VV, pressure, lon, lat = \
+                wt.regionalExtremes(self.gridLimit)
+            self.assertEqual(gust.max(), 0.)
+            self.assertTrue(pressure.min() < 100800.)
+
+
+class TestWindfieldGenerator(unittest.TestCase):
+
+    def setUp(self):
+        wind.pp = attemptParallel()
+        self.tmpdir = tempfile.mkdtemp()
+        self.trackfiles = []
+        for k in range(3):
+            trackfile = os.path.join(self.tmpdir, 'tracks.%05d.csv' % k)
+            with open(trackfile, 'w') as fh:
+                for i in range(6):
+                    fh.write('1,2000-01-01 %02d:00:00,%d,%.2f,%.2f,18.,'
+                             '220.,%.1f,1008.,30.\n' %
+                             (i, i, 118. - 0.2 * i - 0.5 * k,
+                              -17. - 0.15 * i, 955. + k))
+            self.trackfiles.append(trackfile)
+        self.gridLimit = {'xMin': 115., 'xMax': 119.,
+                          'yMin': -19., 'yMax': -16.}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testProcesses(self):
+        """Testing a process pool writes the serial gust files"""
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.1,
+                                 gridLimit=self.gridLimit)
+        serialPath = os.path.join(self.tmpdir, 'serial')
+        poolPath = os.path.join(self.tmpdir, 'pool')
+        os.mkdir(serialPath)
+        os.mkdir(poolPath)
+
+        done = []
+        wfg.dumpGustsFromTrackfiles(self.trackfiles, serialPath)
+        wfg.poolGustsFromTrackfiles(self.trackfiles, poolPath, 2,
+                                    done.append)
+
+        self.assertEqual(done, [1, 2, 3])
+        for k in range(3):
+            gustfile = 'gust.%05d.nc' % k
+            serial = nctools.ncLoadFile(os.path.join(serialPath, gustfile))
+            pool = nctools.ncLoadFile(os.path.join(poolPath, gustfile))
+            for var in ['vmax', 'ua', 'va', 'slp']:
+                assert_almost_equal(pool.variables[var][:],
+                                    serial.variables[var][:])
+            serial.close()
+            pool.close()
+
+    def testPackOutput(self):
+        """Testing gusts packed as integers unpack to the gusts"""
+        floatPath = os.path.join(self.tmpdir, 'float')
+        packedPath = os.path.join(self.tmpdir, 'packed')
+        os.mkdir(floatPath)
+        os.mkdir(packedPath)
+
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.1,
+                                 gridLimit=self.gridLimit)
+        wfg.dumpGustsFromTrackfiles(self.trackfiles[:1], floatPath)
+        for tileSize in [0, 20]:
+            wfg = WindfieldGenerator(ConfigParser(), margin=1.,
+                                     resolution=0.1, gridLimit=self.gridLimit,
+                                     tileSize=tileSize, packOutput=True,
+                                     outputVariables=['vmax', 'slp'])
+            wfg.dumpGustsFromTrackfiles(self.trackfiles[:1], packedPath)
+
+            gustfile = 'gust.00000.nc'
+            expected = nctools.ncLoadFile(os.path.join(floatPath, gustfile))
+            packed = nctools.ncLoadFile(os.path.join(packedPath, gustfile))
+            self.assertFalse('ua' in packed.variables)
+            self.assertEqual(packed.variables['vmax'].dtype, np.int16)
+            for var, scale in [('vmax', 0.01), ('slp', 1.)]:
+                self.assertTrue(np.abs(packed.variables[var][:] -
+                                       expected.variables[var][:]).max()
+                                <= 0.5 * scale + 1e-4)
+            vmax = expected.variables['vmax'][:]
+            expected.close()
+            packed.close()
+
+            ny, nx = vmax.shape
+            assert_almost_equal(loadFile(os.path.join(packedPath, gustfile),
+                                         (0, nx, 0, ny)), vmax, decimal=2)
+
+    def testTileCallbacks(self):
+        """Testing tiled callbacks build no swath sized accumulator"""
+        untiledPath = os.path.join(self.tmpdir, 'untiled')
+        tiledPath = os.path.join(self.tmpdir, 'tiled')
+        os.mkdir(untiledPath)
+        os.mkdir(tiledPath)
+
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.1,
+                                 gridLimit=self.gridLimit)
+        expected = []
+        wfg.dumpGustsFromTrackfiles(
+            self.trackfiles[:1], untiledPath,
+            timeStepCallback=lambda *args: expected.append(args))
+
+        shapes = []
+        init = wind.ExtremesAccumulator.__init__
+
+        def recordShape(extremes, shape, *args, **kwargs):
+            shapes.append(shape)
+            init(extremes, shape, *args, **kwargs)
+
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.1,
+                                 gridLimit=self.gridLimit, tileSize=20)
+        calls = []
+        wind.ExtremesAccumulator.__init__ = recordShape
+        try:
+            wfg.dumpGustsFromTrackfiles(
+                self.trackfiles[:1], tiledPath,
+                timeStepCallback=lambda *args: calls.append(args))
+        finally:
+            wind.ExtremesAccumulator.__init__ = init
+
+        self.assertEqual(len(calls), 6)
+        self.assertTrue(max(max(shape) for shape in shapes) <= 20)
+        self.assertEqual([args[0] for args in calls],
+                         [args[0] for args in expected])
+        for args, exp in zip(calls, expected):
+            for value, expectedValue in zip(args[1:], exp[1:]):
+                assert_almost_equal(value, expectedValue)
+
+    def testSiteGusts(self):
+        """Testing gusts at sites match the gust grid at its nodes"""
+        trackfile = os.path.join(self.tmpdir, 'tracks.aligned.csv')
+        with open(trackfile, 'w') as fh:
+            for i in range(6):
+                fh.write('1,2000-01-01 %02d:00:00,%d,%.2f,%.2f,18.,'
+                         '220.,955.,1008.,30.\n' %
+                         (i, i, 118. - 0.25 * i, -17. - 0.25 * i))
+
+        # Storm centres on the grid nodes, so the grid needs no sampling
+
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.25,
+                                 gridLimit=self.gridLimit)
+        gust, bearing, Vx, Vy, P, lon, lat = \
+            wfg.calculateExtremesFromTrackfile(trackfile)
+        lon, lat = np.meshgrid(lon, lat)
+
+        gusts = wfg.siteGustsFromTrackfiles([trackfile], lon.ravel(),
+                                            lat.ravel())
+        self.assertEqual(list(gusts), [trackfile])
+        assert_almost_equal(gusts[trackfile], gust.ravel(), decimal=4)
+
+    def testSchedule(self):
+        """Testing track files are scheduled longest first"""
+        wfg = WindfieldGenerator(ConfigParser(), margin=1., resolution=0.1,
+                                 gridLimit=self.gridLimit)
+        with open(self.trackfiles[1], 'a') as fh:
+            for i in range(6, 9):
+                fh.write('2,2000-01-02 %02d:00:00,%d,117.0,-17.5,18.,'
+                         '220.,960.0,1008.,30.\n' % (i, i))
+
+        estimates = [wfg.estimateCost(f) for f in self.trackfiles]
+        self.assertEqual(estimates[0], estimates[2])
+        self.assertEqual(estimates[1], 1.5 * estimates[0])
+
+        order = wfg.scheduleTrackfiles(self.trackfiles)
+        self.assertEqual(order, [self.trackfiles[i] for i in [1, 0, 2]])
+
+        costs = {'tracks.00000.csv': 1., 'tracks.00001.csv': 2.}
+        order = wfg.scheduleTrackfiles(self.trackfiles[::-1], costs)
+        self.assertEqual(order, [self.trackfiles[i] for i in [1, 2, 0]])
+
+        costFile = os.path.join(self.tmpdir, 'process', 'costs.csv')
+        wind.saveCosts(costFile, costs)
+        self.assertEqual(wind.loadCosts(costFile), costs)
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestExtremesAccumulator, 'test')
+    unittest.TextTestRunner().run(suite)
+    suite = unittest.makeSuite(TestWindfieldAroundTrack, 'test')
+    unittest.TextTestRunner().run(suite)
+    suite = unittest.makeSuite(TestWindfieldGenerator, 'test')
+    unittest.TextTestRunner().run(suite)
@@ -144,6 +144,67 @@ class TestWindVorticity(NumpyTestCase.NumpyTestCase):
         self.numpyAssertAlmostEqual(V, self.test_vorticity_powell)
 
 
+class TestWindPressure(NumpyTestCase.NumpyTestCase):
+
+    def setUp(self):
+        pkl_file = open(os.path.join(
+            unittest_dir, 'test_data', 'pressureProfileTestData.pck'), 'rb')
+        self.R = cPickle.load(pkl_file)
+        self.pEnv = cPickle.load(pkl_file)
+        self.pCentre = cPickle.load(pkl_file)
+        self.rMax = cPickle.load(pkl_file)
+        self.cLat = cPickle.load(pkl_file)
+        self.cLon = cPickle.load(pkl_file)
+        self.beta = cPickle.load(pkl_file)
+        self.rMax2 = cPickle.load(pkl_file)
+        self.beta1 = cPickle.load(pkl_file)
+        self.beta2 = cPickle.load(pkl_file)
+        self.test_pHolland = cPickle.load(pkl_file)
+        self.test_pWilloughby = cPickle.load(pkl_file)
+        self.test_pdoubleHolland = cPickle.load(pkl_file)
+        self.test_pPowell = cPickle.load(pkl_file)
+        pkl_file.close()
+
+    def testHolland(self):
+        profile = HollandWindProfile(self.cLat, self.cLon, self.pEnv,
+                                     self.pCentre, self.rMax, self.beta)
+        P = profile.pressure(self.R)
+        self.numpyAssertAlmostEqual(P, self.test_pHolland)
+
+    def testWilloughby(self):
+        profile = WilloughbyWindProfile(
+            self.cLat, self.cLon, self.pEnv, self.pCentre, self.rMax)
+        P = profile.pressure(self.R)
+        self.numpyAssertAlmostEqual(P, self.test_pWilloughby)
+
+    def testPowell(self):
+        profile = PowellWindProfile(
+            self.cLat, self.cLon, self.pEnv, self.pCentre, self.rMax)
+        P = profile.pressure(self.R)
+        self.numpyAssertAlmostEqual(P, self.test_pPowell)
+
+    def testDoubleHolland(self):
+        profile = DoubleHollandWindProfile(
+            self.cLat, self.cLon, self.pEnv, self.pCentre, self.rMax,
+            self.beta1, self.beta2, self.rMax2)
+        P = profile.pressure(self.R)
+        self.numpyAssertAlmostEqual(P, self.test_pdoubleHolland)
+
+    def testSharedTerms(self):
+        """Test velocity is unchanged after the pressure shares its terms"""
+        profile = HollandWindProfile(self.cLat, self.cLon, self.pEnv,
+                                     self.pCentre, self.rMax, self.beta)
+        P = profile.pressure(self.R)
+        V = profile.velocity(self.R)
+        fresh = HollandWindProfile(self.cLat, self.cLon, self.pEnv,
+                                   self.pCentre, self.rMax, self.beta)
+        self.numpyAssertAlmostEqual(V, fresh.velocity(self.R))
+        profile.beta = 1.1
+        P = (self.pCentre + (self.pEnv - self.pCentre) *
+             np.exp(-(self.rMax / self.R) ** 1.1))
+        self.numpyAssertAlmostEqual(profile.pressure(self.R), P)
+
+
 class TestWindField(NumpyTestCase.NumpyTestCase):
 
     def setUp(self):
@@ -196,6 +257,118 @@ class TestWindField(NumpyTestCase.NumpyTestCase):
         self.numpyAssertAlmostEqual(Ux, self.test_hubbert_Ux)
         self.numpyAssertAlmostEqual(Vy, self.test_hubbert_Vy)
 
+class TestBatchField(NumpyTestCase.NumpyTestCase):
+
+    def setUp(self):
+        pkl_file = open(os.path.join(
+            unittest_dir, 'test_data', 'windProfileTestData.pck'), 'rb')
+        self.R = cPickle.load(pkl_file)
+        self.pEnv = cPickle.load(pkl_file)
+        self.pCentre = cPickle.load(pkl_file)
+        self.rMax = cPickle.load(pkl_file)
+        self.cLat = cPickle.load(pkl_file)
+        self.cLon = cPickle.load(pkl_file)
+        pkl_file.close()
+
+        self.lam = np.arctan2(*np.meshgrid(np.linspace(-1., 1., self.R.shape[1]),
+                                           np.linspace(-1., 1., self.R.shape[0])))
+        self.lat = np.array([self.cLat, self.cLat - 1.])
+        self.lon = np.array([self.cLon, self.cLon + 1.])
+        self.eP = np.array([self.pEnv, self.pEnv])
+        self.cP = np.array([self.pCentre, self.pCentre + 1000.])
+        self.rMaxs = np.array([self.rMax, 1.5 * self.rMax])
+        self.vFm = np.array([5., 8.])
+        self.thetaFm = np.array([0.5, 1.0])
+
+    def assertBatchMatches(self, profileType, windFieldType):
+        R = np.array([self.R, self.R])
+        lam = np.array([self.lam, self.lam])
+        Ux, Vy = batchField(profileType, windFieldType, R, lam,
+                            self.lat, self.lon, self.eP, self.cP,
+                            self.rMaxs, self.vFm, self.thetaFm, 1.2,
+                            beta=1.3, beta1=1.5, beta2=1.4)
+
+        for n in range(2):
+            params = profileParams(profileType)
+            values = dict((k, v) for k, v in
+                          [('beta', 1.3), ('beta1', 1.5), ('beta2', 1.4)]
+                          if k in params)
+            prof = profile(profileType)(self.lat[n], self.lon[n],
+                                        self.eP[n], self.cP[n],
+                                        self.rMaxs[n], **values)
+            ux, vy = field(windFieldType)(prof).field(
+                self.R, self.lam, self.vFm[n], self.thetaFm[n], 1.2)
+            self.numpyAssertAlmostEqual(Ux[n], ux)
+            self.numpyAssertAlmostEqual(Vy[n], vy)
+
+    def testHollandKepert(self):
+        self.assertBatchMatches('holland', 'kepert')
+
+    def testPowellMcConochie(self):
+        self.assertBatchMatches('powell', 'mcconochie')
+
+    def testDoubleHollandHubbert(self):
+        self.assertBatchMatches('doubleholland', 'hubbert')
+
+    def testSinglePrecision(self):
+        """Test single precision fields stay within 0.01 m/s of double"""
+        for windFieldType in ['kepert', 'hubbert', 'mcconochie']:
+            fields = []
+            for dtype in [np.float32, np.float64]:
+                R = np.array([self.R, self.R], dtype=dtype)
+                lam = np.array([self.lam, self.lam], dtype=dtype)
+                fields.append(batchField('holland', windFieldType, R, lam,
+                                         self.lat, self.lon, self.eP,
+                                         self.cP, self.rMaxs, self.vFm,
+                                         self.thetaFm, 1.2, beta=1.3))
+            (Ux, Vy), (ux, vy) = fields
+            self.assertEqual(Ux.dtype, np.float32)
+            self.assertEqual(Vy.dtype, np.float32)
+            self.assertTrue(np.abs(np.hypot(Ux, Vy) -
+                                   np.hypot(ux, vy)).max() < 0.01)
+
+    def testTabulated(self):
+        """Test tabulated profiles stay within 0.05 m/s of the direct ones"""
+        R = np.array([self.R, self.R])
+        lam = np.array([self.lam, self.lam])
+        for profileType in ['holland', 'powell', 'doubleholland']:
+            fields = []
+            for table in [RadialTable(R, 0.1), None]:
+                fields.append(batchField(profileType, 'kepert', R, lam,
+                                         self.lat, self.lon, self.eP,
+                                         self.cP, self.rMaxs, self.vFm,
+                                         self.thetaFm, 1.2, table=table,
+                                         beta=1.3, beta1=1.5, beta2=1.4))
+            (Ux, Vy), (ux, vy) = fields
+            self.assertTrue(np.abs(Ux - ux).max() < 0.05)
+            self.assertTrue(np.abs(Vy - vy).max() < 0.05)
+
+
+    def testInfluenceRadius(self):
+        """Test the wind speed stays below the floor beyond the radius"""
+        prof = HollandWindProfile(self.cLat, self.cLon, self.pEnv,
+                                  self.pCentre, self.rMax, 1.3)
+        radii = np.arange(self.R.min(), self.R.max() + 1., 1.)
+        V = np.abs(prof.velocity(radii))
+        rInf = prof.influenceRadius(radii, 20.)
+        self.assertTrue(rInf > self.rMax)
+        self.assertTrue(np.all(V[radii >= rInf] < 20.))
+        self.assertEqual(prof.influenceRadius(radii, 1000.), 0.)
+
+class TestRadialTable(NumpyTestCase.NumpyTestCase):
+
+    def testInterpolate(self):
+        """Test linear profiles are interpolated exactly"""
+        R = np.array([[[0.2, 3.3], [10.75, 7.]],
+                      [[1.1, 0.2], [4.5, 12.]]])
+        table = RadialTable(R, step=0.5)
+        self.assertTrue(table.radii[-1] >= R.max())
+        self.numpyAssertAlmostEqual(table.interpolate(2. * table.radii),
+                                    2. * R)
+        values = np.array([table.radii, 3. * table.radii + 1.])
+        self.numpyAssertAlmostEqual(table.interpolate(values),
+                                    np.array([R[0], 3. * R[1] + 1.]))
+
 if __name__ == "__main__":
     testSuite = unittest.makeSuite(TestWindVelocity, 'test')
     unittest.TextTestRunner(verbosity=2).run(testSuite)
@@ -203,5 +376,14 @@ if __name__ == "__main__":
     testSuite = unittest.makeSuite(TestWindVorticity, 'test')
     unittest.TextTestRunner(verbosity=2).run(testSuite)
 
+    testSuite = unittest.makeSuite(TestWindPressure, 'test')
+    unittest.TextTestRunner(verbosity=2).run(testSuite)
+
     testSuite = unittest.makeSuite(TestWindField, 'test')
     unittest.TextTestRunner(verbosity=2).run(testSuite)
+
+    testSuite = unittest.makeSuite(TestBatchField, 'test')
+    unittest.TextTestRunner(verbosity=2).run(testSuite)
+
+    testSuite = unittest.makeSuite(TestRadialTable, 'test')
+    unittest.TextTestRunner(verbosity=2).run(testSuite)
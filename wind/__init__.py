@@ -22,18 +22,25 @@ import numpy as np
 import logging as log
 import itertools
 import math
+import multiprocessing
 import os
 import sys
+import time
+import warnings
 import windmodels
 from datetime import datetime 
 from os.path import join as pjoin, split as psplit, splitext as psplitext
-from collections import defaultdict
+from os.path import basename, isdir
+from collections import defaultdict, deque
+from multiprocessing.pool import ThreadPool
 
 from Utilities.files import flModDate, flProgramVersion
 from Utilities.config import ConfigParser
 from Utilities.metutils import convert, coriolis
-from Utilities.maputils import bearing2theta, makeGrid
+from Utilities.maputils import bearing2theta, makeGrid, makePoints
+from Utilities.maputils import StencilCache
 from Utilities.parallel import attemptParallel
+from Utilities.AsyncRun import AsyncWriter
 
 import Utilities.nctools as nctools
 
@@ -48,6 +55,28 @@ TRACKFILE_UNIT = ('', '', 'hr', 'degree', 'degree', 'kph', 'degrees',
 
 TRACKFILE_FMTS = ('i', 'object', 'f', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8')
 
+#: The number of (time, point) pairs evaluated together in point mode
+POINTS_PER_BATCH = 2 ** 16
+
+#: The largest changes of the track parameters (Pa, km, m/s and degrees)
+#: from a time whose local wind field is reused at later times
+REUSE_TOLERANCE = {
+    'CentralPressure': 20.,
+    'EnvPressure': 20.,
+    'rMax': 0.5,
+    'Speed': 0.5,
+    'Bearing': 2.,
+    'Latitude': 0.02
+}
+
+#: The (scale factor, add offset) packing the gust variables as int16
+GUST_PACKING = {
+    'vmax': (0.01, 0.),
+    'ua': (0.01, 0.),
+    'va': (0.01, 0.),
+    'slp': (1., 100000.)
+}
+
 TRACKFILE_CNVT = {
     0: lambda s: int(float(s.strip() or 0)),
     1: lambda s: datetime.strptime(s.strip(), DATEFORMAT),
@@ -117,6 +146,210 @@ class Track(object):
                 (np.max(self.Latitude) <= yMax))
 
 
+def scatterToGrid(mask, values, fill):
+    """
+    Scatter the `values` at the points of `mask` into a grid shaped like
+    `mask`, with all other points set to `fill`.
+    """
+    grid = np.empty(mask.shape, dtype=values.dtype)
+    grid.fill(fill)
+    grid[mask] = values
+    return grid
+
+
+def precisionType(precision):
+    """
+    Return the floating point type for the wind field `precision`.
+
+    :type  precision: str
+    :param precision: 'single' (float32) or 'double' (float64).
+
+    :raises ValueError: if the precision is not recognised.
+    """
+    try:
+        return {'single': np.float32,
+                'double': np.float64}[precision.lower()]
+    except KeyError:
+        raise ValueError('Unknown wind field precision: %s' % precision)
+
+
+class ExtremesAccumulator(object):
+    """
+    Accumulate the maximum wind gust (and the wind components at the
+    time of the maximum gust) and the minimum pressure over a grid.
+
+    Local wind fields are merged into the grid in place, one at a time,
+    without allocating any full-size temporary arrays. The bearing of
+    the maximum gust is only calculated on request, from the wind
+    components retained where a maximum was set.
+
+    The grid may cover only part (e.g. the swath of a track or a tile)
+    of a larger regional grid, in which case `offset` positions it on
+    the regional grid. All row and column indices are those of the
+    regional grid, and the parts of local fields beyond the grid are
+    ignored.
+
+    :type  shape: tuple
+    :param shape: the (ny, nx) shape of the grid.
+
+    :type  envPressure: float
+    :param envPressure: the initial (environmental) pressure.
+
+    :type  dtype: str
+    :param dtype: the data type of the accumulated grids.
+
+    :type  offset: tuple
+    :param offset: the (row, column) of the regional grid matching the
+                   first row and column of the grid.
+    """
+
+    def __init__(self, shape, envPressure, dtype='f', offset=(0, 0)):
+        self.gust = np.zeros(shape, dtype=dtype)
+        self.UU = np.zeros(shape, dtype=dtype)
+        self.VV = np.zeros(shape, dtype=dtype)
+        self.pressure = np.empty(shape, dtype=dtype)
+        self.pressure.fill(envPressure)
+        self.envPressure = envPressure
+        self.offset = offset
+
+    @classmethod
+    def region(cls, shape, dtype='f', offset=(0, 0)):
+        """
+        An empty regional grid, into which the extremes over parts of the
+        grid are merged (see :meth:`merge`).
+
+        :type  shape: tuple
+        :param shape: the (ny, nx) shape of the regional grid.
+
+        :type  offset: tuple
+        :param offset: the (row, column) of the regional grid matching
+                       the first row and column of the grid.
+        """
+        extremes = cls(shape, np.inf, dtype, offset)
+        extremes.envPressure = np.NaN
+        return extremes
+
+    def overlap(self, jmin, imin, shape):
+        """
+        The slices of the grid, and of a local field of the given
+        `shape` starting at row `jmin` and column `imin`, where they
+        overlap.
+        """
+        ny, nx = shape
+        NY, NX = self.gust.shape
+        j, i = jmin - self.offset[0], imin - self.offset[1]
+        j0, i0 = max(j, 0), max(i, 0)
+        j1, i1 = max(min(j + ny, NY), j0), max(min(i + nx, NX), i0)
+        return ((slice(j0, j1), slice(i0, i1)),
+                (slice(j0 - j, j1 - j), slice(i0 - i, i1 - i)))
+
+    def update(self, jmin, imin, gust, Ux, Vy, P):
+        """
+        Merge a local wind field into the grid.
+
+        :type  jmin: int
+        :param jmin: the row of the grid matching the first row of the
+                     local field.
+
+        :type  imin: int
+        :param imin: the column of the grid matching the first column of
+                     the local field.
+
+        :param gust: :class:`numpy.ndarray` of local wind gusts.
+        :param Ux: :class:`numpy.ndarray` of local eastward winds.
+        :param Vy: :class:`numpy.ndarray` of local northward winds.
+        :param P: :class:`numpy.ndarray` of local pressures.
+        """
+        region, local = self.overlap(jmin, imin, gust.shape)
+        gust, Ux, Vy = gust[local], Ux[local], Vy[local]
+
+        # Retain when there is a new maximum gust
+
+        maxGust = self.gust[region]
+        mask = np.greater(gust, maxGust)
+        np.copyto(maxGust, gust, where=mask)
+        np.copyto(self.UU[region], Ux, where=mask)
+        np.copyto(self.VV[region], Vy, where=mask)
+
+        self.updatePressure(jmin, imin, P)
+
+    def updatePressure(self, jmin, imin, P):
+        """
+        Retain the lowest pressure of a local pressure field.
+
+        :type  jmin: int
+        :param jmin: the row of the grid matching the first row of the
+                     local field.
+
+        :type  imin: int
+        :param imin: the column of the grid matching the first column of
+                     the local field.
+
+        :param P: :class:`numpy.ndarray` of local pressures.
+        """
+        region, local = self.overlap(jmin, imin, P.shape)
+        minPressure = self.pressure[region]
+        np.minimum(minPressure, P[local], out=minPressure)
+
+    def updatePoints(self, jj, ii, gust, Ux, Vy):
+        """
+        Merge scattered points of a local wind field into the grid.
+
+        :param jj: :class:`numpy.ndarray` of grid rows of the points.
+        :param ii: :class:`numpy.ndarray` of grid columns of the points.
+        :param gust: :class:`numpy.ndarray` of wind gusts at the points.
+        :param Ux: :class:`numpy.ndarray` of eastward winds at the points.
+        :param Vy: :class:`numpy.ndarray` of northward winds at the points.
+        """
+        jj, ii = jj - self.offset[0], ii - self.offset[1]
+        NY, NX = self.gust.shape
+        if len(jj) > 0 and (jj.min() < 0 or jj.max() >= NY or
+                            ii.min() < 0 or ii.max() >= NX):
+            inside = (jj >= 0) & (jj < NY) & (ii >= 0) & (ii < NX)
+            jj, ii = jj[inside], ii[inside]
+            gust, Ux, Vy = gust[inside], Ux[inside], Vy[inside]
+
+        mask = np.greater(gust, self.gust[jj, ii])
+        jj, ii = jj[mask], ii[mask]
+        self.gust[jj, ii] = gust[mask]
+        self.UU[jj, ii] = Ux[mask]
+        self.VV[jj, ii] = Vy[mask]
+
+    def merge(self, other):
+        """
+        Merge the extremes accumulated by `other`, over a part of the
+        same regional grid, into this grid. Beyond the part covered by
+        `other`, its environmental pressure is only applied by
+        :meth:`fillPressure`, once all the extremes have been merged.
+
+        :type  other: :class:`ExtremesAccumulator`
+        :param other: the extremes to merge.
+        """
+        if other.gust.size > 0:
+            jmin, imin = other.offset
+            self.update(jmin, imin, other.gust, other.UU, other.VV,
+                        other.pressure)
+        self.envPressure = np.fmin(self.envPressure, other.envPressure)
+
+    def fillPressure(self):
+        """
+        Lower the pressure to the lowest environmental pressure of the
+        merged extremes wherever it is higher.
+        """
+        np.minimum(self.pressure, self.envPressure, out=self.pressure)
+
+    def bearing(self):
+        """
+        Bearing (degrees) of the maximum gust. Points where no gust was
+        recorded have a bearing of zero.
+        """
+        bearing = np.zeros_like(self.gust)
+        mask = self.gust > 0.
+        bearing[mask] = (np.arctan2(-self.UU[mask], -self.VV[mask]) *
+                         180. / np.pi)
+        return bearing
+
+
 class WindfieldAroundTrack(object):
     """
     The windfield around the tropical cyclone track.
@@ -160,12 +393,59 @@ class WindfieldAroundTrack(object):
                       latitude and the *x* variable bounds the
                       longitude.
 
+    :type  stencilCache: :class:`Utilities.maputils.StencilCache`
+    :param stencilCache: optional cache of the polar grids around the
+                         eye, shared between tracks.
+
+    :type  batchSize: int
+    :param batchSize: number of timesteps evaluated together in one
+                      vectorised pass of the wind field model.
+
+    :type  precision: str
+    :param precision: 'single' to evaluate the wind and pressure fields
+                      in float32 (complex64 in the Kepert model), or
+                      'double' for float64.
+
+    :type  tableStep: float
+    :param tableStep: if given, the spacing (km) of a radial axis on
+                      which the wind and pressure profiles are evaluated
+                      before being interpolated onto the grid.
+
+    :type  windFloor: float
+    :param windFloor: if greater than zero, the wind gust (m/s) below
+                      which the wind field is of no interest. The wind
+                      field is then only evaluated within the radius of
+                      influence of the storm at each time (see
+                      :meth:`influenceRadius`).
+
+    :type  windModel: :class:`windmodels.WindModel`
+    :param windModel: the wind profile and wind field models. If not
+                      given, they are resolved from `profileType`,
+                      `windFieldType`, `beta`, `beta1` and `beta2`.
+
+    :type  threads: int
+    :param threads: the number of threads evaluating chunks of time
+                    steps concurrently (see :meth:`swathExtremes`).
+
+    :type  maxReuse: int
+    :param maxReuse: if greater than zero, the most consecutive times at
+                     which the local wind field of an earlier time is
+                     reused rather than evaluated (see :meth:`fieldSources`).
+
+    :type  reuseTolerance: :class:`dict`
+    :param reuseTolerance: the largest changes of the track parameters
+                           over which a wind field is reused, keyed by
+                           track field (see `REUSE_TOLERANCE`).
+
     """
 
     def __init__(self, track, profileType='powell', windFieldType='kepert',
                  beta=1.5, beta1=1.5, beta2=1.4, thetaMax=70.0,
                  margin=2.0, resolution=0.05, gustFactor=1.23,
-                 gridLimit=None):
+                 gridLimit=None, stencilCache=None, batchSize=1,
+                 precision='double', tableStep=None, windFloor=0.,
+                 windModel=None, threads=1, maxReuse=0,
+                 reuseTolerance=None):
         self.track = track
         self.profileType = profileType
         self.windFieldType = windFieldType
@@ -177,6 +457,20 @@ class WindfieldAroundTrack(object):
         self.resolution = resolution
         self.gustFactor = gustFactor
         self.gridLimit = gridLimit
+        self.stencilCache = stencilCache
+        self.batchSize = max(1, int(batchSize))
+        self.dtype = precisionType(precision)
+        self.tableStep = tableStep
+        self.windFloor = windFloor
+        self.threads = max(1, int(threads))
+        self.maxReuse = maxReuse
+        self.reuseTolerance = reuseTolerance or REUSE_TOLERANCE
+
+        if windModel is None:
+            windModel = windmodels.WindModel(profileType, windFieldType,
+                                             beta=beta, beta1=beta1,
+                                             beta2=beta2)
+        self.windModel = windModel
 
     def polarGridAroundEye(self, i):
         """
@@ -186,11 +480,30 @@ class WindfieldAroundTrack(object):
         :type  i: int
         :param i: the time.
         """
-        R, theta = makeGrid(self.track.Longitude[i],
-                            self.track.Latitude[i],
-                            self.margin, self.resolution)
+        if self.stencilCache is not None:
+            grid = self.stencilCache.makeGrid
+        else:
+            grid = makeGrid
+
+        R, theta = grid(self.track.Longitude[i],
+                        self.track.Latitude[i],
+                        self.margin, self.resolution)
         return R, theta
 
+    def stormProfile(self, times):
+        """
+        The wind profile of the tropical cyclone at the time (or times)
+        `times`.
+
+        :type  times: int or list of int
+        :param times: the time, or the times for a stack of profiles.
+        """
+        return self.windModel.profile(self.track.Latitude[times],
+                                      self.track.Longitude[times],
+                                      self.track.EnvPressure[times],
+                                      self.track.CentralPressure[times],
+                                      self.track.rMax[times], self.dtype)
+
     def pressureProfile(self, i, R):
         """
         Calculate the pressure profile at time `i` at the radiuses `R`
@@ -203,21 +516,140 @@ class WindfieldAroundTrack(object):
         :type  R: :class:`numpy.ndarray`
         :param R: the radiuses around the tropical cyclone.
         """
-        from PressureInterface.pressureProfile import PrsProfile as PressureProfile
+        return self.stormProfile(i).pressure(R)
 
-        p = PressureProfile(R, self.track.EnvPressure[i],
-                            self.track.CentralPressure[i],
-                            self.track.rMax[i],
-                            self.track.Latitude[i],
-                            self.track.Longitude[i],
-                            self.beta, beta1=self.beta1,
-                            beta2=self.beta2)
-        try:
-            pressure = getattr(p, self.profileType)
-        except AttributeError:
-            msg = '%s not implemented in pressureProfile' % self.profileType
-            log.exception(msg)
-        return pressure()
+    def influenceRadius(self, i, R, profile=None):
+        """
+        The radius of influence of the tropical cyclone at time `i`,
+        beyond which the wind gusts stay below the wind floor. The
+        surface winds are bounded by the gradient wind speed of the
+        profile plus the forward speed of the storm, with a 10% margin
+        as the Kepert boundary layer winds exceed that by up to 3%.
+
+        :type  i: int
+        :param i: the time.
+
+        :type  R: :class:`numpy.ndarray`
+        :param R: the radiuses of the grid around the tropical cyclone.
+
+        :param profile: the wind profile at time `i`, if already known.
+
+        :returns: the radius of influence (km).
+        """
+        vFloor = (self.windFloor / (1.1 * self.gustFactor) -
+                  self.track.Speed[i])
+        if vFloor <= 0.:
+            return np.inf
+
+        if profile is None:
+            profile = self.stormProfile(i)
+        radii = np.arange(R.min(), R.max() + 1., 1., dtype=R.dtype)
+        return profile.influenceRadius(radii, vFloor)
+
+    def gridsAroundEye(self, times):
+        """
+        The polar grids around the eye at the times `times`, stacked into
+        (n, ny, nx) arrays with the precision of the wind fields.
+        """
+        grids = [self.polarGridAroundEye(i) for i in times]
+        R = np.array([grid[0] for grid in grids], dtype=self.dtype)
+        theta = np.array([grid[1] for grid in grids], dtype=self.dtype)
+
+        if self.dtype == np.float32:
+            # The centre of the grid sits at a nominal 1e-30 km, which
+            # overflows (rMax/R)**beta in single precision. Pull it out
+            # to a radius that is still effectively zero.
+            np.maximum(R, 1e-6, out=R)
+
+        return R, theta
+
+    def fieldSources(self, times):
+        """
+        The time whose local wind field is used at each of the `times`.
+        Normally every time is evaluated. With field reuse (see
+        `maxReuse`), the storm-relative field of the last time evaluated
+        is used instead, only placed at the new position of the storm,
+        as long as the track parameters stay within `reuseTolerance` of
+        that time, for at most `maxReuse` consecutive times.
+
+        :type  times: list of int
+        :param times: the times, in order.
+
+        :returns: :class:`numpy.ndarray` of the times to evaluate.
+        """
+        sources = np.array(times, dtype=int)
+        if self.maxReuse <= 0 or len(sources) == 0:
+            return sources
+
+        source, count = sources[0], 0
+        for k in xrange(1, len(sources)):
+            if count < self.maxReuse and \
+               self.withinTolerance(source, sources[k]):
+                sources[k] = source
+                count += 1
+            else:
+                source, count = sources[k], 0
+        return sources
+
+    def withinTolerance(self, i, j):
+        """
+        Check the track parameters at times `i` and `j` differ by no more
+        than `reuseTolerance`.
+        """
+        for name, tolerance in self.reuseTolerance.items():
+            values = self.track.data[name]
+            change = abs(values[j] - values[i])
+            if name == 'Bearing':
+                change = math.degrees(min(change, 2. * np.pi - change))
+            if change > tolerance:
+                return False
+        return True
+
+    def tabulated(self, profile, R):
+        """
+        The wind `profile` tabulated for the radiuses `R`, if a radial
+        table is in use.
+        """
+        if self.tableStep:
+            return profile.tabulated(windmodels.RadialTable(R,
+                                                            self.tableStep))
+        return profile
+
+    def localWindPoints(self, i):
+        """
+        Calculate the local wind field at time `i` on the points of the
+        grid within the radius of influence of the tropical cyclone.
+
+        :type  i: int
+        :param i: the time.
+
+        :returns: the boolean mask of the points on the grid, the
+                  eastward and northward winds at the points and the
+                  pressure on the whole grid.
+        """
+        R, theta = self.gridsAroundEye([i])
+        R, theta = R[0], theta[0]
+        profile = self.stormProfile(i)
+
+        # The pressure is still of interest beyond the radius of influence
+
+        P = self.tabulated(profile, R).pressure(R)
+
+        mask = R <= self.influenceRadius(i, R, profile)
+        if not mask.any():
+            # The storm is too weak to reach the wind floor anywhere
+            empty = np.zeros(0, dtype=R.dtype)
+            return (mask, empty, empty.copy(), P)
+
+        R = R[mask]
+        theta = theta[mask]
+
+        Ux, Vy = self.windModel.field(self.tabulated(profile, R), R, theta,
+                                      self.track.Speed[i],
+                                      self.track.Bearing[i],
+                                      self.thetaMax)
+
+        return (mask, Ux, Vy, P)
 
     def localWindField(self, i):
         """
@@ -227,36 +659,141 @@ class WindfieldAroundTrack(object):
         :type  i: int
         :param i: the time.
         """
-        lat = self.track.Latitude[i]
-        lon = self.track.Longitude[i]
-        eP = self.track.EnvPressure[i]
-        cP = self.track.CentralPressure[i]
-        rMax = self.track.rMax[i]
-        vFm = self.track.Speed[i]
-        thetaFm = self.track.Bearing[i]
-        thetaMax = self.thetaMax
+        Ux, Vy, P = self.localWindFields([i])
+        return (Ux[0], Vy[0], P[0])
 
-        #FIXME: temporary way to do this
-        cls = windmodels.profile(self.profileType)
-        params = windmodels.profileParams(self.profileType)
-        values = [getattr(self, p) for p in params if hasattr(self, p)]
-        profile = cls(lat, lon, eP, cP, rMax, *values)
-
-        R, theta = self.polarGridAroundEye(i)
+    def localWindFields(self, times):
+        """
+        Calculate the local wind fields at the times `times` around the
+        tropical cyclone. The wind and pressure fields for all the times
+        are evaluated from the same wind profiles, in a single vectorised
+        pass (see :func:`windmodels.batchField`).
 
-        P = self.pressureProfile(i, R)
-        f = coriolis(self.track.Latitude[i])
+        :type  times: list of int
+        :param times: the times.
 
-        #FIXME: temporary way to do this
-        cls = windmodels.field(self.windFieldType)
-        params = windmodels.fieldParams(self.windFieldType)
-        values = [getattr(self, p) for p in params if hasattr(self, p)]
-        windfield = cls(profile, *values)
+        :returns: the eastward and northward winds and the pressure,
+                  each stacked into an (n, ny, nx) array.
+        """
+        R, theta = self.gridsAroundEye(times)
+        profile = self.tabulated(self.stormProfile(times), R)
 
-        Ux, Vy = windfield.field(R, theta, vFm, thetaFm,  thetaMax)
+        P = profile.pressure(R)
+        Ux, Vy = self.windModel.field(profile, R, theta,
+                                      self.track.Speed[times],
+                                      self.track.Bearing[times],
+                                      self.thetaMax)
 
         return (Ux, Vy, P)
 
+    def pointWindFields(self, times, lon, lat):
+        """
+        Calculate the local winds at the times `times` at the points
+        (`lon`, `lat`) only, rather than on the grid around the tropical
+        cyclone. The distance and angle of the points are calculated
+        directly from the storm centre at each time (see
+        :func:`Utilities.maputils.makePoints`).
+
+        :type  times: list of int
+        :param times: the times.
+
+        :param lon: :class:`numpy.ndarray` of longitudes of the points.
+        :param lat: :class:`numpy.ndarray` of latitudes of the points.
+
+        :returns: the eastward and northward winds and the pressure,
+                  each an (n, m) array for n times and m points.
+        """
+        R, theta = makePoints(self.track.Longitude[times],
+                              self.track.Latitude[times], lon, lat)
+
+        # Shaped (n, 1, m) like a stack of grids
+
+        R = R[:, np.newaxis, :].astype(self.dtype)
+        theta = theta[:, np.newaxis, :].astype(self.dtype)
+        if self.dtype == np.float32:
+            np.maximum(R, 1e-6, out=R)
+
+        profile = self.stormProfile(times)
+        P = profile.pressure(R)
+        Ux, Vy = self.windModel.field(profile, R, theta,
+                                      self.track.Speed[times],
+                                      self.track.Bearing[times],
+                                      self.thetaMax)
+
+        return (Ux[:, 0], Vy[:, 0], P[:, 0])
+
+    def pointTimeseries(self, gridLimit, lon, lat, pointCallback=None):
+        """
+        Calculate the wind gusts and pressure at the points (`lon`,
+        `lat`) at every time the track falls in the region, without
+        evaluating the wind field on a grid (see
+        :meth:`pointWindFields`). As on the local grids, the winds are
+        calm beyond the margin around the storm centre.
+
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered
+                          (see :meth:`regionalExtremes`).
+
+        :param lon: :class:`numpy.ndarray` of longitudes of the points.
+        :param lat: :class:`numpy.ndarray` of latitudes of the points.
+
+        :type  pointCallback: function
+        :param pointCallback: optional function to be called on each time
+                              step with the time, the gust, eastward and
+                              northward gusts and pressure at the points,
+                              and whether each point is within the margin
+                              around the storm centre.
+
+        :returns: the maximum gust at each point.
+        """
+        _, _, times, _, _, _ = self.swathIndices(gridLimit)
+        maxGust = np.zeros(len(lon), dtype=self.dtype)
+
+        nbatch = max(1, POINTS_PER_BATCH // max(1, len(lon)))
+        for k in xrange(0, len(times), nbatch):
+            batch = times[k:k + nbatch]
+            Ux, Vy, P = self.pointWindFields(batch, lon, lat)
+
+            cLon = self.track.Longitude[batch][:, np.newaxis]
+            cLat = self.track.Latitude[batch][:, np.newaxis]
+            with np.errstate(invalid='ignore'):
+                inside = ((np.abs(lon - cLon) <= self.margin) &
+                          (np.abs(lat - cLat) <= self.margin))
+
+            Ux *= self.gustFactor
+            Vy *= self.gustFactor
+            Ux[~inside] = 0.
+            Vy[~inside] = 0.
+            gust = np.hypot(Ux, Vy)
+            np.maximum(maxGust, gust.max(axis=0), out=maxGust)
+
+            if pointCallback is not None:
+                for j, i in enumerate(batch):
+                    pointCallback(self.track.Datetime[i], gust[j], Ux[j],
+                                  Vy[j], P[j], inside[j])
+
+        return maxGust
+
+    def regionalGrid(self, gridLimit):
+        """
+        The 'centidegree' integer latitudes and longitudes of the
+        regional grid covering `gridLimit` and the margin around it.
+
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered.
+        """
+        gridMargin = int(100. * self.margin)
+        gridStep = int(100. * self.resolution)
+
+        minLat = int(100. * gridLimit['yMin']) - gridMargin
+        maxLat = int(100. * gridLimit['yMax']) + gridMargin
+        minLon = int(100. * gridLimit['xMin']) - gridMargin
+        maxLon = int(100. * gridLimit['xMax']) + gridMargin
+
+        latGrid = np.arange(minLat, maxLat + gridStep, gridStep, dtype=int)
+        lonGrid = np.arange(minLon, maxLon + gridStep, gridStep, dtype=int)
+        return latGrid, lonGrid
+
     def regionalExtremes(self, gridLimit, timeStepCallback=None):
         """
         Calculate the maximum potential wind gust and minimum
@@ -274,10 +811,40 @@ class WindfieldAroundTrack(object):
         :type  timeStepCallback: function
         :param timeStepCallback: the function to be called on each time step.
         """
+        swath, lon, lat = self.swathExtremes(gridLimit, timeStepCallback)
+
+        extremes = ExtremesAccumulator.region((len(lat), len(lon)))
+        extremes.merge(swath)
+        extremes.fillPressure()
+
+        return (extremes.gust, extremes.bearing(), extremes.UU, extremes.VV,
+                extremes.pressure, lon, lat)
+
+    def envPressure(self):
+        """
+        The environmental pressure of the track, which is the pressure
+        wherever the track has no influence.
+        """
         if len(self.track.data) > 0:
-            envPressure = self.track.EnvPressure[0]
+            return self.track.EnvPressure[0]
         else:
-            envPressure = np.NaN
+            return np.NaN
+
+    def swathIndices(self, gridLimit):
+        """
+        Map the local grids of the times when the track falls in the
+        region to the regional grid.
+
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered
+                          (see :meth:`regionalExtremes`).
+
+        :returns: the 'centidegree' latitudes and longitudes of the
+                  regional grid, the times in the region, the rows and
+                  columns of the regional grid matching the first row
+                  and column of the local grid at every time, and the
+                  size of the (square) local grids.
+        """
 
         # Get the limits of the region
 
@@ -291,105 +858,278 @@ class WindfieldAroundTrack(object):
         gridMargin = int(100. * self.margin)
         gridStep = int(100. * self.resolution)
 
-        minLat = int(100. * yMin) - gridMargin
-        maxLat = int(100. * yMax) + gridMargin
-        minLon = int(100. * xMin) - gridMargin
-        maxLon = int(100. * xMax) + gridMargin
-
-        latGrid = np.arange(minLat, maxLat + gridStep, gridStep, dtype=int)
-        lonGrid = np.arange(minLon, maxLon + gridStep, gridStep, dtype=int)
-
-        [cGridX, cGridY] = np.meshgrid(lonGrid, latGrid)
-
-        # Initialise the region
-
-        UU = np.zeros_like(cGridX, dtype='f')
-        VV = np.zeros_like(cGridY, dtype='f')
-        bearing = np.zeros_like(cGridX, dtype='f')
-        gust = np.zeros_like(cGridX, dtype='f')
-        pressure = np.ones_like(cGridX, dtype='f') * envPressure
+        latGrid, lonGrid = self.regionalGrid(gridLimit)
+        minLat, minLon = latGrid[0], lonGrid[0]
 
         lonCDegree = np.array(100. * self.track.Longitude, dtype=int)
         latCDegree = np.array(100. * self.track.Latitude, dtype=int)
 
+        # Map the local grids to the regional grid
+
+        jmins = ((latCDegree - minLat - gridMargin) / gridStep).astype(int)
+        imins = ((lonCDegree - minLon - gridMargin) / gridStep).astype(int)
+
         # We only consider the times when the TC track falls in the region
 
         timesInRegion = np.where((xMin <= self.track.Longitude) &
                                 (self.track.Longitude <= xMax) &
                                 (yMin <= self.track.Latitude) &
                                 (self.track.Latitude <= yMax))[0]
-        
-        for i in timesInRegion:
 
-            # Map the local grid to the regional grid
+        size = len(xrange(0, 2 * int(1000 * self.margin) + 1,
+                          int(1000 * self.resolution)))
+
+        return latGrid, lonGrid, timesInRegion, jmins, imins, size
+
+    def swathBounds(self, gridLimit):
+        """
+        The bounding box of the swath of the local grids across the
+        region, as the limits (x1, x2, y1, y2) of the columns and rows
+        of the regional grid (see :meth:`hazard.TileGrid.getGridLimit`),
+        or None when the track does not fall in the region.
+
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered
+                          (see :meth:`regionalExtremes`).
+        """
+        _, _, times, jmins, imins, size = self.swathIndices(gridLimit)
+        if len(times) == 0:
+            return None
+        return (imins[times].min(), imins[times].max() + size,
+                jmins[times].min(), jmins[times].max() + size)
 
-            jmin = int((latCDegree[i] - minLat - gridMargin) / gridStep)
-            jmax = int((latCDegree[i] - minLat + gridMargin) / gridStep) + 1
-            imin = int((lonCDegree[i] - minLon - gridMargin) / gridStep)
-            imax = int((lonCDegree[i] - minLon + gridMargin) / gridStep) + 1
+    def swathExtremes(self, gridLimit, timeStepCallback=None, window=None):
+        """
+        Calculate the maximum potential wind gust and minimum pressure
+        throughout the life of the tropical cyclone, over the bounding
+        box of its swath across the region only.
 
-            # Calculate the local wind speeds and pressure at time i
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered
+                          (see :meth:`regionalExtremes`).
 
-            Ux, Vy, P = self.localWindField(i)
+        :type  timeStepCallback: function
+        :param timeStepCallback: the function to be called on each time step.
 
-            # Calculate the local wind gust and bearing
+        :type  window: tuple
+        :param window: optional limits (x1, x2, y1, y2) of the columns
+                       and rows of the regional grid (e.g. a tile) to
+                       which the swath is restricted. Only the times when
+                       the local grid overlaps the window are evaluated.
 
-            Ux *= self.gustFactor
-            Vy *= self.gustFactor
+        With more than one thread, chunks of consecutive times are
+        evaluated concurrently and their extremes combined by max/min
+        reduction, which leaves the result unchanged.
 
-            localGust = np.sqrt(Ux ** 2 + Vy ** 2)
-            localBearing = ((np.arctan2(-Ux, -Vy)) * 180. / np.pi)
+        :returns: the :class:`ExtremesAccumulator` of the swath, which
+                  is positioned on the regional grid by its offset, and
+                  the longitudes and latitudes of the regional grid.
+        """
+        envPressure = self.envPressure()
 
-            # Handover this time step to a callback if required
-            
-        for i in timesInRegion:
+        latGrid, lonGrid, timesInRegion, jmins, imins, size = \
+            self.swathIndices(gridLimit)
 
-            # Map the local grid to the regional grid
+        # Restrict the swath to the window
 
-            jmin = int((latCDegree[i] - minLat - gridMargin) / gridStep)
-            jmax = int((latCDegree[i] - minLat + gridMargin) / gridStep) + 1
-            imin = int((lonCDegree[i] - minLon - gridMargin) / gridStep)
-            imax = int((lonCDegree[i] - minLon + gridMargin) / gridStep) + 1
+        if window is not None:
+            x1, x2, y1, y2 = window
+            jj, ii = jmins[timesInRegion], imins[timesInRegion]
+            overlaps = ((jj < y2) & (jj + size > y1) &
+                        (ii < x2) & (ii + size > x1))
+            timesInRegion = timesInRegion[overlaps]
 
-            # Calculate the local wind speeds and pressure at time i
+        extremes = self._swathAccumulator(timesInRegion, jmins, imins, size,
+                                          window, envPressure)
 
-            Ux, Vy, P = self.localWindField(i)
+        if self.threads > 1 and len(timesInRegion) > 1:
+            self._threadedExtremes(timesInRegion, extremes, jmins, imins,
+                                   size, window, lonGrid, latGrid,
+                                   timeStepCallback)
+        else:
+            self._accumulateExtremes(timesInRegion, extremes, jmins, imins,
+                                     lonGrid, latGrid, timeStepCallback)
 
-            # Calculate the local wind gust and bearing
+        return extremes, lonGrid / 100., latGrid / 100.
 
-            Ux *= self.gustFactor
-            Vy *= self.gustFactor
+    def timeStepCallbacks(self, gridLimit, timeStepCallback):
+        """
+        Evaluate the local wind field of each time step of the tropical
+        cyclone within the region and hand it over to the
+        `timeStepCallback`, in time order, without accumulating any
+        extremes (see :meth:`swathExtremes`).
 
-            localGust = np.sqrt(Ux ** 2 + Vy ** 2)
-            localBearing = ((np.arctan2(-Ux, -Vy)) * 180. / np.pi)
+        :type  gridLimit: :class:`dict`
+        :param gridLimit: the domain where the tracks will be considered
+                          (see :meth:`regionalExtremes`).
 
-            # Handover this time step to a callback if required
-            
+        :type  timeStepCallback: function
+        :param timeStepCallback: the function to be called on each time step.
+        """
+        latGrid, lonGrid, timesInRegion, jmins, imins, size = \
+            self.swathIndices(gridLimit)
+        self._accumulateExtremes(timesInRegion, None, jmins, imins,
+                                 lonGrid, latGrid, timeStepCallback)
+
+    def _swathAccumulator(self, times, jmins, imins, size, window,
+                          envPressure):
+        """
+        An :class:`ExtremesAccumulator` over the bounding box of the
+        local grids at the times `times`, restricted to the `window`.
+        """
+        if len(times) == 0:
+            return ExtremesAccumulator((0, 0), envPressure)
+
+        j0, i0 = jmins[times].min(), imins[times].min()
+        j1, i1 = jmins[times].max() + size, imins[times].max() + size
+        if window is not None:
+            x1, x2, y1, y2 = window
+            j0, j1 = max(j0, y1), min(j1, y2)
+            i0, i1 = max(i0, x1), min(i1, x2)
+
+        return ExtremesAccumulator((j1 - j0, i1 - i0), envPressure,
+                                   offset=(j0, i0))
+
+    def _threadedExtremes(self, times, extremes, jmins, imins, size, window,
+                          lonGrid, latGrid, timeStepCallback=None):
+        """
+        Merge the local wind fields at the times `times` into the
+        `extremes`, evaluating chunks of consecutive times concurrently
+        on a pool of threads (NumPy releases the GIL in its array
+        kernels). Each chunk accumulates the extremes over its own swath.
+        The chunks are then reduced into the `extremes`, and their time
+        step callbacks made, in time order.
+        """
+        nchunks = min(4 * self.threads,
+                      int(np.ceil(len(times) / float(self.batchSize))))
+        chunks = np.array_split(times, nchunks)
+
+        def evaluate(chunk):
+            swath = self._swathAccumulator(chunk, jmins, imins, size,
+                                           window, extremes.envPressure)
+            calls = []
+            callback = None
             if timeStepCallback is not None:
-                timeStepCallback(self.track.Datetime[i], 
-                                 localGust, Ux, Vy, P,
-                                 lonGrid[imin:imax] / 100., 
-                                 latGrid[jmin:jmax] / 100.)
+                callback = lambda *args: calls.append(args)
+            self._accumulateExtremes(chunk, swath, jmins, imins,
+                                     lonGrid, latGrid, callback)
+            return swath, calls
+
+        pool = ThreadPool(self.threads)
+        try:
+            for swath, calls in pool.imap(evaluate, chunks):
+                for args in calls:
+                    timeStepCallback(*args)
+                extremes.merge(swath)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _accumulateExtremes(self, times, extremes, jmins, imins, lonGrid,
+                            latGrid, timeStepCallback=None):
+        """
+        Merge the local wind fields at the times `times` into the
+        `extremes`, one batch of times at a time. With no `extremes`,
+        only the time step callbacks are made.
+        """
+
+        # The times whose wind fields are evaluated, and the times at
+        # which each is placed
+
+        sources = self.fieldSources(times)
+        placements = defaultdict(list)
+        for i, source in zip(times, sources):
+            placements[source].append(i)
+        evaluated = sorted(placements)
+
+        # With a wind floor, only the points within the radius of
+        # influence are evaluated, one time at a time
+
+        if self.windFloor > 0.:
+            for source in evaluated:
+                points = self._localGustPoints(source)
+                for i in placements[source]:
+                    self._sparseExtremes(i, extremes, jmins[i], imins[i],
+                                         lonGrid, latGrid, points,
+                                         timeStepCallback)
+            return
+
+        batches = [evaluated[k:k + self.batchSize]
+                   for k in xrange(0, len(evaluated), self.batchSize)]
+
+        for batch in batches:
+
+            # Calculate the local wind speeds, gusts and pressure for a
+            # batch of times
+
+            UxBatch, VyBatch, PBatch = self.localWindFields(batch)
+
+            UxBatch *= self.gustFactor
+            VyBatch *= self.gustFactor
+            gustBatch = np.hypot(UxBatch, VyBatch)
+
+            for k, source in enumerate(batch):
+
+                localGust = gustBatch[k]
+                Ux, Vy, P = UxBatch[k], VyBatch[k], PBatch[k]
 
-            # Retain when there is a new maximum gust
-            mask = localGust > gust[jmin:jmax, imin:imax]
+                for i in placements[source]:
 
-            gust[jmin:jmax, imin:imax] = np.where(
-                mask, localGust, gust[jmin:jmax, imin:imax])
-            bearing[jmin:jmax, imin:imax] = np.where(
-                mask, localBearing, bearing[jmin:jmax, imin:imax])
-            UU[jmin:jmax, imin:imax] = np.where(
-                mask, Ux, UU[jmin:jmax, imin:imax])
-            VV[jmin:jmax, imin:imax] = np.where(
-                mask, Vy, VV[jmin:jmax, imin:imax])
+                    jmin, imin = jmins[i], imins[i]
 
-            # Retain the lowest pressure
+                    # Handover this time step to a callback if required
 
-            pressure[jmin:jmax, imin:imax] = np.where(
-                P < pressure[jmin:jmax, imin:imax],
-                P, pressure[jmin:jmax, imin:imax])
+                    if timeStepCallback is not None:
+                        ny, nx = localGust.shape
+                        timeStepCallback(self.track.Datetime[i],
+                                         localGust, Ux, Vy, P,
+                                         lonGrid[imin:imin + nx] / 100.,
+                                         latGrid[jmin:jmin + ny] / 100.)
 
-        return gust, bearing, UU, VV, pressure, lonGrid / 100., latGrid / 100.
+                    # Retain the maximum gust and the lowest pressure
+
+                    if extremes is not None:
+                        extremes.update(jmin, imin, localGust, Ux, Vy, P)
+
+    def _localGustPoints(self, i):
+        """
+        The local wind gusts at time `i` on the points of the grid within
+        the radius of influence (see :meth:`localWindPoints`).
+
+        :returns: the boolean mask of the points on the grid, the gusts
+                  and eastward and northward gusts at the points and the
+                  pressure on the whole grid.
+        """
+        mask, Ux, Vy, P = self.localWindPoints(i)
+        Ux *= self.gustFactor
+        Vy *= self.gustFactor
+        return (mask, np.hypot(Ux, Vy), Ux, Vy, P)
+
+    def _sparseExtremes(self, i, extremes, jmin, imin, lonGrid, latGrid,
+                        points, timeStepCallback=None):
+        """
+        Merge the local wind `points` (see :meth:`_localGustPoints`),
+        evaluated within the radius of influence only, into the
+        `extremes` at time `i`. The callback receives the full local
+        grids, with calm winds outside the radius of influence.
+        """
+        mask, localGust, Ux, Vy, P = points
+
+        if timeStepCallback is not None:
+            ny, nx = mask.shape
+            timeStepCallback(self.track.Datetime[i],
+                             scatterToGrid(mask, localGust, 0.),
+                             scatterToGrid(mask, Ux, 0.),
+                             scatterToGrid(mask, Vy, 0.), P,
+                             lonGrid[imin:imin + nx] / 100.,
+                             latGrid[jmin:jmin + ny] / 100.)
+
+        if extremes is None:
+            return
+
+        jj, ii = np.nonzero(mask)
+        extremes.updatePoints(jj + jmin, ii + imin, localGust, Ux, Vy)
+        extremes.updatePressure(jmin, imin, P)
 
 
 class WindfieldGenerator(object):
@@ -428,11 +1168,67 @@ class WindfieldGenerator(object):
                       variable bounds the latitude and the *x* variable bounds
                       the longitude.
 
+    :type  stencilCache: :class:`Utilities.maputils.StencilCache`
+    :param stencilCache: optional cache of the polar grids around the
+                         eye, shared by all tracks processed by this
+                         generator.
+
+    :type  batchSize: int
+    :param batchSize: number of timesteps evaluated together in one
+                      vectorised pass of the wind field model.
+
+    :type  precision: str
+    :param precision: 'single' or 'double' precision wind fields.
+
+    :type  tableStep: float
+    :param tableStep: if given, the spacing (km) of the radial axis on
+                      which the profiles are tabulated.
+
+    :type  windFloor: float
+    :param windFloor: if greater than zero, the wind gust (m/s) below
+                      which the wind fields are not evaluated.
+
+    :type  tileSize: int
+    :param tileSize: if greater than zero, the size (grid points) of the
+                     tiles into which the regional grid is split when
+                     dumping the gusts (see :meth:`dumpGustTilesFromTracks`).
+
+    :type  threads: int
+    :param threads: the number of threads evaluating the time steps of
+                    each track concurrently.
+
+    :type  writeQueue: int
+    :param writeQueue: if greater than zero, the number of gust files
+                       that can be waiting to be written by a background
+                       thread while the next track file is calculated.
+
+    :type  packOutput: bool
+    :param packOutput: if True, the gust variables are packed as int16
+                       (see `GUST_PACKING`), to about half the size.
+
+    :type  outputVariables: list of str
+    :param outputVariables: the variables of the gust files, of 'vmax',
+                            'ua', 'va' and 'slp'. Only 'vmax' is used
+                            by the hazard calculation.
+
+    :type  maxReuse: int
+    :param maxReuse: if greater than zero, the most consecutive time
+                     steps at which an earlier local wind field is reused
+                     (see :meth:`WindfieldAroundTrack.fieldSources`).
+
+    :type  reuseTolerance: :class:`dict`
+    :param reuseTolerance: the largest changes of the track parameters
+                           over which a wind field is reused.
+
     """
 
     def __init__(self, config, margin=2.0, resolution=0.05, profileType='powell',
                  windFieldType='kepert', beta=1.5, beta1=1.5, beta2=1.4,
-                 thetaMax=70.0, gridLimit=None):
+                 thetaMax=70.0, gridLimit=None, stencilCache=None,
+                 batchSize=1, precision='double', tableStep=None,
+                 windFloor=0., tileSize=0, threads=1, writeQueue=0,
+                 packOutput=False, outputVariables=None, maxReuse=0,
+                 reuseTolerance=None):
         self.config = config
         self.margin = margin
         self.resolution = resolution
@@ -443,6 +1239,23 @@ class WindfieldGenerator(object):
         self.beta2 = beta2
         self.thetaMax = thetaMax
         self.gridLimit = gridLimit
+        self.stencilCache = stencilCache
+        self.batchSize = batchSize
+        self.precision = precision
+        self.tableStep = tableStep
+        self.windFloor = windFloor
+        self.tileSize = tileSize
+        self.threads = threads
+        self.writeQueue = writeQueue
+        self.packOutput = packOutput
+        self.outputVariables = outputVariables or ['vmax', 'ua', 'va', 'slp']
+        self.maxReuse = maxReuse
+        self.reuseTolerance = reuseTolerance
+        self.costs = {}
+        self.gatts = self._globalAttributes()
+        self.windModel = windmodels.WindModel(profileType, windFieldType,
+                                              beta=beta, beta1=beta1,
+                                              beta2=beta2)
 
     def setGridLimit(self, track):
         
@@ -471,21 +1284,59 @@ class WindfieldGenerator(object):
                          extract point values for specified locations.
                          
         """
-        wt = WindfieldAroundTrack(track,
-                                  profileType=self.profileType,
-                                  windFieldType=self.windFieldType,
-                                  beta=self.beta,
-                                  beta1=self.beta1,
-                                  beta2=self.beta2,
-                                  thetaMax=self.thetaMax,
-                                  margin=self.margin,
-                                  resolution=self.resolution)
-        
+        wt = self.windfieldAroundTrack(track)
+
         if self.gridLimit is None:
             self.setGridLimit(track)
             
         return track, wt.regionalExtremes(self.gridLimit, callback)
-            
+
+    def calculateSwathFromTrack(self, track, callback=None):
+        """
+        Calculate the wind extremes given a single tropical cyclone
+        track, over the bounding box of its swath only (see
+        :meth:`WindfieldAroundTrack.swathExtremes`).
+
+        :type  track: :class:`Track`
+        :param track: the tropical cyclone track.
+
+        :type  callback: function
+        :param callback: optional function to be called at each timestep to
+                         extract point values for specified locations.
+        """
+        wt = self.windfieldAroundTrack(track)
+
+        if self.gridLimit is None:
+            self.setGridLimit(track)
+
+        return track, wt.swathExtremes(self.gridLimit, callback)
+
+    def windfieldAroundTrack(self, track):
+        """
+        The :class:`WindfieldAroundTrack` of a `track`, configured
+        as this generator.
+
+        :type  track: :class:`Track`
+        :param track: the tropical cyclone track.
+        """
+        return WindfieldAroundTrack(track,
+                                    profileType=self.profileType,
+                                    windFieldType=self.windFieldType,
+                                    beta=self.beta,
+                                    beta1=self.beta1,
+                                    beta2=self.beta2,
+                                    thetaMax=self.thetaMax,
+                                    margin=self.margin,
+                                    resolution=self.resolution,
+                                    stencilCache=self.stencilCache,
+                                    batchSize=self.batchSize,
+                                    precision=self.precision,
+                                    tableStep=self.tableStep,
+                                    windFloor=self.windFloor,
+                                    windModel=self.windModel,
+                                    threads=self.threads,
+                                    maxReuse=self.maxReuse,
+                                    reuseTolerance=self.reuseTolerance)
 
     def calculateExtremesFromTrackfile(self, trackfile, callback=None):
         """
@@ -504,20 +1355,18 @@ class WindfieldGenerator(object):
                          
         """
         trackiter = loadTracks(trackfile)
-        f = self.calculateExtremesFromTrack
-
-        results = (f(track, callback)[1] for track in trackiter)
 
-        gust, bearing, Vx, Vy, P, lon, lat = results.next()
+        extremes = None
+        for track in trackiter:
+            swath, lon, lat = self.calculateSwathFromTrack(track, callback)[1]
+            if extremes is None:
+                extremes = ExtremesAccumulator.region((len(lat), len(lon)))
+            extremes.merge(swath)
 
-        for result in results:
-            gust1, bearing1, Vx1, Vy1, P1, lon1, lat1 = result
-            gust = np.where(gust1 > gust, gust1, gust)
-            Vx = np.where(gust1 > gust, Vx1, Vx)
-            Vy = np.where(gust1 > gust, Vy1, Vy)
-            P = np.where(P1 < P, P1, P)
+        extremes.fillPressure()
 
-        return (gust, bearing, Vx, Vy, P, lon, lat)
+        return (extremes.gust, extremes.bearing(), extremes.UU, extremes.VV,
+                extremes.pressure, lon, lat)
 
     def dumpExtremesFromTrackfile(self, trackfile, dumpfile, callback=None):
         """
@@ -686,65 +1535,217 @@ class WindfieldGenerator(object):
                                  timestep to extract point values for 
                                  specified locations.
         """
+        # The tracks of a file are contiguous, so the time taken by a
+        # file (recorded in :attr:`costs`) runs from the previous file
+
+        started = time.time()
+
+        if self.tileSize > 0:
+            trackfiles = itertools.groupby(trackiter, lambda t: t.trackfile)
+            for i, (trackfile, tracks) in enumerate(trackfiles):
+                dumpfile = self._gustFilename(windfieldPath, trackfile)
+                self.dumpGustTilesFromTracks(list(tracks), dumpfile,
+                                             timeStepCallback)
+                self.costs[basename(trackfile)] = time.time() - started
+                started = time.time()
+                if progressCallback:
+                    progressCallback(i + 1)
+            return
+
+        # Only the swath of each track is accumulated, and then merged
+        # into the regional grid of its trackfile. The gusts of a
+        # trackfile are written in the background while the next is
+        # calculated (see :attr:`writeQueue`). The netCDF library is not
+        # thread-safe, so reading the tracks and extracting the time
+        # series never overlap a write
+
+        writer = AsyncWriter(self.writeQueue)
+        try:
+            self._dumpGusts(writer, writer.iterate(trackiter), windfieldPath,
+                            progressCallback,
+                            writer.serialised(timeStepCallback))
+        finally:
+            writer.close()
+
+    def _dumpGusts(self, writer, trackiter, windfieldPath,
+                   progressCallback=None, timeStepCallback=None):
+        """
+        Accumulate the gusts of the tracks of :meth:`dumpGustsFromTracks`
+        and queue each track file on the `writer` once all its tracks
+        are done.
+        """
+        started = time.time()
+
         if timeStepCallback:
-            results = itertools.imap(self.calculateExtremesFromTrack, trackiter,
+            results = itertools.imap(self.calculateSwathFromTrack, trackiter,
                                      itertools.repeat(timeStepCallback)) 
         else:
-            results = itertools.imap(self.calculateExtremesFromTrack, trackiter)
+            results = itertools.imap(self.calculateSwathFromTrack, trackiter)
 
         gusts = {}
         done = defaultdict(list)
 
         i = 0
         for track, result in results:
-            gust, bearing, Vx, Vy, P, lon, lat = result
+            swath, lon, lat = result
 
-            if track.trackfile in gusts:
-                gust1, bearing1, Vx1, Vy1, P1, lon1, lat1 = \
-                    gusts[track.trackfile]
-                gust = np.where(gust > gust1, gust, gust1)
-                Vx = np.where(gust > gust1, Vx, Vx1)
-                Vy = np.where(gust > gust1, Vy, Vy1)
-                P = np.where(P1 < P, P1, P)
+            if track.trackfile not in gusts:
+                gusts[track.trackfile] = \
+                    ExtremesAccumulator.region((len(lat), len(lon)))
 
-            gusts[track.trackfile] = (gust, bearing, Vx, Vy, P, lon, lat)
+            extremes = gusts[track.trackfile]
+            extremes.merge(swath)
             done[track.trackfile] += [track.trackId]
             if len(done[track.trackfile]) >= done[track.trackfile][0][1]:
-                path, basename = psplit(track.trackfile)
-                base, ext = psplitext(basename)
-                dumpfile = pjoin(windfieldPath, 
-                                 base.replace('tracks', 'gust') + '.nc')
-                                 
+                dumpfile = self._gustFilename(windfieldPath, track.trackfile)
                 #dumpfile = pjoin(windfieldPath, fnFormat % (pp.rank(), i))
-                self._saveGustToFile(track.trackfile,
-                                     (lat, lon, gust, Vx, Vy, P),
-                                     dumpfile)
+                extremes.fillPressure()
+                writer.put(self._saveGustToFile, track.trackfile,
+                           (lat, lon, extremes.gust, extremes.UU,
+                            extremes.VV, extremes.pressure), dumpfile)
 
                 del done[track.trackfile]
                 del gusts[track.trackfile]
 
+                self.costs[basename(track.trackfile)] = time.time() - started
+                started = time.time()
+
                 i += 1
 
                 if progressCallback:
                     progressCallback(i)
 
+    def dumpGustTilesFromTracks(self, tracks, dumpfile,
+                                timeStepCallback=None):
+        """
+        Dump the maximum wind speeds (gusts) of the `tracks` of a single
+        track file to the netcdf file `dumpfile`, one tile of the
+        regional grid at a time. Each tile only evaluates the tracks
+        whose swath intersects it, and only over the tile, so the memory
+        required is bounded by the tile size rather than the region.
+
+        :type  tracks: list of :class:`Track` objects
+        :param tracks: the tracks of a track file.
+
+        :type  dumpfile: str
+        :param dumpfile: the file name where to save the gusts.
+
+        :type  timeStepCallBack: function
+        :param timeStepCallback: optional function to be called at each
+                                 timestep to extract point values for
+                                 specified locations. The callbacks are
+                                 made in a separate pass over the tracks,
+                                 to preserve the order of the time steps,
+                                 which accumulates no extremes.
+        """
+        from hazard import TileGrid
+
+        wts = [self.windfieldAroundTrack(track) for track in tracks]
+
+        if self.gridLimit is None:
+            self.setGridLimit(tracks[0])
+
+        if timeStepCallback is not None:
+            for wt in wts:
+                wt.timeStepCallbacks(self.gridLimit, timeStepCallback)
+
+        latGrid, lonGrid = wts[0].regionalGrid(self.gridLimit)
+        lat, lon = latGrid / 100., lonGrid / 100.
+        bounds = [wt.swathBounds(self.gridLimit) for wt in wts]
+        envPressure = np.fmin.reduce([wt.envPressure() for wt in wts])
+
+        # Tile the whole regional grid, margins included
+
+        step = 0.5 * self.resolution
+        tilegrid = TileGrid({'xMin': lon[0] - step, 'xMax': lon[-1] + step,
+                             'yMin': lat[0] - step, 'yMax': lat[-1] + step},
+                            lon, lat, self.tileSize, self.tileSize)
+
+        dimensions, variables, gatts = \
+            self._gustFileContents(tracks[0].trackfile, lat, lon)
+        ncobj = nctools.ncSaveGrid(dumpfile, dimensions, variables,
+                                   gatts=gatts, writedata=False,
+                                   keepfileopen=True)
+        names = [var['name'] for var in variables.values()
+                 if var['name'] in GUST_PACKING]
+        ranges = dict((name, (np.inf, -np.inf)) for name in names)
+
+        for k in xrange(tilegrid.num_tiles):
+            x1, x2, y1, y2 = tilegrid.getGridLimit(k)
+
+            extremes = ExtremesAccumulator.region((y2 - y1, x2 - x1),
+                                                  offset=(y1, x1))
+            for wt, bound in zip(wts, bounds):
+                if (bound is not None and bound[0] < x2 and bound[1] > x1
+                        and bound[2] < y2 and bound[3] > y1):
+                    swath = wt.swathExtremes(self.gridLimit,
+                                             window=(x1, x2, y1, y2))[0]
+                    extremes.merge(swath)
+
+            extremes.envPressure = envPressure
+            extremes.fillPressure()
+
+            values = {'vmax': extremes.gust, 'ua': extremes.UU,
+                      'va': extremes.VV, 'slp': extremes.pressure}
+            for name in names:
+                value = values[name]
+                ncobj.variables[name][y1:y2, x1:x2] = self._packable(value)
+                vmin, vmax = ranges[name]
+                ranges[name] = (min(vmin, np.min(value)),
+                                max(vmax, np.max(value)))
+
+        for name in names:
+            ncobj.variables[name].setncattr('actual_range', ranges[name])
+        ncobj.close()
+
+    def _gustFilename(self, windfieldPath, trackfile):
+        """
+        The name of the gust file of a track file.
+        """
+        path, basename = psplit(trackfile)
+        base, ext = psplitext(basename)
+        return pjoin(windfieldPath, base.replace('tracks', 'gust') + '.nc')
+
     def _saveGustToFile(self, trackfile, result, filename):
         """
         Save gusts to a file.
         """
         lat, lon, speed, Vx, Vy, P = result
 
-        inputFileDate = flModDate(trackfile)
+        dimensions, variables, gatts = \
+            self._gustFileContents(trackfile, lat, lon)
 
+        gusts = {'vmax': speed, 'ua': Vx, 'va': Vy, 'slp': P}
+        for var in variables.values():
+            if var['name'] in gusts:
+                values = gusts[var['name']]
+                var['values'] = self._packable(values)
+                var['atts']['actual_range'] = (np.min(values),
+                                               np.max(values))
+
+        nctools.ncSaveGrid(filename, dimensions, variables, gatts=gatts)
+
+    def _packable(self, values):
+        """
+        The gusts to write to a file, with any NaN (e.g. the pressure
+        of track files without tracks) masked if packed as integers.
+        """
+        if self.packOutput:
+            return np.ma.masked_invalid(values)
+        return values
+
+    def _globalAttributes(self):
+        """
+        The global attributes shared by all the gust files of a run.
+        """
         gatts = {
             'title': 'TCRM hazard simulation - synthetic event wind field',
             'tcrm_version': flProgramVersion(),
             'python_version': sys.version,
-            'track_file': '%s (modified %s)' % (trackfile, inputFileDate),
             'radial_profile': self.profileType,
             'boundary_layer': self.windFieldType,
             'beta': self.beta}
-        
+
         # Add configuration settings to global attributes:
         for section in self.config.sections():
             for option in self.config.options(section):
@@ -752,6 +1753,18 @@ class WindfieldGenerator(object):
                 value = self.config.get(section, option)
                 gatts[key] = value
 
+        return gatts
+
+    def _gustFileContents(self, trackfile, lat, lon):
+        """
+        The dimensions, variables (without values) and global
+        attributes of a gust file.
+        """
+        inputFileDate = flModDate(trackfile)
+
+        gatts = dict(self.gatts)
+        gatts['track_file'] = '%s (modified %s)' % (trackfile, inputFileDate)
+
         dimensions = {
             0: {
                 'name': 'lat',
@@ -781,13 +1794,12 @@ class WindfieldGenerator(object):
             0: {
                 'name': 'vmax',
                 'dims': ('lat', 'lon'),
-                'values': speed,
+                'values': None,
                 'dtype': 'f',
                 'atts': {
                     'long_name': 'Maximum 3-second gust wind speed',
                     'standard_name': 'wind_speed_of_gust',
                     'units': 'm/s',
-                    'actual_range': (np.min(speed), np.max(speed)),
                     'valid_range': (0.0, 200.),
                     'cell_methods': ('time: maximum '
                                      'time: maximum (interval: 3 seconds)'),
@@ -797,13 +1809,12 @@ class WindfieldGenerator(object):
             1: {
                 'name': 'ua',
                 'dims': ('lat', 'lon'),
-                'values': Vx,
+                'values': None,
                 'dtype': 'f',
                 'atts': {
                     'long_name': 'Eastward component of maximum wind speed',
                     'standard_name': 'eastward_wind',
                     'units': 'm/s',
-                    'actual_range': (np.min(Vx), np.max(Vx)),
                     'valid_range': (-200., 200.),
                     'grid_mapping': 'crs'
                 }
@@ -811,13 +1822,12 @@ class WindfieldGenerator(object):
             2: {
                 'name': 'va',
                 'dims': ('lat', 'lon'),
-                'values': Vy,
+                'values': None,
                 'dtype': 'f',
                 'atts': {
                     'long_name': 'Northward component of maximim wind speed',
                     'standard_name': 'northward_wind',
                     'units': 'm/s',
-                    'actual_range': (np.min(Vy), np.max(Vy)),
                     'valid_range': (-200., 200.),
                     'grid_mapping': 'crs'
                 }
@@ -825,13 +1835,12 @@ class WindfieldGenerator(object):
             3: {
                 'name': 'slp',
                 'dims': ('lat', 'lon'),
-                'values': P,
+                'values': None,
                 'dtype': 'f',
                 'atts': {
                     'long_name': 'Minimum air pressure at sea level',
                     'standard_name': 'air_pressure_at_sea_level',
                     'units': 'Pa',
-                    'actual_range': (np.min(P), np.max(P)),
                     'valid_range': (70000., 115000.),
                     'cell_methods': 'time: minimum',
                     'grid_mapping': 'crs'
@@ -851,7 +1860,25 @@ class WindfieldGenerator(object):
             }
         }
 
-        nctools.ncSaveGrid(filename, dimensions, variables, gatts=gatts)
+        # Only keep the variables asked for, packed if required. The
+        # valid range of a packed variable is in its packed values
+
+        gustVars = [variables[v] for v in range(4)
+                    if variables[v]['name'] in self.outputVariables]
+        if self.packOutput:
+            for var in gustVars:
+                scale, offset = GUST_PACKING[var['name']]
+                validRange = np.array(var['atts']['valid_range'])
+                var['dtype'] = 'i2'
+                var['nodata'] = np.iinfo('i2').min
+                var['atts']['scale_factor'] = np.float32(scale)
+                var['atts']['add_offset'] = np.float32(offset)
+                var['atts']['valid_range'] = \
+                    np.round((validRange - offset) / scale).astype('i2')
+
+        variables = dict(enumerate(gustVars + [variables[4]]))
+
+        return dimensions, variables, gatts
 
     def dumpGustsFromTrackfiles(self, trackfiles, windfieldPath,
                                 filenameFormat='gust-%02i-%04i.nc',
@@ -888,6 +1915,470 @@ class WindfieldGenerator(object):
                                  progressCallback=progressCallback,
                                  timeStepCallback=timeStepCallback)
 
+    def pointTimeseriesFromTrackfiles(self, trackfiles, timeseries,
+                                      progressCallback=None):
+        """
+        Extract the time series at the stations of `timeseries` from the
+        track files, evaluating the wind fields at the stations only
+        (see :meth:`WindfieldAroundTrack.pointTimeseries`). No gust
+        files are written. When run in parallel, the track files are
+        distributed across the MPI processors using the `balanced`
+        function.
+
+        :type  trackfiles: list of str
+        :param trackfiles: a list of track file filenames.
+
+        :type  timeseries: :class:`Utilities.timeseries.Timeseries`
+        :param timeseries: the time series to extract.
+
+        :type  progressCallback: function
+        :param progressCallback: optional function to be called after a
+                                 file is done. This can be used to track
+                                 progress.
+        """
+        for i, trackfile in enumerate(balanced(sorted(trackfiles))):
+            for track in loadTracks(trackfile):
+                if self.gridLimit is None:
+                    self.setGridLimit(track)
+                wt = self.windfieldAroundTrack(track)
+                wt.pointTimeseries(self.gridLimit, timeseries.stnlon,
+                                   timeseries.stnlat, timeseries.extractPoints)
+            if progressCallback:
+                progressCallback(i + 1)
+
+    def siteGustsFromTrackfiles(self, trackfiles, lon, lat,
+                                progressCallback=None):
+        """
+        Calculate the maximum wind gust at the sites (`lon`, `lat`) over
+        all the tracks of each track file, evaluating the wind fields at
+        the sites only (see :meth:`WindfieldAroundTrack.pointTimeseries`).
+        No gust files are written. When run in parallel, the track files
+        are distributed across the MPI processors using the `balanced`
+        function.
+
+        :type  trackfiles: list of str
+        :param trackfiles: a list of track file filenames.
+
+        :param lon: :class:`numpy.ndarray` of longitudes of the sites.
+        :param lat: :class:`numpy.ndarray` of latitudes of the sites.
+
+        :type  progressCallback: function
+        :param progressCallback: optional function to be called after a
+                                 file is done. This can be used to track
+                                 progress.
+
+        :returns: the maximum gust at each site, keyed by track file.
+        :rtype: :class:`dict`
+        """
+        gusts = {}
+        for i, trackfile in enumerate(balanced(sorted(trackfiles))):
+            maxGust = np.zeros(len(lon), dtype='f')
+            for track in loadTracks(trackfile):
+                if self.gridLimit is None:
+                    self.setGridLimit(track)
+                wt = self.windfieldAroundTrack(track)
+                np.maximum(maxGust, wt.pointTimeseries(self.gridLimit,
+                                                       lon, lat),
+                           out=maxGust)
+            gusts[trackfile] = maxGust
+            if progressCallback:
+                progressCallback(i + 1)
+        return gusts
+
+    def estimateCost(self, trackfile):
+        """
+        Estimate the cost of the wind fields of a track file, as the
+        number of time steps in the region times the number of points of
+        the local grid. Only the longitudes and latitudes of the track
+        file are read.
+
+        :type  trackfile: str
+        :param trackfile: the file name of the trackfile.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')  # Empty track files
+                lonlat = np.loadtxt(trackfile, comments='%', delimiter=',',
+                                    usecols=(3, 4), ndmin=2)
+        except (IOError, ValueError):
+            return 0.
+        if lonlat.size == 0:
+            return 0.
+
+        lon, lat = lonlat[:, 0], lonlat[:, 1]
+        inRegion = np.ones(len(lon), dtype=bool)
+        if self.gridLimit is not None:
+            inRegion = ((self.gridLimit['xMin'] <= lon) &
+                        (lon <= self.gridLimit['xMax']) &
+                        (self.gridLimit['yMin'] <= lat) &
+                        (lat <= self.gridLimit['yMax']))
+
+        size = len(xrange(0, 2 * int(1000 * self.margin) + 1,
+                          int(1000 * self.resolution)))
+        return float(inRegion.sum()) * size ** 2
+
+    def scheduleTrackfiles(self, trackfiles, costs=None):
+        """
+        Order the track files longest first. The cost of a track file is
+        the time it took in a previous run, if recorded in `costs`, or
+        else its estimated cost (see :meth:`estimateCost`), scaled to a
+        time by the files with both.
+
+        :type  trackfiles: list of str
+        :param trackfiles: a list of track file filenames.
+
+        :type  costs: :class:`dict`
+        :param costs: the time (s) taken by the track files in previous
+                      runs, keyed by their base name (see :func:`loadCosts`).
+
+        :returns: the track files, longest first.
+        """
+        costs = costs or {}
+        trackfiles = sorted(trackfiles)
+        estimates = dict((f, self.estimateCost(f)) for f in trackfiles)
+
+        measured = [f for f in trackfiles if basename(f) in costs]
+        scale = 1.
+        if sum(estimates[f] for f in measured) > 0.:
+            scale = (sum(costs[basename(f)] for f in measured) /
+                     sum(estimates[f] for f in measured))
+
+        def cost(trackfile):
+            return costs.get(basename(trackfile), scale * estimates[trackfile])
+
+        return sorted(trackfiles, key=cost, reverse=True)
+
+    def scheduleGustsFromTrackfiles(self, trackfiles, windfieldPath,
+                                    costs=None, progressCallback=None,
+                                    timeStepCallback=None):
+        """
+        Dump the maximum wind speeds (gusts) observed over a region to
+        netcdf files, one for every track file, across the MPI
+        processors. Rank 0 hands the track files out longest first (see
+        :meth:`scheduleTrackfiles`) to the other processors as they
+        become idle. The processors write the gust files and report the
+        time taken, which rank 0 records in :attr:`costs`.
+
+        :type  trackfiles: list of str
+        :param trackfiles: a list of track file filenames.
+
+        :type  windfieldPath: str
+        :param windfieldPath: the path where to store the gust output files.
+
+        :type  costs: :class:`dict`
+        :param costs: the time (s) taken by the track files in previous
+                      runs (see :func:`loadCosts`).
+
+        :type  progressCallback: function
+        :param progressCallback: optional function to be called after a file is
+                                 saved. This can be used to track progress.
+
+        :type  timeStepCallBack: function
+        :param timeStepCallback: optional function to be called at each
+                                 timestep to extract point values for
+                                 specified locations.
+        """
+        work_tag = 0
+        result_tag = 1
+
+        if pp.size() == 1:
+            self.dumpGustsFromTrackfiles(trackfiles, windfieldPath,
+                                         progressCallback=progressCallback,
+                                         timeStepCallback=timeStepCallback)
+
+        elif pp.rank() == 0:
+            trackfiles = self.scheduleTrackfiles(trackfiles, costs)
+            w = 0
+            active = 0
+            for d in range(1, pp.size()):
+                if w < len(trackfiles):
+                    pp.send(trackfiles[w], destination=d, tag=work_tag)
+                    w += 1
+                    active += 1
+                else:
+                    pp.send(None, destination=d, tag=work_tag)
+
+            done = 0
+            while active > 0:
+                result, status = pp.receive(pp.any_source, tag=result_tag,
+                                            return_status=True)
+                trackfile, cost = result
+                self.costs[basename(trackfile)] = cost
+                done += 1
+                if progressCallback:
+                    progressCallback(done)
+
+                d = status.source
+                if w < len(trackfiles):
+                    pp.send(trackfiles[w], destination=d, tag=work_tag)
+                    w += 1
+                else:
+                    pp.send(None, destination=d, tag=work_tag)
+                    active -= 1
+
+        else:
+            while True:
+                trackfile = pp.receive(source=0, tag=work_tag)
+                if trackfile is None:
+                    break
+                log.info('Calculating wind fields for tracks in %s' %
+                         trackfile)
+                started = time.time()
+                self.dumpGustsFromTracks(loadTracks(trackfile), windfieldPath,
+                                         None, timeStepCallback=timeStepCallback)
+                pp.send((trackfile, time.time() - started), destination=0,
+                        tag=result_tag)
+
+    def poolGustsFromTrackfiles(self, trackfiles, windfieldPath, processes,
+                                progressCallback=None, timeseries=None,
+                                costs=None):
+        """
+        Dump the maximum wind speeds (gusts) observed over a region to
+        netcdf files, one for every track file, using a pool of worker
+        processes on a single node. The track files are handed out to
+        the workers one at a time, and the gusts of each file streamed
+        back, in order, to this process, which writes the gust files.
+        At most two files per worker are in flight at any time, which
+        bounds the gusts waiting to be written. With tiles (see
+        :meth:`dumpGustTilesFromTracks`), the workers write the gust
+        files themselves.
+
+        The track files are handed out longest first (see
+        :meth:`scheduleTrackfiles`), and the time each took is recorded
+        in :attr:`costs`. When run in parallel, the track files are first
+        distributed across the MPI processors using the `balanced`
+        function.
+
+        :type  trackfiles: list of str
+        :param trackfiles: a list of track file filenames.
+
+        :type  windfieldPath: str
+        :param windfieldPath: the path where to store the gust output files.
+
+        :type  processes: int
+        :param processes: the number of worker processes.
+
+        :type  progressCallback: function
+        :param progressCallback: optional function to be called after a file is
+                                 saved. This can be used to track progress.
+
+        :type  timeseries: :class:`Utilities.timeseries.Timeseries`
+        :param timeseries: optional time series to extract at every time
+                           step. Each worker extracts into its own copy,
+                           and the data is gathered into `timeseries`,
+                           in track file order, as soon as the files
+                           before it are done.
+
+        :type  costs: :class:`dict`
+        :param costs: the time (s) taken by the track files in previous
+                      runs (see :func:`loadCosts`).
+        """
+        trackfiles = list(balanced(sorted(trackfiles)))
+        order = deque(trackfiles)
+        trackfiles = iter(self.scheduleTrackfiles(trackfiles, costs))
+        extracted = {}
+
+        pool = multiprocessing.Pool(processes, _initWorker,
+                                    (self, windfieldPath, timeseries))
+
+        def submit(n):
+            for trackfile in itertools.islice(trackfiles, n):
+                pending.append(pool.apply_async(_gustsFromTrackfile,
+                                                (trackfile,)))
+
+        # On failure, stop handing out files and let the workers finish
+        # the files in flight (terminating a pool that is still sending
+        # results back can deadlock)
+
+        pending = deque()
+        writer = AsyncWriter(self.writeQueue)
+        if timeseries is not None:
+            extend = writer.serialised(timeseries.extendData)
+        try:
+            submit(2 * processes)
+            i = 0
+            while pending:
+                trackfile, result, data, cost = pending.popleft().get()
+                submit(1)
+
+                self.costs[basename(trackfile)] = cost
+                if data is not None:
+                    extracted[trackfile] = data
+                    while order and order[0] in extracted:
+                        extend(extracted.pop(order.popleft()))
+                if result is not None:
+                    dumpfile = self._gustFilename(windfieldPath, trackfile)
+                    writer.put(self._saveGustToFile, trackfile, result,
+                               dumpfile)
+
+                i += 1
+                if progressCallback:
+                    progressCallback(i)
+        finally:
+            pool.close()
+            pool.join()
+            writer.close()
+
+
+def _initWorker(generator, windfieldPath, timeseries):
+    """
+    Set up a worker process of
+    :meth:`WindfieldGenerator.poolGustsFromTrackfiles`.
+    """
+    global _worker
+    _worker = (generator, windfieldPath, timeseries)
+
+    # Workers hand their time series back rather than writing them
+
+    if timeseries is not None:
+        timeseries.chunkSize = 0
+
+
+def _gustsFromTrackfile(trackfile):
+    """
+    Calculate the gusts of a track file in a worker process.
+
+    :returns: the track file, its gusts (or None if the worker wrote
+              them itself), the time series data extracted and the time
+              taken.
+    """
+    generator, windfieldPath, timeseries = _worker
+    started = time.time()
+
+    callback = None
+    if timeseries is not None:
+        callback = timeseries.extract
+
+    log.info('Calculating wind fields for tracks in %s' % trackfile)
+
+    result = None
+    if generator.tileSize > 0:
+        dumpfile = generator._gustFilename(windfieldPath, trackfile)
+        generator.dumpGustTilesFromTracks(loadTracks(trackfile), dumpfile,
+                                          callback)
+    else:
+        gust, bearing, Vx, Vy, P, lon, lat = \
+            generator.calculateExtremesFromTrackfile(trackfile, callback)
+        result = (lat, lon, gust, Vx, Vy, P)
+
+    data = None
+    if timeseries is not None:
+        data = timeseries.popData()
+
+    return trackfile, result, data, time.time() - started
+
+
+def loadCosts(filename):
+    """
+    Load the time taken by the wind fields of each track file in
+    previous runs (see :func:`saveCosts`).
+
+    :param str filename: the file of recorded costs.
+
+    :return: the time (s) taken by each track file, keyed by its base
+             name. This is empty if no costs were recorded.
+    :rtype: :class:`dict`
+    """
+    costs = {}
+    if os.path.isfile(filename):
+        with open(filename) as fh:
+            for line in fh:
+                if line.startswith('%') or not line.strip():
+                    continue
+                trackfile, cost = line.split(',')
+                costs[trackfile] = float(cost)
+    return costs
+
+
+def saveCosts(filename, costs):
+    """
+    Save the time taken by the wind fields of each track file, so that
+    later runs can schedule the longest track files first.
+
+    :param str filename: the file of recorded costs.
+    :param dict costs: the time (s) taken by each track file, keyed by
+                       its base name.
+    """
+    path = os.path.dirname(filename)
+    if path and not isdir(path):
+        os.makedirs(path)
+    with open(filename, 'w') as fh:
+        fh.write('% Trackfile,Seconds\n')
+        for trackfile in sorted(costs):
+            fh.write('%s,%.3f\n' % (trackfile, costs[trackfile]))
+
+
+def saveSiteGusts(filename, lon, lat, gusts):
+    """
+    Save the maximum wind gusts at the sites for each event (track
+    file), for the hazard calculation at the sites (see
+    :func:`hazard.runSites`).
+
+    :param str filename: the site gust file.
+    :param lon: :class:`numpy.ndarray` of longitudes of the sites.
+    :param lat: :class:`numpy.ndarray` of latitudes of the sites.
+    :param gusts: :class:`numpy.ndarray` of the maximum gusts, shaped
+                  (event, site), with the events in the order of the
+                  track file names.
+    """
+    dimensions = {
+        0: {
+            'name': 'event',
+            'values': np.arange(len(gusts)),
+            'dtype': 'i',
+            'atts': {
+                'long_name': 'Event number (sorted track file)'
+            }
+        },
+        1: {
+            'name': 'site',
+            'values': np.arange(len(lon)),
+            'dtype': 'i',
+            'atts': {
+                'long_name': 'Site number (in the station file)'
+            }
+        }
+    }
+
+    variables = {
+        0: {
+            'name': 'lon',
+            'dims': ('site',),
+            'values': np.array(lon),
+            'dtype': 'f',
+            'atts': {
+                'long_name': 'Longitude',
+                'standard_name': 'longitude',
+                'units': 'degrees_east'
+            }
+        },
+        1: {
+            'name': 'lat',
+            'dims': ('site',),
+            'values': np.array(lat),
+            'dtype': 'f',
+            'atts': {
+                'long_name': 'Latitude',
+                'standard_name': 'latitude',
+                'units': 'degrees_north'
+            }
+        },
+        2: {
+            'name': 'vmax',
+            'dims': ('event', 'site'),
+            'values': np.array(gusts).reshape(len(gusts), len(lon)),
+            'dtype': 'f',
+            'atts': {
+                'long_name': 'Maximum 3-second gust wind speed',
+                'units': 'm/s'
+            }
+        }
+    }
+
+    nctools.ncSaveGrid(filename, dimensions, variables,
+                       datatitle='TCRM site gusts', writedata=True,
+                       keepfileopen=False)
+
 
 def readTrackData(trackfile):
     """
@@ -1024,12 +2515,14 @@ def balanced(iterable):
     return itertools.islice(iterable, p, None, P)
 
 
-def run(configFile, callback=None):
+def run(configFile, callback=None, processes=None):
     """
     Run the wind field calculations.
     
     :param str configFile: path to a configuration file.
     :param func callback: optional callback function to track progress.
+    :param int processes: optional number of worker processes, which
+                          overrides the configuration setting.
     
     """
 
@@ -1049,6 +2542,43 @@ def run(configFile, callback=None):
     thetaMax = config.getfloat('WindfieldInterface', 'thetaMax')
     margin = config.getfloat('WindfieldInterface', 'Margin')
     resolution = config.getfloat('WindfieldInterface', 'Resolution')
+
+    stencilCache = None
+    if config.getboolean('WindfieldInterface', 'StencilCache'):
+        latStep = config.getfloat('WindfieldInterface', 'StencilLatStep')
+        maxError = config.getfloat('WindfieldInterface', 'StencilMaxError')
+        maxAngle = config.getfloat('WindfieldInterface', 'StencilMaxAngle')
+        stencilCache = StencilCache(latStep, maxError, maxAngle)
+
+    batchSize = config.getint('WindfieldInterface', 'BatchSize')
+    precision = config.get('WindfieldInterface', 'Precision')
+
+    tableStep = None
+    if config.getboolean('WindfieldInterface', 'ProfileTable'):
+        tableStep = config.getfloat('WindfieldInterface', 'ProfileTableStep')
+
+    windFloor = config.getfloat('WindfieldInterface', 'WindFloor')
+    tileSize = config.getint('WindfieldInterface', 'TileSize')
+    threads = config.getint('WindfieldInterface', 'Threads')
+    if processes is None:
+        processes = config.getint('WindfieldInterface', 'Processes')
+    writeQueue = config.getint('WindfieldInterface', 'WriteQueue')
+    packOutput = config.getboolean('WindfieldInterface', 'PackOutput')
+    outputVariables = config.get('WindfieldInterface', 'OutputVariables')
+    outputVariables = [v.strip() for v in outputVariables.split(',')]
+    if 'vmax' not in outputVariables:
+        log.warning('vmax is needed by the hazard calculation, '
+                    'so is included in the gust files')
+        outputVariables.insert(0, 'vmax')
+
+    # Reusing the wind fields between the time steps of finely
+    # interpolated tracks, within tolerances that default per parameter
+
+    maxReuse = config.getint('WindfieldInterface', 'MaxReuse')
+    reuseTolerance = dict(REUSE_TOLERANCE)
+    if config.has_option('WindfieldInterface', 'ReuseTolerance'):
+        reuseTolerance.update(config.geteval('WindfieldInterface',
+                                             'ReuseTolerance'))
     
     windfieldPath = pjoin(outputPath, 'windfield')
     trackPath = pjoin(outputPath, 'tracks')
@@ -1061,24 +2591,29 @@ def run(configFile, callback=None):
     if config.has_option('WindfieldInterface', 'gridLimit'):
         gridLimit = config.geteval('WindfieldInterface', 'gridLimit')
 
-    if config.has_section('Timeseries'):
-        if config.has_option('Timeseries', 'Extract'):
-            if config.getboolean('Timeseries', 'Extract'):
-                from Utilities.timeseries import Timeseries
-                log.debug("Timeseries data will be extracted")
-                ts = Timeseries(configFile)
-                timestepCallback = ts.extract
-                
-    else:
-        def timestepCallback(*args):
-            """Dummy timestepCallback function"""
-            pass
+    sitesMode = config.getboolean('Sites', 'Enabled')
 
     thetaMax = math.radians(thetaMax)
     
     # Attempt to start the track generator in parallel
     global pp
     pp = attemptParallel()
+
+    # In parallel, each processor writes its own time series files,
+    # which the master merges once all are done
+
+    ts = None
+    timestepCallback = None
+    pointMode = False
+    if config.has_section('Timeseries'):
+        if config.has_option('Timeseries', 'Extract'):
+            if config.getboolean('Timeseries', 'Extract'):
+                from Utilities.timeseries import Timeseries
+                log.debug("Timeseries data will be extracted")
+                rank = pp.rank() if pp.size() > 1 else None
+                ts = Timeseries(configFile, rank)
+                timestepCallback = ts.extract
+                pointMode = config.getboolean('Timeseries', 'PointMode')
     
     log.info('Running windfield generator')
     
@@ -1091,7 +2626,19 @@ def run(configFile, callback=None):
                              beta1=beta1,
                              beta2=beta2,
                              thetaMax=thetaMax,
-                             gridLimit=gridLimit)
+                             gridLimit=gridLimit,
+                             stencilCache=stencilCache,
+                             batchSize=batchSize,
+                             precision=precision,
+                             tableStep=tableStep,
+                             windFloor=windFloor,
+                             tileSize=tileSize,
+                             threads=threads,
+                             writeQueue=writeQueue,
+                             packOutput=packOutput,
+                             outputVariables=outputVariables,
+                             maxReuse=maxReuse,
+                             reuseTolerance=reuseTolerance)
 
     msg = 'Dumping gusts to %s' % windfieldPath
     log.info(msg)
@@ -1112,13 +2659,61 @@ def run(configFile, callback=None):
 
     pp.barrier()
 
-    wfg.dumpGustsFromTrackfiles(trackfiles, windfieldPath, windfieldFormat,
-                                progressCallback, timestepCallback)
-    try:
+    # Track files are handed out longest first, using the time they
+    # took in previous runs where recorded
+
+    costFile = pjoin(outputPath, 'process', 'windfield_costs.csv')
+    costs = loadCosts(costFile)
+
+    if sitesMode:
+        from Utilities.timeseries import loadStations
+        stations, _ = loadStations(config.get('Sites', 'StationFile'))
+        lon = np.array([float(stn.lon) for stn in stations])
+        lat = np.array([float(stn.lat) for stn in stations])
+        log.info('Evaluating the wind fields at %d sites only' % len(lon))
+        gusts = wfg.siteGustsFromTrackfiles(trackfiles, lon, lat,
+                                            progressCallback)
+
+        # Gather the gusts of all track files on the master
+
+        result_tag = 1
+        if pp.rank() > 0:
+            pp.send(gusts, destination=0, tag=result_tag)
+        else:
+            for d in range(1, pp.size()):
+                gusts.update(pp.receive(source=d, tag=result_tag))
+            saveSiteGusts(pjoin(outputPath, 'process', 'site_gusts.nc'),
+                          lon, lat, [gusts[f] for f in sorted(gusts)])
+    elif pointMode:
+        log.info('Evaluating the wind fields at the stations only')
+        wfg.pointTimeseriesFromTrackfiles(trackfiles, ts, progressCallback)
+    elif pp.size() > 1:
+        wfg.scheduleGustsFromTrackfiles(trackfiles, windfieldPath, costs,
+                                        progressCallback, timestepCallback)
+    elif processes > 1:
+        log.info('Using %d worker processes' % processes)
+        wfg.poolGustsFromTrackfiles(trackfiles, windfieldPath, processes,
+                                    progressCallback, ts, costs)
+    else:
+        wfg.dumpGustsFromTrackfiles(trackfiles, windfieldPath,
+                                    windfieldFormat, progressCallback,
+                                    timestepCallback)
+
+    if pp.rank() == 0:
+        costs.update(wfg.costs)
+        saveCosts(costFile, costs)
+    if ts is not None:
         ts.shutdown()
-    except NameError:
-        pass
+
+    if stencilCache is not None:
+        log.debug('Stencil cache: %d bands, %d hits, %d misses' %
+                  (len(stencilCache), stencilCache.hits, stencilCache.misses))
 
     pp.barrier()
 
+    if ts is not None and pp.size() > 1:
+        if pp.rank() == 0:
+            ts.merge(pp.size())
+        pp.barrier()
+
     log.info('Completed windfield generator')
@@ -1,16 +1,53 @@
 """
 Wind Models
 
+The profile and field models accept either scalar storm parameters, or
+arrays of parameters for several storms (or several timesteps of the same
+storm) at once. In the latter case the parameters are shaped (n, 1, 1) and
+broadcast against an (n, ny, nx) stack of radii and angles, so that all n
+wind fields are evaluated in a single vectorised pass. See
+:func:`batchField`.
+
+The models follow the precision of the radii and angles they are given:
+float32 grids are carried through the calculations (including the complex
+arithmetic of the Kepert model) as float32/complex64.
+
+As the profiles only depend on the radius, they can also be evaluated on
+a fine 1-D radial axis and interpolated onto the grid (see
+:class:`RadialTable` and :meth:`WindProfileModel.tabulated`), replacing
+the transcendental functions at every grid point with a cheap linear
+interpolation.
+
+The profiles also provide the matching pressure profile, sharing the
+exponential terms with the velocity and vorticity. :class:`WindModel`
+resolves the profile and field models, and their parameters, once for
+any number of storms.
+
 """
 
 import numpy as np
-from math import exp, sqrt
 import Utilities.metutils as metutils
 import logging
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+
+def stormMaximum(V, param):
+    """
+    Maximum of the array `V` for each storm.
+
+    :param V: :class:`numpy.ndarray` of values, either (ny, nx) for a
+              single storm or (n, ny, nx) for a stack of storms.
+    :param param: any storm parameter (e.g. `rMax`), which is a scalar
+                  for a single storm or shaped (n, 1, 1) for a stack.
+
+    :returns: the maximum value, broadcastable against `V`.
+    """
+    if np.ndim(param) == 0:
+        return V.max()
+    return V.max(axis=tuple(range(1, V.ndim)), keepdims=True)
+
 class WindSpeedModel(object):
 
     """
@@ -29,9 +66,7 @@ class WindSpeedModel(object):
         Environment pressure.
         """
         eP = self.profile.eP
-        if eP < 10000:
-            eP = metutils.convert(eP, 'hPa', 'Pa')
-        return eP
+        return np.where(eP < 10000, metutils.convert(eP, 'hPa', 'Pa'), eP)
 
     @property
     def cP(self):
@@ -39,9 +74,7 @@ class WindSpeedModel(object):
         Current pressure.
         """
         cP = self.profile.cP
-        if cP < 10000:
-            cP = metutils.convert(cP, 'hPa', 'Pa')
-        return cP
+        return np.where(cP < 10000, metutils.convert(cP, 'hPa', 'Pa'), cP)
 
     @property
     def dP(self):
@@ -66,7 +99,7 @@ class WilloughbyWindSpeed(WindSpeedModel):
     """
 
     def maximum(self):
-        return 0.6252 * sqrt(self.dP)
+        return 0.6252 * np.sqrt(self.dP)
 
 
 class HollandWindSpeed(WindSpeedModel):
@@ -81,7 +114,7 @@ class HollandWindSpeed(WindSpeedModel):
     def maximum(self):
         beta = self.profile.beta
         rho = 1.15
-        return sqrt(beta * self.dP / (exp(1) * rho))
+        return np.sqrt(beta * self.dP / (np.exp(1) * rho))
 
 
 class AtkinsonWindSpeed(WindSpeedModel):
@@ -95,7 +128,7 @@ class AtkinsonWindSpeed(WindSpeedModel):
 
     def maximum(self):
         cP = metutils.convert(self.cP, 'Pa', 'hPa')
-        return 3.04 * pow(1010.0 - cP, 0.644)
+        return 3.04 * np.power(1010.0 - cP, 0.644)
 
 
 class WindProfileModel(object):
@@ -127,7 +160,7 @@ class WindProfileModel(object):
         """
         Maximum wind speed.
         """
-        if self.vMax_:
+        if self.vMax_ is not None:
             return self.vMax_
         else:
             return self.speed.maximum()
@@ -151,6 +184,153 @@ class WindProfileModel(object):
         """
         raise NotImplementedError
 
+    def pressure(self, R):
+        """
+        Pressure at radiuses `R`.
+        """
+        raise NotImplementedError
+
+    def tabulated(self, table):
+        """
+        The profile evaluated on the radial axis of `table` and
+        interpolated onto the radiuses of the table.
+
+        :type  table: :class:`RadialTable`
+        :param table: the radial axis and the radiuses to interpolate to.
+
+        :returns: a :class:`TabulatedWindProfile`.
+        """
+        return TabulatedWindProfile(self, table)
+
+    def influenceRadius(self, radii, vFloor):
+        """
+        The radius beyond which the wind speed of the profile stays
+        below `vFloor`.
+
+        :param radii: :class:`numpy.ndarray` of increasing radiuses (km)
+                      on which the profile is evaluated.
+        :param float vFloor: the wind speed floor (m/s).
+
+        :returns: the first of the `radii` beyond the last radius where
+                  the wind speed reaches `vFloor`, the last of the
+                  `radii` if it is reached there, or zero if it is not
+                  reached anywhere.
+        """
+        above = np.nonzero(np.abs(self.velocity(radii)) >= vFloor)[0]
+        if len(above) == 0:
+            return 0.
+        return radii[min(above[-1] + 1, len(radii) - 1)]
+
+
+class RadialTable(object):
+
+    """
+    Linear interpolation from a regular 1-D radial axis onto the
+    radiuses `R` of a grid (or an (n, ny, nx) stack of grids). The
+    interpolation indices and weights are calculated once, and can be
+    reused for any number of profiles tabulated on the axis.
+
+    :param R: :class:`numpy.ndarray` of radiuses (km).
+    :param float step: spacing of the radial axis (km).
+    """
+
+    def __init__(self, R, step=0.5):
+        self.R = R
+        rmin = R.min()
+        nr = int(np.ceil((R.max() - rmin) / step)) + 2
+        self.radii = rmin + step * np.arange(nr, dtype=R.dtype)
+
+        pos = (R - rmin) / step
+        index = np.minimum(pos.astype(int), nr - 2)
+        self.weight = (pos - index).astype(R.dtype)
+        self.index = index
+
+        # Indices into a flattened (n, nr) table with one row per grid
+
+        if R.ndim == 3:
+            offset = nr * np.arange(R.shape[0]).reshape(-1, 1, 1)
+            self.stormIndex = index + offset
+        else:
+            self.stormIndex = index
+
+    def interpolate(self, values):
+        """
+        Interpolate values tabulated on the radial axis onto the grid.
+
+        :param values: :class:`numpy.ndarray` of values on the radial
+                       axis, either (nr,) or, with one row per grid of a
+                       stack, shaped (n, nr) or (n, 1, nr).
+
+        :returns: :class:`numpy.ndarray` of values, shaped like `R`.
+        """
+        values = np.ravel(values)
+        if values.size == len(self.radii):
+            index = self.index
+        else:
+            index = self.stormIndex
+        lower = values[index]
+        upper = values[index + 1]
+        return lower + self.weight * (upper - lower)
+
+
+class TabulatedWindProfile(object):
+
+    """
+    A wind profile that is evaluated on the radial axis of a
+    :class:`RadialTable` and interpolated onto the grid. Radiuses other
+    than those of the table are evaluated directly. All other attributes
+    are those of the underlying profile.
+
+    :type  profile: :class:`WindProfileModel`
+    :param profile: the wind profile.
+
+    :type  table: :class:`RadialTable`
+    :param table: the radial axis and the radiuses to interpolate to.
+    """
+
+    def __init__(self, profile, table):
+        self.profile = profile
+        self.table = table
+        self.V = None
+        self.Z = None
+        self.P = None
+
+    def __getattr__(self, name):
+        return getattr(self.profile, name)
+
+    def velocity(self, R):
+        """
+        Wind velocity at radiuses `R`.
+        """
+        if R is not self.table.R:
+            return self.profile.velocity(R)
+        if self.V is None:
+            self.V = self.table.interpolate(
+                self.profile.velocity(self.table.radii))
+        return self.V
+
+    def vorticity(self, R):
+        """
+        Wind vorticity at radiuses `R`.
+        """
+        if R is not self.table.R:
+            return self.profile.vorticity(R)
+        if self.Z is None:
+            self.Z = self.table.interpolate(
+                self.profile.vorticity(self.table.radii))
+        return self.Z
+
+    def pressure(self, R):
+        """
+        Pressure at radiuses `R`.
+        """
+        if R is not self.table.R:
+            return self.profile.pressure(R)
+        if self.P is None:
+            self.P = self.table.interpolate(
+                self.profile.pressure(self.table.radii))
+        return self.P
+
 
 class JelesnianskiWindProfile(WindProfileModel):
 
@@ -189,6 +369,24 @@ class HollandWindProfile(WindProfileModel):
         WindProfileModel.__init__(self, lat, lon, eP, cP, rMax,
                                   windSpeedModel)
         self.beta = beta
+        self.terms = (None, None, None)
+
+    def exponentialTerms(self, R):
+        """
+        The terms (rMax/R)**beta and exp(-(rMax/R)**beta) shared by the
+        velocity, vorticity and pressure profiles. They are retained for
+        the last radiuses `R` (and beta) they were calculated for.
+        """
+        R_, beta, terms = self.terms
+        if R is not R_ or beta is not self.beta:
+            delta = (self.rMax / R) ** self.beta
+            terms = (delta, np.exp(-delta))
+            self.terms = (R, self.beta, terms)
+        return terms
+
+    def pressure(self, R):
+        delta, edelta = self.exponentialTerms(R)
+        return self.cP + self.dP * edelta
 
     def secondDerivative(self):
         """
@@ -201,17 +399,17 @@ class HollandWindProfile(WindProfileModel):
         f = self.f
         rMax = self.rMax
 
-        E = exp(1)
+        E = np.exp(1)
         d2Vm = ((beta * dP * (-4 * beta ** 3 * dP / rho -
                 (-2 + beta ** 2) * E * (f * rMax) ** 2)) /
-                (E * rho * sqrt((4 * beta * dP) / (E * rho)
+                (E * rho * np.sqrt((4 * beta * dP) / (E * rho)
                  + (f * rMax) ** 2) * (4 * beta * dP * rMax ** 2 / rho
                  + E * (f * rMax ** 2) ** 2)))
 
         try:
-            assert d2Vm < 0.0
+            assert np.all(d2Vm < 0.0)
         except AssertionError:
-            log.critical("Pressure deficit: %f, RMW: %f" % (dP, rMax))
+            log.critical("Pressure deficit: %s, RMW: %s" % (dP, rMax))
             raise
 
         return d2Vm
@@ -222,22 +420,19 @@ class HollandWindProfile(WindProfileModel):
               self.rMax)
         bb = (d2Vm - 6 * aa * self.rMax) / 2.
         cc = -3 * aa * self.rMax ** 2 - 2 * bb * self.rMax
-        delta = (self.rMax / R) ** self.beta
-        edelta = np.exp(-delta)
+        delta, edelta = self.exponentialTerms(R)
 
         V = ( np.sqrt((self.dP * self.beta / self.rho)
              * delta * edelta + (R * self.f / 2.) ** 2) - R *
              np.abs(self.f) / 2.)
 
-        icore = np.where(R <= self.rMax)
-        V[icore] = (R[icore] * (R[icore] * (R[icore] * aa + bb) + cc))
+        V = np.where(R <= self.rMax, R * (R * (R * aa + bb) + cc), V)
         V = np.sign(self.f) * V
         return V
 
     def vorticity(self, R):
         beta = self.beta
-        delta = (self.rMax / R) ** beta
-        edelta = np.exp(-delta)
+        delta, edelta = self.exponentialTerms(R)
 
         Z = ((np.sqrt((self.dP * beta / self.rho) *
              delta * edelta + (R * self.f / 2.) ** 2)) / R -
@@ -255,8 +450,7 @@ class HollandWindProfile(WindProfileModel):
         bb = (d2Vm - 6 * aa * self.rMax) / 2
         cc = -3 * aa * self.rMax ** 2 - 2 * bb * self.rMax
 
-        icore = np.where(R <= self.rMax)
-        Z[icore] = R[icore] * (R[icore] * 4 * aa + 3 * bb) + 2 * cc
+        Z = np.where(R <= self.rMax, R * (R * 4 * aa + 3 * bb) + 2 * cc, Z)
         Z = np.sign(self.f) * Z
         return Z
 
@@ -299,8 +493,7 @@ class RankineWindProfile(WindProfileModel):
         # The literature indicates 0.4 < alpha < 0.6 (e.g. see Holland,
         # 1980)
         V = self.vMax * (self.rMax / R) ** self.alpha
-        icore = np.where(R <= self.rMax)
-        V[icore] = self.vMax * (R[icore] / self.rMax)
+        V = np.where(R <= self.rMax, self.vMax * (R / self.rMax), V)
         V = np.sign(self.f) * V
         return V
 
@@ -308,9 +501,8 @@ class RankineWindProfile(WindProfileModel):
         Z = (self.vMax * ((self.rMax / R) **
              self.alpha) / R - self.alpha * self.vMax * (self.rMax **
              self.alpha) / (R ** self.alpha))
-        icore = np.where(R <= self.rMax)
-        Z[icore] = ((self.vMax * (R[icore] /
-                    self.rMax) + self.vMax / self.rMax))
+        Z = np.where(R <= self.rMax,
+                     self.vMax * (R / self.rMax) + self.vMax / self.rMax, Z)
         Z = np.sign(self.f) * Z
         return Z
 
@@ -342,11 +534,10 @@ class DoubleHollandWindProfile(WindProfileModel):
 
         # Scale dp2 if dP is less than 800 Pa
 
-        if self.dP < 1500.:
-            self.dp2 = ((self.dP / 1500.) * (800. + (self.dP - 800.) /
-                        2000.))
-        else:
-            self.dp2 = 800. + (self.dP - 800.) / 2000.
+        self.dp2 = np.where(self.dP < 1500.,
+                            (self.dP / 1500.) * (800. + (self.dP - 800.) /
+                                                 2000.),
+                            800. + (self.dP - 800.) / 2000.)
 
         self.dp1 = self.dP - self.dp2
 
@@ -361,6 +552,27 @@ class DoubleHollandWindProfile(WindProfileModel):
         if self.beta2 is None:
             self.beta2 = 7.2 - self.cP / 16000.
 
+        self.terms = (None, None)
+
+    def exponentialTerms(self, R):
+        """
+        The terms (rMax/R)**beta1, exp(-(rMax/R)**beta1),
+        (rMax2/R)**beta2 and exp(-(rMax2/R)**beta2) of the two vortices,
+        shared by the velocity, vorticity and pressure profiles. They are
+        retained for the last radiuses `R` they were calculated for.
+        """
+        R_, terms = self.terms
+        if R is not R_:
+            mu = (self.rMax / R) ** self.beta1
+            nu = (self.rMax2 / R) ** self.beta2
+            terms = (mu, np.exp(-mu), nu, np.exp(-nu))
+            self.terms = (R, terms)
+        return terms
+
+    def pressure(self, R):
+        mu, emu, nu, enu = self.exponentialTerms(R)
+        return self.cP + self.dp1 * emu + self.dp2 * enu
+
     def secondDerivative(self):
         """
         Second derivative of the profile.
@@ -374,42 +586,42 @@ class DoubleHollandWindProfile(WindProfileModel):
         dp2 = self.dp2
         f = self.f
 
-        E = exp(1)
-        nu = pow((rMax2 / rMax1), beta2)
+        E = np.exp(1)
+        nu = np.power((rMax2 / rMax1), beta2)
 
         d2Vm = (-1 /
                 (8 *
                  (4 * beta1 * dp1 / (rho * E) +
-                  (4 * beta2 * dp2 / rho) * nu * exp(-nu) +
+                  (4 * beta2 * dp2 / rho) * nu * np.exp(-nu) +
                   (rMax1 * f) ** 2) ** 1.5)
                 * (-(4 * (beta1 ** 2) * dp1 / (rho * rMax1 * E)) +
                     (4 * (beta1 ** 2) * dp1 / (rho * rMax1 * E)) -
                     (4 * (beta2 ** 2) * dp2 / rho) *
-                    (nu / rMax1) * exp(-nu)
+                    (nu / rMax1) * np.exp(-nu)
                     + (4 * (beta2 ** 2) * dp2 / rho) *
-                    ((nu ** 2) / rMax1) * exp(-nu)
+                    ((nu ** 2) / rMax1) * np.exp(-nu)
                     + 2 * rMax1 * f ** 2) ** 2
-                + 1 / (4 * sqrt((4 * beta1 * dp1 / (rho * E)) +
+                + 1 / (4 * np.sqrt((4 * beta1 * dp1 / (rho * E)) +
                                 (4 * beta2 * dp2 / rho) * nu * 2 +
-                                exp(-nu) + (rMax1 * f) ** 2))
+                                np.exp(-nu) + (rMax1 * f) ** 2))
                 * ((4 * (beta1 ** 3) * dp1 / (rho * (rMax1 ** 2) * E))
                    + (4 * (beta1 ** 2) * dp1 / (rho * (rMax1 ** 2) * E))
                    - (12 * (beta1 ** 3) * dp1 / (rho * (rMax1 ** 2) * E))
                    - (4 * (beta1 ** 2) * dp1 / (rho * (rMax1 ** 2) * E))
                    + (4 * (beta1 ** 3) * dp1 / (rho * (rMax1 ** 2) * E))
                    + (4 * (beta2 ** 3) * dp2 / rho) *
-                     (nu / (rMax1 ** 2)) * exp(-nu)
+                     (nu / (rMax1 ** 2)) * np.exp(-nu)
                    + (4 * (beta2 ** 2) * dp2 / rho) *
-                     (nu / (rMax1 ** 2)) * exp(-nu)
+                     (nu / (rMax1 ** 2)) * np.exp(-nu)
                    - (12 * (beta2 ** 3) * dp2 / rho) *
-                     (nu ** 2) / (rMax1 ** 2) * exp(-nu)
+                     (nu ** 2) / (rMax1 ** 2) * np.exp(-nu)
                    - (4 * (beta2 ** 2) * dp2 / rho) *
-                     (nu ** 2) / (rMax1 ** 2) * exp(-nu)
+                     (nu ** 2) / (rMax1 ** 2) * np.exp(-nu)
                    + (4 * (beta2 ** 3) * dp2 / rho) *
-                     (nu ** 3) / (rMax1 ** 2) * exp(-nu)
+                     (nu ** 3) / (rMax1 ** 2) * np.exp(-nu)
                    + 2 * f ** 2))
 
-        assert d2Vm < 0.0
+        assert np.all(d2Vm < 0.0)
 
         return d2Vm
 
@@ -419,19 +631,15 @@ class DoubleHollandWindProfile(WindProfileModel):
 
         # Scale dp2 if dP is less than 800 Pa
 
-        if self.dP < 1500.:
-            dp2 = (self.dP / 1500.) * (800. + (self.dP - 800.) / 2000.)
-        else:
-            dp2 = 800. + (self.dP - 800.) / 2000.
+        dp2 = np.where(self.dP < 1500.,
+                       (self.dP / 1500.) * (800. + (self.dP - 800.) / 2000.),
+                       800. + (self.dP - 800.) / 2000.)
 
         dp1 = self.dP - dp2
 
         # The two gradient wind components
 
-        mu = (rMax / R) ** self.beta1
-        nu = (rMax2 / R) ** self.beta2
-        emu = np.exp(-mu)
-        enu = np.exp(-nu)
+        mu, emu, nu, enu = self.exponentialTerms(R)
 
         gradientV1 = (self.beta1 * dp1 / self.rho) * mu * emu
         gradientV2 = (self.beta2 * dp2 / self.rho) * nu * enu
@@ -439,7 +647,7 @@ class DoubleHollandWindProfile(WindProfileModel):
         V = (np.sign(self.f) * np.sqrt(gradientV1 + gradientV2 + (R *
              self.f / 2.) ** 2) - R * np.abs(self.f) / 2.)
 
-        vMax = np.abs(V).max()
+        vMax = stormMaximum(np.abs(V), self.rMax)
 
         d2Vm = self.secondDerivative()
         aa = (d2Vm / 2. - (-vMax / rMax) / rMax) / rMax
@@ -449,30 +657,25 @@ class DoubleHollandWindProfile(WindProfileModel):
         # Replace all values within rMax of the storm centre with the
         # cubic profile to eliminate barotropic instability
 
-        if self.dP >= 1500.:
-            icore = np.where(R <= rMax)
-            V[icore] = (np.sign(self.f) * R[icore] * (R[icore] *
-                        (R[icore] * aa + bb) + cc))
+        icore = (R <= rMax) & (self.dP >= 1500.)
+        V = np.where(icore,
+                     np.sign(self.f) * R * (R * (R * aa + bb) + cc), V)
 
         return V
 
     def vorticity(self, R):
 
         # Scale dp2 if dP is less than 1500 Pa:
-        if self.dP < 1500.:
-            dp2 = (self.dP / 1500.) * (800. + (self.dP - 800.) / 2000.)
-        else:
-            dp2 = 800. + (self.dP - 800.) / 2000.
+        dp2 = np.where(self.dP < 1500.,
+                       (self.dP / 1500.) * (800. + (self.dP - 800.) / 2000.),
+                       800. + (self.dP - 800.) / 2000.)
 
         dp1 = self.dP - dp2
 
         chi = self.beta1 * dp1 / self.rho
         psi = self.beta2 * dp2 / self.rho
 
-        delta = (self.rMax / R) ** self.beta1
-        gamma = (self.rMax2 / R) ** self.beta2
-        edelta = np.exp(-delta)
-        egamma = np.exp(-gamma)
+        delta, edelta, gamma, egamma = self.exponentialTerms(R)
 
         # Derivatives:
 
@@ -496,10 +699,8 @@ class DoubleHollandWindProfile(WindProfileModel):
         bb = (d2Vm - 6.0 * aa * self.rMax) / 2.0
         cc = -3.0 * aa * self.rMax ** 2.0 - 2.0 * bb * self.rMax
 
-        if self.dP >= 1500.:
-            icore = np.where(R <= self.rMax)
-            Z[icore] = (R[icore] * (R[icore] * 4.0 * aa + 3.0 * bb) +
-                        2.0 * cc)
+        icore = (R <= self.rMax) & (self.dP >= 1500.)
+        Z = np.where(icore, R * (R * 4.0 * aa + 3.0 * bb) + 2.0 * cc, Z)
 
         return Z
 
@@ -517,10 +718,7 @@ class PowellWindProfile(HollandWindProfile):
 
     def __init__(self, lat, lon, eP, cP, rMax):
         beta = 1.881093 - 0.010917 * np.abs(lat) - 0.005567 * rMax
-        if beta < 0.8:
-            beta = 0.8
-        if beta > 2.2:
-            beta = 2.2
+        beta = np.clip(beta, 0.8, 2.2)
 
         HollandWindProfile.__init__(self, lat, lon, eP, cP, rMax, beta)
 
@@ -535,8 +733,10 @@ class NewHollandWindProfile(WindProfileModel):
     in windVorticity, so it cannot be applied in wind field modelling.
     """
 
-    def __init__(self, lat, lon, eP, cP, rMax, rGale=150.):
-        WindProfileModel.__init__(self, lat, lon, eP, cP, rMax)
+    def __init__(self, lat, lon, eP, cP, rMax, rGale=150.,
+                 windSpeedModel=HollandWindSpeed):
+        WindProfileModel.__init__(self, lat, lon, eP, cP, rMax,
+                                  windSpeedModel)
         self.rGale = rGale
 
     def velocity(self, R):
@@ -551,11 +751,10 @@ class NewHollandWindProfile(WindProfileModel):
         edeltag = np.exp(-1. * deltag)
         rgterm = Bs * self.dP * deltag * edeltag / self.rho
         xn = np.log(17.) / np.log(rgterm)
-        xx = 0.5 * np.ones(R.shape)
-
-        i = np.where(R > self.rMax)
-        xx[i] = (0.5 + (R[i] - self.rMax) * (xn - 0.5) / (self.rGale -
-                 self.rMax))
+        xx = np.where(R > self.rMax,
+                      0.5 + (R - self.rMax) * (xn - 0.5) / (self.rGale -
+                                                            self.rMax),
+                      0.5)
 
         delta = (self.rMax / R) ** Bs
         edelta = np.exp(-delta)
@@ -565,6 +764,11 @@ class NewHollandWindProfile(WindProfileModel):
 
         return V
 
+    def pressure(self, R):
+        Bs = (-0.000044 * (self.dP / 100.) ** 2. + 0.01 * (self.dP /
+              100.) - 0.014 * np.abs(self.lat) + 1.0)
+        return self.cP + self.dP * np.exp(-(self.rMax / R) ** Bs)
+
     def vorticity(self, R):
         raise Exception
 
@@ -635,9 +839,7 @@ class HubbertWindField(WindFieldModel):
         V = self.velocity(R)
 
         Km = .70
-        inflow = 25. * np.ones(np.shape(R))
-        core = np.where(R < self.rMax)
-        inflow[core] = 0
+        inflow = np.where(R < self.rMax, 0., 25.).astype(R.dtype)
         inflow = inflow * np.pi / 180
 
         thetaMaxAbsolute = thetaFm + thetaMax
@@ -662,28 +864,23 @@ class McConochieWindField(WindFieldModel):
     def field(self, R, lam, vFm, thetaFm, thetaMax=0.):
         V = self.velocity(R)
 
-        inflow = 25. * np.ones(np.shape(R))
-        mid = np.where(R < 1.2 * self.rMax)
-        inflow[mid] = 10. + 75. * (R[mid] / self.rMax - 1.)
-        inner = np.where(R < self.rMax)
-        inflow[inner] = 10. * R[inner] / self.rMax
+        inflow = np.where(R < 1.2 * self.rMax,
+                          10. + 75. * (R / self.rMax - 1.), 25.)
+        inflow = np.where(R < self.rMax, 10. * R / self.rMax, inflow)
         inflow = inflow * np.pi / 180.
 
         thetaMaxAbsolute = thetaFm + thetaMax
         phi = inflow - lam
 
         asym = (0.5 * (1. + np.cos(thetaMaxAbsolute - lam)) * vFm * (V
-                / np.abs(V).max()))
+                / stormMaximum(np.abs(V), self.rMax)))
         Vsf = V + asym
 
         # Surface wind reduction factor:
-        swrf = 0.81 * np.ones(np.shape(Vsf))
-        low = np.where(Vsf >= 6)
-        med = np.where(Vsf >= 19.5)
-        high = np.where(Vsf >= 45)
-        swrf[low] = 0.81 - (2.93 * (Vsf[low] - 6.) / 1000.)
-        swrf[med] = 0.77 - (4.31 * (Vsf[med] - 19.5) / 1000.)
-        swrf[high] = 0.66
+        swrf = np.where(Vsf >= 6, 0.81 - (2.93 * (Vsf - 6.) / 1000.), 0.81)
+        swrf = np.where(Vsf >= 19.5, 0.77 - (4.31 * (Vsf - 19.5) / 1000.),
+                        swrf)
+        swrf = np.where(Vsf >= 45, 0.66, swrf)
 
         Ux = swrf * Vsf * np.sin(phi)
         Vy = swrf * Vsf * np.cos(phi)
@@ -705,19 +902,16 @@ class KepertWindField(WindFieldModel):
         K = 50.  # Diffusivity
         Cd = 0.002  # Constant drag coefficient
         
-        Vt = vFm * np.ones(V.shape)
-        
-        core = np.where(R > 4. * self.rMax)
-        Vt[core] = vFm * np.exp(-((R[core] / self.rMax) - 4.) ** 2. )
+        Vt = np.where(R > 4. * self.rMax,
+                      vFm * np.exp(-((R / self.rMax) - 4.) ** 2.), vFm)
         
         al = ((2. * V / R ) + self.f) / (2. * K)
         be = (self.f + Z) / (2. * K)
         gam = V / (2. * K * R)
-        if self.f > 0:
-            gam *= -1.
+        gam = np.where(self.f > 0, -gam, gam)
         albe = np.sqrt(al / be)
 
-        ind = np.where(np.abs(gam) > np.sqrt(al * be))
+        ind = np.abs(gam) > np.sqrt(al * be)
         chi = (Cd / K) * V / np.sqrt(np.sqrt(al * be))
         eta = (Cd / K) * V / np.sqrt(np.sqrt(al * be) + np.abs(gam))
         psi = (Cd / K) * V / np.sqrt(np.abs(np.sqrt(al * be) - gam))
@@ -746,7 +940,7 @@ class KepertWindField(WindFieldModel):
                 ( albe * (2. - 2. * i + 3. * (eta + psi) + (2. + 2. * i) * 
                 eta * psi)))
                 
-        Am[ind] = AmIII[ind]
+        Am = np.where(ind, AmIII, Am)
 
         # First asymmetric surface component
 
@@ -772,7 +966,7 @@ class KepertWindField(WindFieldModel):
                 (albe * (2. + 2. * i + 3. * (eta + psi) 
                 + (2. - 2. * i) * eta * psi)))
                 
-        Ap[ind] = ApIII[ind]
+        Ap = np.where(ind, ApIII, Ap)
                   
         # Second asymmetric surface component
 
@@ -826,6 +1020,75 @@ def profileParams(name):
     return params
 
 
+def stormArray(value, dtype=float):
+    """
+    Reshape a 1-D array of storm parameters to (n, 1, 1) so it broadcasts
+    against an (n, ny, nx) stack of grids. Scalars and `None` are
+    returned unchanged.
+
+    :param value: the storm parameters.
+    :param dtype: the data type of the returned array.
+    """
+    if value is None or np.ndim(value) == 0:
+        return value
+    return np.reshape(np.asarray(value, dtype=dtype), (-1, 1, 1))
+
+
+def stormProfile(profileType, lat, lon, eP, cP, rMax, dtype=float, **params):
+    """
+    The wind profile for one storm (scalar parameters) or n storms (1-D
+    arrays of parameters, reshaped to (n, 1, 1)).
+
+    :param str profileType: the wind profile type (see :data:`PROFILES`).
+    :param dtype: the data type of the storm parameters.
+    :param params: additional profile parameters. Parameters not used by
+                   the profile are ignored.
+
+    See :func:`batchField` for the other parameters.
+    """
+    model = WindModel(profileType, **params)
+    return model.profile(lat, lon, eP, cP, rMax, dtype)
+
+
+def batchField(profileType, windFieldType, R, lam, lat, lon, eP, cP, rMax,
+               vFm, thetaFm, thetaMax=0., table=None, **params):
+    """
+    Evaluate the wind field for n storms (or n timesteps of one storm) in
+    a single vectorised pass.
+
+    :param str profileType: the wind profile type (see :data:`PROFILES`).
+    :param str windFieldType: the wind field type (see :data:`FIELDS`).
+    :param R: :class:`numpy.ndarray` (n, ny, nx) of distances from the
+              storm centres (km).
+    :param lam: :class:`numpy.ndarray` (n, ny, nx) of angles from the
+                storm centres (radians).
+    :param lat: 1-D array of storm latitudes.
+    :param lon: 1-D array of storm longitudes.
+    :param eP: 1-D array of environmental pressures (Pa).
+    :param cP: 1-D array of central pressures (Pa).
+    :param rMax: 1-D array of radii to maximum winds (km).
+    :param vFm: 1-D array of forward speeds (m/s).
+    :param thetaFm: 1-D array of forward directions (radians).
+    :param float thetaMax: angle of maximum winds relative to the
+                           forward direction (radians).
+    :param table: optional :class:`RadialTable` for `R`. If given, the
+                  profile is tabulated on its radial axis and
+                  interpolated onto `R`.
+    :param params: additional profile parameters (e.g. `beta`, `beta1`,
+                   `beta2`), either scalars or 1-D arrays. Parameters
+                   not used by the profile are ignored.
+
+    :returns: eastward and northward surface wind components, each
+              (n, ny, nx), with the same precision as `R`.
+    """
+    model = WindModel(profileType, windFieldType, **params)
+    prof = model.profile(lat, lon, eP, cP, rMax, R.dtype)
+    if table is not None:
+        prof = prof.tabulated(table)
+
+    return model.field(prof, R, lam, vFm, thetaFm, thetaMax)
+
+
 def field(name):
     """
     Helper function to return the appropriate wind field
@@ -845,6 +1108,67 @@ def fieldParams(name):
     return params
 
 
+class WindModel(object):
+
+    """
+    A wind profile model and a wind field model, with their parameters,
+    resolved once from :data:`PROFILES` and :data:`FIELDS` so that any
+    number of storms can then be evaluated without further lookups.
+
+    :param str profileType: the wind profile type (see :data:`PROFILES`).
+    :param str windFieldType: the wind field type (see :data:`FIELDS`),
+                              or `None` if only the profile is required.
+    :param params: additional profile and wind field parameters (e.g.
+                   `beta`, `beta1`, `beta2`). Parameters not used by the
+                   models are ignored.
+    """
+
+    def __init__(self, profileType, windFieldType=None, **params):
+        self.profileModel = profile(profileType)
+        self.profileArgs = dict((p, params[p])
+                                for p in profileParams(profileType)
+                                if p in params)
+        self.fieldModel = None
+        self.fieldArgs = {}
+        if windFieldType is not None:
+            self.fieldModel = field(windFieldType)
+            self.fieldArgs = dict((p, params[p])
+                                  for p in fieldParams(windFieldType)
+                                  if p in params)
+
+    def profile(self, lat, lon, eP, cP, rMax, dtype=float):
+        """
+        The wind profile for one storm (scalar parameters) or n storms
+        (1-D arrays of parameters, reshaped to (n, 1, 1)).
+
+        :param dtype: the data type of the storm parameters.
+
+        See :func:`batchField` for the other parameters.
+        """
+        values = dict((p, stormArray(v, dtype))
+                      for p, v in self.profileArgs.items())
+        return self.profileModel(stormArray(lat, dtype),
+                                 stormArray(lon, dtype),
+                                 stormArray(eP, dtype),
+                                 stormArray(cP, dtype),
+                                 stormArray(rMax, dtype), **values)
+
+    def field(self, prof, R, lam, vFm, thetaFm, thetaMax=0.):
+        """
+        The surface wind field of the wind profile `prof`.
+
+        :param prof: the wind profile (see :meth:`profile`).
+
+        See :func:`batchField` for the other parameters.
+
+        :returns: eastward and northward surface wind components, with
+                  the same shape and precision as `R`.
+        """
+        windfield = self.fieldModel(prof, **self.fieldArgs)
+        return windfield.field(R, lam, stormArray(vFm, R.dtype),
+                               stormArray(thetaFm, R.dtype), thetaMax)
+
+
 PROFILES = {k.__name__.replace('WindProfile', '').lower(): k
             for k in allSubclasses(vars()['WindProfileModel'])}
 